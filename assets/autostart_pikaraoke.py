@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import os
-import socket
+import signal
 import subprocess
+import sys
+import threading
 import time
-import urllib.request
 from pathlib import Path
 
+from boot_timeline import BootTimeline
+
+# Started first so "script_start" is as close to process start as possible
+TIMELINE = BootTimeline()
+TIMELINE.mark("script_start")
+
 # Ensure venv + deno binaries are available in PATH (pikaraoke, yt-dlp, deno)
 HOME = Path.home()
 VENV_BIN = HOME / ".venv-pikaraoke" / "bin"
@@ -30,20 +38,23 @@ except Exception:
             return int((str(self).split(".") + ["0", "0"])[1] or 0)
 
 
-from pikaraoke_ui import show_error, show_info
+from net_watch import UPLINK_FILE, ConnectivityWatcher, UplinkMonitor, check_internet
 
-CHECK_INTERVAL = 5
+CHECK_INTERVAL = 5  # re-probe interval while a route exists but probes fail
 INITIAL_WAIT = 10
 EXTENDED_WAIT = 30
-
-
-def check_internet(timeout=3):
-    try:
-        socket.setdefaulttimeout(timeout)
-        socket.create_connection(("8.8.8.8", 53))
-        return True
-    except OSError:
-        return False
+PIKARAOKE_URL = "http://localhost:5555"
+# No network at all this long after start: open the Wi-Fi setup portal
+PORTAL_AFTER = INITIAL_WAIT + EXTENDED_WAIT
+PORTAL_STATUS = UPLINK_FILE.parent / "portal.json"
+UPDATE_AFTER_READY = 60  # let PiKaraoke settle before building an update
+# Extra PiKaraoke arguments; --headless when Chromium is started by
+# pikaraoke-display.service (--service) or by the launcher's own kiosk
+PIKARAOKE_ARGS = []
+# The download profile's -f selector, written by install.py (ytdlp_profiles.py)
+YTDL_ARGS_FILE = HOME / ".deskpi-karaoke" / "pikaraoke_ytdl_args"
+# Desktop mode: run the Chromium kiosk (pk_display.py) next to the server
+KIOSK = {"enabled": False}
 
 
 def check_wlan0_internet(timeout=3):
@@ -63,43 +74,255 @@ def check_wlan0_internet(timeout=3):
         return False
 
 
-def launch_pikaraoke():
+def timed_wlan0_probe():
+    """check_wlan0_internet() recorded as a timeline span."""
+    with TIMELINE.span("connectivity_probe") as event:
+        ok = check_wlan0_internet()
+        event["data"] = {"ok": ok}
+    return ok
+
+
+def on_uplink_change(online, first=False):
+    """UplinkMonitor callback: timeline event + popup (quiet if online at launch)."""
+    TIMELINE.mark("uplink_up" if online else "uplink_down")
+    if online and not first:
+        notify_info("🌐 Internet connected.\nYouTube search and downloads are available.", duration=3)
+    elif not online:
+        notify_info(
+            "📴 No internet.\nPlaying from the local song library;\n"
+            "YouTube comes back automatically once online.",
+            duration=4,
+        )
+    TIMELINE.save()
+
+
+def start_uplink_monitor():
+    """Watch every interface for an uplink in the background."""
+    seen = []
+
+    def on_change(online):
+        on_uplink_change(online, first=not seen)
+        seen.append(online)
+
+    watcher = ConnectivityWatcher(probe=check_internet, iface=None, recheck_interval=CHECK_INTERVAL)
+    monitor = UplinkMonitor(watcher, on_change=on_change)
+    monitor.start()
+    return monitor
+
+
+def start_portal_watch(monitor):
+    """If nothing is connected PORTAL_AFTER seconds after launch, run the
+    raspi_portal captive portal (as root, via sudo) until a network is joined
+    or an uplink appears some other way (e.g. an Ethernet cable)."""
+
+    def worker():
+        if monitor.online.wait(PORTAL_AFTER):
+            return
+        try:
+            from raspi_portal import AP_SSID, needs_setup
+        except ImportError:
+            return
+        if not needs_setup():
+            return  # on a LAN without uplink: offline mode is enough
+        TIMELINE.mark("portal_start")
+        notify_info(f"📶 No Wi-Fi.\nOn your phone, join \"{AP_SSID}\"\nto set up Wi-Fi.", duration=8)
+        cmd = ["sudo", "-n", sys.executable, "-m", "raspi_portal", "--status-file", str(PORTAL_STATUS)]
+        try:
+            proc = subprocess.Popen(cmd, cwd=HOME)
+        except OSError as e:
+            TIMELINE.mark("portal_failed", error=str(e))
+            TIMELINE.save()
+            return
+        while proc.poll() is None:
+            if monitor.online.wait(1.0):
+                proc.terminate()
+                proc.wait()
+        try:
+            result = json.loads(PORTAL_STATUS.read_text())
+        except (OSError, ValueError):
+            result = {}
+        TIMELINE.mark("portal_done", code=proc.returncode, state=result.get("state"),
+                      switch=result.get("switch"), ap_seconds=result.get("ap_seconds"))
+        TIMELINE.save()
+
+    threading.Thread(target=worker, name="portal-watch", daemon=True).start()
+
+
+def notify_info(message, duration=3):
+    TIMELINE.mark("popup", kind="info", text=message.splitlines()[0])
+    from pikaraoke_ui import show_info  # deferred: only boots that show a popup pay for it
+
+    show_info(message, duration=duration)
+
+
+def notify_error(message):
+    TIMELINE.mark("popup", kind="error", text=message.splitlines()[0])
+    from pikaraoke_ui import show_error
+
+    show_error(message)
+
+
+def spawn_pikaraoke(log, governor=None):
+    """Start one PiKaraoke process with its output pumped into `log`, in the
+    governor's "server" scope when one is given."""
+    from pk_logs import start_pump
+
+    cmd = [str(VENV_BIN / "pikaraoke")] + PIKARAOKE_ARGS
     env = os.environ.copy()
     env["PATH"] = os.environ["PATH"]
-    logfile = HOME / "pikaraoke_output.log"
-    with open(logfile, "a") as log:
-        log.write(
-            f"🎤 [LOG] Launching PiKaraoke @ {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-        )
-        if not (VENV_BIN / "yt-dlp").exists():
-            log.write("⚠️ [LOG] yt-dlp not found in venv bin\n")
-        if not (DENO_BIN / "deno").exists():
-            log.write("⚠️ [LOG] deno not found in ~/.deno/bin\n")
+    if governor is not None:
+        cmd = governor.command("server", cmd)
+        env = governor.env("server", env)
+    TIMELINE.mark("popen")
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+    )
+    start_pump(proc.stdout, log, close_log=False)
+    return proc
+
+
+def launch_pikaraoke(uplink=None):
+    """Run PiKaraoke under the supervisor. Blocks while it is supervised.
+
+    Output goes through the rotating log; the supervisor restarts the server
+    with backoff if it crashes, never answers on its port, or outgrows the
+    RSS ceiling, and stops on SIGTERM. `uplink` is an Event set while the
+    internet is reachable (None: already online); online-only work waits on it.
+    """
+    # deferred: waiting for the uplink (and --help) needs none of these
+    import venv_probe
+    import venv_slots
+    from download_scheduler import DownloadScheduler
+    from pk_display import KioskDisplay
+    from pk_governor import Governor
+    from pk_logs import RotatingLog
+    from pk_supervisor import Supervisor, http_ready
+    from pk_thermal import ThermalController
+    from song_cache import SongCache, archived_ids
+    from song_manifest import SongManifest, archive_listener
+    from song_normalizer import SongNormalizer
+
+    log = RotatingLog()
+    log.log(f"🎤 [LOG] Launching PiKaraoke @ {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    # An update staged during a previous run goes live before the first spawn
+    with TIMELINE.span("venv_swap") as event:
         try:
-            subprocess.Popen(
-                [str(VENV_BIN / "pikaraoke")],
-                stdout=log,
-                stderr=subprocess.STDOUT,
-                env=env,
-            )
-        except Exception as e:
-            log.write(f"❌ [LOG] Failed to launch PiKaraoke: {e}\n")
+            event["data"] = {"slot": venv_slots.activate_staged(log=lambda m: log.log(f"[LOG] {m}"))}
+        except OSError as e:
+            log.log(f"⚠️ [LOG] Could not activate staged venv: {e}")
+    if not (VENV_BIN / "yt-dlp").exists():
+        log.log("⚠️ [LOG] yt-dlp not found in venv bin")
+    if not (DENO_BIN / "deno").exists():
+        log.log("⚠️ [LOG] deno not found in ~/.deno/bin")
+    log.log(
+        f"ℹ️ [LOG] pikaraoke {venv_probe.pikaraoke_version()}, "
+        f"yt-dlp {venv_probe.ytdlp_version()}, deno {venv_probe.deno_version()}"
+    )
+
+    ready = threading.Event()
+
+    def on_event(name, **data):
+        log.log(f"🛡️ [LOG] supervisor: {name} {data or ''}".rstrip())
+        if name == "ready" and ready.is_set() and kiosk is not None:
+            kiosk.reload()  # a restarted server: the kiosk still shows the old one's page
+        if name == "ready":
+            ready.set()
+        if name == "ready" and not any(
+            e["name"] == "pikaraoke_reachable" for e in TIMELINE.record["events"]
+        ):
+            TIMELINE.mark("pikaraoke_reachable")
+            TIMELINE.save()
+        elif name == "spawn_failed":
+            log.log(f"❌ [LOG] Failed to launch PiKaraoke: {data.get('error')}")
+
+    governor = Governor()
+    if "--headless" not in PIKARAOKE_ARGS:
+        # PiKaraoke opens Chromium itself, so the player shares the "server"
+        # scope; a memory cap there would throttle or OOM-kill playback
+        governor.drop_memory_limits("server")
+    log.log(f"🎛️ [LOG] resource governor backend: {governor.backend.name}")
+    supervisor = Supervisor(
+        spawn=lambda: spawn_pikaraoke(log, governor),
+        ready_check=lambda: http_ready(PIKARAOKE_URL),
+        on_event=on_event,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+
+    def on_thermal(name, **data):
+        # throttle events land in the boot timeline, next to what was running
+        TIMELINE.mark(name, **data)
+        TIMELINE.save()
+
+    thermal = ThermalController(on_event=on_thermal, log=lambda m: log.log(f"[LOG] {m}"))
+    thermal_thread = thermal.start()
+    kiosk = kiosk_thread = None
+    if KIOSK["enabled"]:
+        # started with the server, not after it: Chromium's cold start overlaps PiKaraoke's
+        kiosk = KioskDisplay(governor=governor, on_event=lambda name, **d: TIMELINE.mark(name, **d),
+                             log=lambda m: log.log(f"[LOG] {m}"))
+        kiosk_thread = kiosk.start()
+    downloads = DownloadScheduler(governor=governor, log=lambda m: log.log(f"[LOG] {m}"))
+    downloads_thread = downloads.start()
+    # the library walk waits for the server and runs in the "transcode" scope
+    manifest = SongManifest(governor=governor)
+    manifest.listeners.append(archive_listener)
+    song_cache = SongCache(manifest, log=lambda m: log.log(f"[LOG] {m}"))
+    manifest.listeners.append(song_cache.listener)
+    normalizer = SongNormalizer(
+        manifest,
+        is_managed=lambda rel: song_cache.is_managed(rel, archived_ids()),
+        governor=governor,
+        log=lambda m: log.log(f"[LOG] {m}"),
+    )
+    manifest.listeners.append(normalizer.listener)
+    manifest_thread = manifest.start(ready=ready)
+    song_cache_thread = song_cache.start()
+    normalizer_threads = normalizer.start()
+    if uplink is None:
+        uplink = threading.Event()
+        uplink.set()
+    stage_update_in_background(log, ready, uplink)
+    try:
+        supervisor.run()
+    finally:
+        if kiosk is not None:
+            kiosk.stop()
+        thermal.stop()
+        downloads.stop()
+        song_cache.stop()
+        normalizer.stop()
+        manifest.stop()
+        downloads_thread.join(timeout=5)
+        song_cache_thread.join(timeout=5)
+        for t in normalizer_threads:
+            t.join(timeout=5)
+        manifest_thread.join(timeout=5)
+        if thermal_thread is not None:
+            thermal_thread.join(timeout=5)
+        if kiosk_thread is not None:
+            kiosk_thread.join(timeout=30)  # Chromium exit + profile sync
+        log.close()
 
 
 def get_installed_pikaraoke_version():
+    """Read the version from the venv's dist-info metadata (no pip subprocess)."""
+    import venv_probe
+
     try:
-        out = subprocess.check_output(
-            [str(VENV_BIN / "pip"), "show", "pikaraoke"], text=True
-        )
-        for line in out.splitlines():
-            if line.startswith("Version:"):
-                return Version(line.split(":", 1)[1].strip())
+        version = venv_probe.pikaraoke_version()
+        if version:
+            return Version(version)
     except Exception:
         pass
     return Version("0.0.0")
 
 
 def get_latest_pikaraoke_version(timeout=5):
+    import urllib.request  # pulls in ssl/http.client; only needed here
+
     url = "https://pypi.org/pypi/pikaraoke/json"
     try:
         with urllib.request.urlopen(url, timeout=timeout) as r:
@@ -109,66 +332,134 @@ def get_latest_pikaraoke_version(timeout=5):
         return None
 
 
-def update_pikaraoke():
-    """Upgrade pikaraoke and yt-dlp in the venv. Runs synchronously before launch."""
-    logfile = HOME / "pikaraoke_output.log"
-    with open(logfile, "a") as log:
-        log.write(
-            f"🔄 [LOG] Upgrading pikaraoke + yt-dlp @ {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-        )
-        result = subprocess.run(
-            [str(VENV_BIN / "pip"), "install", "--upgrade", "pikaraoke==1.18.0", "yt-dlp"],
-            stdout=log,
-            stderr=subprocess.STDOUT,
-        )
-        if result.returncode != 0:
-            log.write("⚠️ [LOG] pip upgrade exited with non-zero status\n")
-        else:
-            log.write("✅ [LOG] pip upgrade completed\n")
+def stage_update_in_background(log, ready, uplink):
+    """Once PiKaraoke is up and the internet is reachable, build and
+    smoke-test an updated venv slot if the installed pikaraoke is below the
+    pinned version. It goes live on the next launch
+    (venv_slots.activate_staged); the running server is never touched."""
+
+    def worker():
+        import venv_slots
+        from pk_packages import PIKARAOKE_VERSION
+
+        pinned = Version(PIKARAOKE_VERSION)
+        ready.wait()
+        uplink.wait()
+        time.sleep(UPDATE_AFTER_READY)
+        # Lower this thread's priority; pip and the smoke tests inherit it
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        with TIMELINE.span("version_check"):
+            installed = get_installed_pikaraoke_version()
+        if installed >= pinned or venv_slots.load_state().get("staged"):
+            return
+        log.log(f"🔄 [LOG] pikaraoke {installed} < {pinned}; staging update in background")
+        with TIMELINE.span("stage_update") as event:
+            event["data"] = {"slot": venv_slots.stage(log=lambda m: log.log(f"[LOG] {m}"))}
+        TIMELINE.save()
+
+    threading.Thread(target=worker, name="stage-update", daemon=True).start()
+
+
+def start_when_online():
+    notify_info("✅ Internet connected.\nLaunching PiKaraoke...", duration=2)
+    TIMELINE.save()
+    launch_pikaraoke()
 
 
-_PINNED_VERSION = Version("1.18.0")
+def start_now(portal=True):
+    """Launch on whatever network there is (or none); YouTube and the update
+    check follow the uplink monitor."""
+    TIMELINE.mark("launch_mode", mode="immediate")
+    monitor = start_uplink_monitor()
+    if portal:
+        start_portal_watch(monitor)
+    notify_info("🎤 Launching PiKaraoke...", duration=2)
+    TIMELINE.save()
+    try:
+        launch_pikaraoke(uplink=monitor.online)
+    finally:
+        monitor.stop()
+
 
+def wait_for_internet():
+    """Quiet INITIAL_WAIT, then a notified EXTENDED_WAIT; True once online."""
+    watcher = ConnectivityWatcher(probe=timed_wlan0_probe, iface="wlan0",
+                                  recheck_interval=CHECK_INTERVAL)
+    try:
+        # Quiet wait — woken by route/address changes
+        with TIMELINE.span("wait_initial"):
+            if watcher.wait_for_uplink(INITIAL_WAIT):
+                return True
 
-def check_and_update():
-    """Upgrade if installed pikaraoke is below the pinned version. Returns True if update ran."""
-    installed = get_installed_pikaraoke_version()
-    if installed < _PINNED_VERSION:
-        show_info(
-            f"🔄 Updating pikaraoke {installed} → {_PINNED_VERSION}\nUpdating before launch...",
-            duration=2,
+        # Extended wait with notification
+        notify_info(
+            "🔔 Connecting to internet...\nSearching for up to 30 seconds...", duration=2
         )
-        update_pikaraoke()
-        return True
-    return False
-
-
-def main():
-    # Quiet polling (INITIAL_WAIT)
-    start = time.time()
-    while time.time() - start < INITIAL_WAIT:
-        if check_wlan0_internet():
-            check_and_update()
-            show_info("✅ Internet connected.\nLaunching PiKaraoke...", duration=2)
-            launch_pikaraoke()
-            return
-        time.sleep(CHECK_INTERVAL)
+        with TIMELINE.span("wait_extended"):
+            return watcher.wait_for_uplink(EXTENDED_WAIT)
+    finally:
+        watcher.close()
+
 
-    # Extended wait with notification
-    show_info(
-        "🔔 Connecting to internet...\nSearching for up to 30 seconds...", duration=2
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Launch and supervise PiKaraoke")
+    parser.add_argument(
+        "--service",
+        action="store_true",
+        help="Run as pikaraoke.service: headless server (with --wait-for-uplink, "
+        "exit non-zero when offline so systemd retries)",
     )
-    start = time.time()
-    while time.time() - start < EXTENDED_WAIT:
-        if check_wlan0_internet():
-            check_and_update()
-            show_info("✅ Internet connected.\nLaunching PiKaraoke...", duration=2)
-            launch_pikaraoke()
-            return
-        time.sleep(CHECK_INTERVAL)
+    parser.add_argument(
+        "--wait-for-uplink",
+        action="store_true",
+        help="Old behaviour: launch only once 8.8.8.8 answers via wlan0, give up after ~40s",
+    )
+    parser.add_argument(
+        "--no-kiosk",
+        action="store_true",
+        help="Let PiKaraoke open its own browser even if \"kiosk\": true in display.json "
+        "enables the launcher's Chromium kiosk (RAM profile, pre-warm; see pk_display.py)",
+    )
+    parser.add_argument(
+        "--no-portal",
+        action="store_true",
+        help=f"Never open the Wi-Fi setup portal when no network is found after {PORTAL_AFTER}s",
+    )
+    args = parser.parse_args(argv)
+    try:
+        ytdl_args = YTDL_ARGS_FILE.read_text().strip()
+    except OSError:
+        ytdl_args = ""
+    if ytdl_args:
+        # appended after PiKaraoke's own "-f mp4", so the profile's -f wins
+        PIKARAOKE_ARGS.extend(["--ytdl-args", ytdl_args])
+    if args.service:
+        PIKARAOKE_ARGS.append("--headless")
+        TIMELINE.mark("service_mode")
+    elif not args.no_kiosk and (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        from pk_display import find_chromium, load_config as load_display_config
+
+        if load_display_config()["kiosk"] and find_chromium():
+            PIKARAOKE_ARGS.append("--headless")
+            KIOSK["enabled"] = True
+
+    if not args.wait_for_uplink:
+        start_now(portal=not args.no_portal)
+        return
+
+    TIMELINE.mark("launch_mode", mode="wait")
+    if wait_for_internet():
+        start_when_online()
+        return
 
     # Fallback if still offline — do not launch
-    show_error("❌ No internet found.\nPlease connect to the internet and try again.")
+    notify_error("❌ No internet found.\nPlease connect to the internet and try again.")
+    TIMELINE.save()
+    if args.service:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
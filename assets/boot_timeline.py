@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Structured boot timeline for the PiKaraoke launcher.
+
+The launcher records each phase with monotonic timestamps relative to its own
+start (plus the kernel uptime at that moment, so time spent before the desktop
+session is visible too). The last MAX_BOOTS timelines are kept in
+~/.deskpi-karaoke/boot_timelines.json.
+
+Run directly (`pk boot-report`) to print per-phase durations and percentiles
+across recent boots.
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+HOME = Path.home()
+TIMELINE_FILE = HOME / ".deskpi-karaoke" / "boot_timelines.json"
+MAX_BOOTS = 30
+
+
+def _read_first_line(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return ""
+
+
+def system_uptime() -> Optional[float]:
+    try:
+        return float(_read_first_line("/proc/uptime").split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def boot_id() -> str:
+    return _read_first_line("/proc/sys/kernel/random/boot_id") or "unknown"
+
+
+def load_timelines(path: Path = TIMELINE_FILE) -> list:
+    try:
+        data = json.loads(path.read_text())
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+class BootTimeline:
+    def __init__(self, path: Path = TIMELINE_FILE, max_boots: int = MAX_BOOTS):
+        self.path = path
+        self.max_boots = max_boots
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.record = {
+            "boot_id": boot_id(),
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "uptime_at_start": system_uptime(),
+            "events": [],
+        }
+
+    def now(self) -> float:
+        return round(time.monotonic() - self.t0, 4)
+
+    def mark(self, name: str, **data):
+        """Record a point event."""
+        event = {"name": name, "t": self.now()}
+        if data:
+            event["data"] = data
+        with self.lock:
+            self.record["events"].append(event)
+        return event
+
+    @contextmanager
+    def span(self, name: str, **data):
+        """Record a phase with its duration."""
+        start = self.now()
+        event = {"name": name, "t": start}
+        if data:
+            event["data"] = data
+        try:
+            yield event
+        finally:
+            event["dur"] = round(self.now() - start, 4)
+            with self.lock:
+                self.record["events"].append(event)
+
+    def save(self):
+        """Write this boot's record, replacing any earlier save of the same run."""
+        with self.lock:
+            record = json.loads(json.dumps(self.record))
+        # One writer at a time in this process; the tmp name is per process and
+        # thread so a concurrent launcher never renames our half-written file.
+        with self.save_lock:
+            self._write(record)
+
+    def _write(self, record: dict):
+        try:
+            timelines = [
+                r
+                for r in load_timelines(self.path)
+                if not (r.get("boot_id") == record["boot_id"] and r.get("started") == record["started"])
+            ]
+            timelines.append(record)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(timelines[-self.max_boots :], indent=1) + "\n")
+            tmp.replace(self.path)
+        except OSError:
+            pass
+
+
+# --- pk boot-report ---
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[k]
+
+
+def summarize(timelines: list) -> dict:
+    """Collect per-phase samples: durations for spans, offsets for point events.
+
+    Repeated events within one boot (e.g. several connectivity probes) are
+    summed for spans and take the last offset for points.
+    """
+    spans, points = {}, {}
+    for rec in timelines:
+        per_boot_spans, per_boot_points = {}, {}
+        for ev in rec.get("events", []):
+            if "dur" in ev:
+                per_boot_spans[ev["name"]] = per_boot_spans.get(ev["name"], 0.0) + ev["dur"]
+            else:
+                per_boot_points[ev["name"]] = ev["t"]
+        if rec.get("uptime_at_start") is not None:
+            per_boot_points["(uptime at launcher start)"] = rec["uptime_at_start"]
+            if "pikaraoke_reachable" in per_boot_points:
+                # Comparable across .desktop and systemd autostart
+                per_boot_points["(kernel boot → reachable)"] = round(
+                    rec["uptime_at_start"] + per_boot_points["pikaraoke_reachable"], 4
+                )
+        for k, v in per_boot_spans.items():
+            spans.setdefault(k, []).append(v)
+        for k, v in per_boot_points.items():
+            points.setdefault(k, []).append(v)
+    return {"spans": spans, "points": points}
+
+
+def _table(title: str, samples: dict, last: dict):
+    print(f"\n{title}")
+    print(f"  {'phase':<30} {'n':>3} {'last':>8} {'p50':>8} {'p90':>8} {'max':>8}")
+    for name, values in samples.items():
+        print(
+            f"  {name:<30} {len(values):>3} {last.get(name, float('nan')):>8.2f}"
+            f" {percentile(values, 50):>8.2f} {percentile(values, 90):>8.2f} {max(values):>8.2f}"
+        )
+
+
+def report(last_n: int = 10, path: Path = TIMELINE_FILE):
+    timelines = load_timelines(path)[-last_n:]
+    if not timelines:
+        print(f"No boot timelines recorded yet ({path})")
+        return
+    stats = summarize(timelines)
+    latest = summarize(timelines[-1:])
+    last_spans = {k: v[-1] for k, v in latest["spans"].items()}
+    last_points = {k: v[-1] for k, v in latest["points"].items()}
+    print(f"📊 Boot report — {len(timelines)} boot(s), latest {timelines[-1].get('started')}")
+    _table("Phase durations (s)", stats["spans"], last_spans)
+    _table("Milestones (s since launcher start)", stats["points"], last_points)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pk boot-report", description="Boot phase timings")
+    parser.add_argument("-n", "--last", type=int, default=10, help="Boots to include (default 10)")
+    parser.add_argument("--json", action="store_true", help="Dump the raw timelines")
+    args = parser.parse_args(argv)
+    if args.json:
+        print(json.dumps(load_timelines()[-args.last :], indent=2))
+    else:
+        report(args.last)
+
+
+if __name__ == "__main__":
+    main()
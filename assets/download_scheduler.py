@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Download scheduler between PiKaraoke and yt-dlp.
+
+PiKaraoke 1.18.0 downloads one song at a time: its DownloadManager feeds a
+single worker thread, which runs `python -m yt_dlp` and waits for it before
+taking the next queued song. That call goes through the yt-dlp hook
+(ytdlp_cache.py), which hands the download to this scheduler over a Unix
+socket and relays the output and exit code back. PiKaraoke sees an ordinary
+yt-dlp run and keeps its own queue order. For PiKaraoke's downloads the
+scheduler adds:
+
+- one retry of a failed download after a short backoff (not while offline);
+  PiKaraoke itself fails fast, and its queue waits while we retry, so the
+  default is a single retry
+- the governor's "downloads" scope and the RAM scratch (ytdlp_scratch.py)
+- per-job progress, speed and throughput in
+  $XDG_RUNTIME_DIR/deskpi-karaoke/downloads.json (`pk downloads`), and the
+  link and per-download speed learnt in ~/.deskpi-karaoke/download_stats.json
+
+The rest only applies when other clients of the hook (a `python -m yt_dlp`
+run by hand, a second PiKaraoke) submit while PiKaraoke's download runs:
+
+- a bounded number of downloads run at once: half the cores, and as many as
+  the link has carried at full per-download speed (+1 to keep probing)
+- jobs run in submission order; a job that has to wait (retry backoff) or is
+  moved up with `next` keeps its place and, when all workers are busy,
+  pauses the lowest-ranked running download (SIGSTOP) until a slot frees up
+- identical requests share one download and all get its exit code
+
+`next` only reorders downloads already handed over; songs still waiting in
+PiKaraoke's own queue are not visible here. Without a running scheduler the
+hook downloads directly. Settings can be overridden in
+~/.deskpi-karaoke/downloads.json, e.g. {"workers": 1, "max_attempts": 3}.
+
+    download_scheduler.py [status|next VIDEO_ID]
+"""
+
+import json
+import os
+import re
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+HOME = Path.home()
+_RUNTIME = os.environ.get("XDG_RUNTIME_DIR")
+STATUS_DIR = Path(_RUNTIME) / "deskpi-karaoke" if _RUNTIME else HOME / ".deskpi-karaoke"
+SOCKET_FILE = STATUS_DIR / "downloads.sock"
+STATUS_FILE = STATUS_DIR / "downloads.json"
+STATS_FILE = HOME / ".deskpi-karaoke" / "download_stats.json"
+CONFIG_FILE = HOME / ".deskpi-karaoke" / "downloads.json"
+
+DEFAULT_CONFIG = {
+    "workers": "auto",
+    "max_workers": 3,
+    "preempt": True,
+    "max_attempts": 2,  # PiKaraoke's single download worker waits on retries
+    "backoff_initial": 5.0,
+    "backoff_max": 120.0,
+}
+DEFAULT_WORKERS = 2  # until a few downloads have been measured
+PUBLISH_INTERVAL = 1.0
+EWMA_ALPHA = 0.3
+MAX_RECENT = 20
+_PROGRESS = re.compile(
+    r"\[download\]\s+([\d.]+)% of\s+~?\s*([\d.]+)\s*([KMGT]?i?B)(?:.*? at\s+([\d.]+)\s*([KMGT]?i?B)/s)?"
+)
+_UNITS = {"B": 1, "KiB": 1 << 10, "MiB": 1 << 20, "GiB": 1 << 30, "TiB": 1 << 40,
+          "KB": 10 ** 3, "MB": 10 ** 6, "GB": 10 ** 9, "TB": 10 ** 12}
+
+
+def load_config(path: Path = CONFIG_FILE) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    try:
+        user = json.loads(path.read_text())
+        if isinstance(user, dict):
+            config.update({k: v for k, v in user.items() if k in DEFAULT_CONFIG})
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+def auto_workers(cpu_count: int, link_bps: Optional[float], job_bps: Optional[float],
+                 max_workers: int = DEFAULT_CONFIG["max_workers"]) -> int:
+    """Concurrent downloads for this box: bounded by cores (yt-dlp, Deno and
+    the ffmpeg merge each want one) and by how many full-speed downloads the
+    link has carried, plus one so a faster link gets noticed."""
+    cpu_cap = max(1, min(max_workers, cpu_count // 2))
+    if not link_bps or not job_bps:
+        return min(DEFAULT_WORKERS, cpu_cap)
+    return max(1, min(cpu_cap, int(link_bps / job_bps + 0.5) + 1))
+
+
+def job_key(argv: list, cwd: str) -> str:
+    """Identical requests (same video, same flags, same place) share a key."""
+    from ytdlp_cache import split_args, video_id
+
+    positionals, flags = split_args(argv)
+    targets = [video_id(t) or t for t in positionals]
+    return json.dumps([targets, sorted(flags), cwd])
+
+
+def parse_progress(line: str) -> Optional[dict]:
+    m = _PROGRESS.search(line)
+    if not m:
+        return None
+    progress = {"percent": float(m.group(1)), "total": float(m.group(2)) * _UNITS.get(m.group(3), 1)}
+    if m.group(4):
+        progress["speed"] = float(m.group(4)) * _UNITS.get(m.group(5), 1)
+    return progress
+
+
+class Job:
+    def __init__(self, key: str, argv: list, cwd: str, seq: int):
+        self.key = key
+        self.argv = argv
+        self.cwd = cwd
+        self.seq = seq
+        self.rank = 0  # lowered by `next` to jump the queue
+        self.state = "queued"  # queued, running, paused, retrying, done, failed, cancelled
+        self.attempts = 0
+        self.not_before = 0.0
+        self.waiters: List["Waiter"] = []
+        self.proc = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.rc: Optional[int] = None
+        self.percent: Optional[float] = None
+        self.bytes = 0.0
+        self.done_bytes = 0.0  # earlier streams (video, then audio) of this attempt
+        self.stream_total: Optional[float] = None
+        self.speed: Optional[float] = None
+
+    @property
+    def priority(self) -> tuple:
+        return (self.rank, self.seq)
+
+    @property
+    def target(self) -> str:
+        from ytdlp_cache import split_args, video_id
+
+        positionals = split_args(self.argv)[0]
+        return " ".join(video_id(t) or t for t in positionals)
+
+    def progress(self, line: str):
+        p = parse_progress(line)
+        if p is None:
+            return
+        if self.percent is not None and p["percent"] + 5 < self.percent and self.stream_total:
+            self.done_bytes += self.stream_total  # next stream started
+        self.percent = p["percent"]
+        self.stream_total = p["total"]
+        self.bytes = self.done_bytes + p["total"] * p["percent"] / 100.0
+        self.speed = p.get("speed", self.speed)
+
+    def reset_progress(self):
+        self.percent = self.stream_total = self.speed = None
+        self.bytes = self.done_bytes = 0.0
+
+    def summary(self) -> dict:
+        end = self.finished or time.time()
+        seconds = end - self.started if self.started else None
+        return {
+            "target": self.target,
+            "state": self.state,
+            "attempts": self.attempts,
+            "waiters": len(self.waiters),
+            "percent": self.percent,
+            "bytes": round(self.bytes),
+            "speed_bps": self.speed and round(self.speed),
+            "queued_s": round((self.started or end) - self.created, 1),
+            "seconds": seconds and round(seconds, 1),
+            "throughput_bps": round(self.bytes / seconds) if seconds and self.bytes else None,
+            "rc": self.rc,
+        }
+
+
+class Waiter:
+    """One client connection waiting on a job; fed by the job's threads."""
+
+    def __init__(self):
+        self.messages = deque()
+        self.event = threading.Event()
+
+    def put(self, **message):
+        self.messages.append(message)
+        self.event.set()
+
+
+class DownloadScheduler:
+    def __init__(
+        self,
+        ytdlp: Optional[Path] = None,
+        run_download: Optional[Callable[..., int]] = None,
+        config: Optional[dict] = None,
+        governor=None,
+        socket_path: Path = SOCKET_FILE,
+        status_file: Path = STATUS_FILE,
+        stats_file: Path = STATS_FILE,
+        is_offline: Optional[Callable[[], bool]] = None,
+        cpu_count: Optional[int] = None,
+        log: Callable[[str], None] = print,
+    ):
+        if ytdlp is None:
+            from ytdlp_cache import REAL_YTDLP as ytdlp
+        self.ytdlp = Path(ytdlp)
+        self.run_download = run_download or self._download
+        self.config = config or load_config()
+        self.governor = governor
+        self.socket_path = Path(socket_path)
+        self.status_file = status_file
+        self.stats_file = stats_file
+        self.is_offline = is_offline or _offline
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.log = log
+        self.cond = threading.Condition()
+        self.jobs: Dict[str, Job] = {}
+        self.recent: deque = deque(maxlen=MAX_RECENT)
+        self.seq = 0
+        self.stats = self._load_stats()
+        self._peak = 0.0  # aggregate speed of the current busy period
+        self._published = 0.0
+        self.server: Optional[socketserver.BaseServer] = None
+        self.stopping = threading.Event()
+
+    # --- persistence ---
+    def _load_stats(self) -> dict:
+        try:
+            data = json.loads(self.stats_file.read_text())
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_stats(self):
+        try:
+            self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.stats_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.stats, indent=2) + "\n")
+            tmp.replace(self.stats_file)
+        except OSError:
+            pass
+
+    def _ewma(self, name: str, value: float):
+        old = self.stats.get(name)
+        self.stats[name] = round(value if not old else old + EWMA_ALPHA * (value - old))
+
+    def workers(self) -> int:
+        if isinstance(self.config["workers"], int) and self.config["workers"] > 0:
+            return self.config["workers"]
+        return auto_workers(self.cpu_count, self.stats.get("link_bps"), self.stats.get("job_bps"),
+                            self.config["max_workers"])
+
+    def publish(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._published < PUBLISH_INTERVAL:
+            return
+        self._published = now
+        with self.cond:
+            jobs = sorted(self.jobs.values(), key=lambda j: j.priority)
+            status = {
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "workers": self.workers(),
+                "link_bps": self.stats.get("link_bps"),
+                "job_bps": self.stats.get("job_bps"),
+                "completed": self.stats.get("completed", 0),
+                "failed": self.stats.get("failed", 0),
+                "jobs": [j.summary() for j in jobs],
+                "recent": list(self.recent),
+            }
+        try:
+            self.status_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.status_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(status, indent=2) + "\n")
+            tmp.replace(self.status_file)
+        except OSError:
+            pass
+
+    # --- requests ---
+    def submit(self, argv: list, cwd: str, waiter: Waiter) -> Job:
+        key = job_key(argv, cwd)
+        with self.cond:
+            job = self.jobs.get(key)
+            if job is None:
+                self.seq += 1
+                job = self.jobs[key] = Job(key, list(argv), cwd, self.seq)
+            else:
+                waiter.put(err=f"[deskpi] joined the download already {job.state} for {job.target}\n")
+            job.waiters.append(waiter)
+            self.cond.notify_all()
+        return job
+
+    def detach(self, job: Job, waiter: Waiter):
+        """A client went away; a job nobody waits for is dropped."""
+        with self.cond:
+            if waiter in job.waiters:
+                job.waiters.remove(waiter)
+            if job.waiters or job.state in ("done", "failed", "cancelled"):
+                return
+            if job.proc is not None:
+                _signal_group(job.proc, signal.SIGTERM)
+            self._finish(job, "cancelled", None)
+
+    def bump(self, target: str) -> bool:
+        """Move the job for `target` (video ID or URL) to the front."""
+        from ytdlp_cache import video_id
+
+        vid = video_id(target) or target
+        with self.cond:
+            for job in self.jobs.values():
+                if vid in job.target.split():
+                    job.rank = min([j.rank for j in self.jobs.values()] + [0]) - 1
+                    job.not_before = 0.0
+                    self.cond.notify_all()
+                    return True
+        return False
+
+    # --- scheduling ---
+    def _finish(self, job: Job, state: str, rc: Optional[int]):
+        """Record the outcome and tell the waiters. Caller holds the lock."""
+        job.state, job.rc, job.finished = state, rc, time.time()
+        self.jobs.pop(job.key, None)
+        self.recent.appendleft(job.summary())
+        for waiter in job.waiters:
+            waiter.put(rc=rc if rc is not None else 1)
+        self.cond.notify_all()
+
+    def dispatch(self):
+        """Start, resume and pause jobs by priority. Caller holds the lock."""
+        now = time.time()
+        limit = self.workers()
+        running = [j for j in self.jobs.values() if j.state == "running"]
+        waiting = sorted(
+            (j for j in self.jobs.values()
+             if j.state == "paused" or (j.state in ("queued", "retrying") and j.not_before <= now)),
+            key=lambda j: j.priority,
+        )
+        for job in waiting:
+            if len(running) >= limit:
+                if not self.config["preempt"]:
+                    break
+                victim = max(running, key=lambda j: j.priority)
+                if victim.priority < job.priority or victim.proc is None:
+                    break
+                _signal_group(victim.proc, signal.SIGSTOP)
+                victim.state = "paused"
+                running.remove(victim)
+                self.log(f"⏸️ paused {victim.target} for {job.target}")
+            if job.state == "paused":
+                _signal_group(job.proc, signal.SIGCONT)
+                job.state = "running"
+            else:
+                job.state = "running"
+                threading.Thread(target=self._run_job, args=(job,), name="download-job", daemon=True).start()
+            running.append(job)
+
+    def _run_job(self, job: Job):
+        with self.cond:
+            job.attempts += 1
+            job.started = job.started or time.time()
+            job.reset_progress()
+        attempt_started = time.monotonic()
+
+        def out(line):
+            job.progress(line)
+            for waiter in list(job.waiters):
+                waiter.put(out=line)
+
+        def err(line):
+            for waiter in list(job.waiters):
+                waiter.put(err=line)
+
+        def on_start(proc):
+            with self.cond:
+                job.proc = proc
+                if job.state == "cancelled":
+                    _signal_group(proc, signal.SIGTERM)
+
+        try:
+            rc = self.run_download(job.argv, job.cwd, out=out, err=err, on_start=on_start)
+        except Exception as e:
+            err(f"ERROR: deskpi download scheduler: {e}\n")
+            rc = 1
+        seconds = time.monotonic() - attempt_started
+        with self.cond:
+            job.proc = None
+            if job.state == "cancelled":
+                return
+            if rc == 0:
+                self.stats["completed"] = self.stats.get("completed", 0) + 1
+                if job.bytes and seconds > 0:
+                    self._ewma("throughput_bps", job.bytes / seconds)
+                self._finish(job, "done", 0)
+            elif job.attempts < self.config["max_attempts"] and not self.is_offline():
+                delay = min(self.config["backoff_max"],
+                            self.config["backoff_initial"] * 2 ** (job.attempts - 1))
+                job.state, job.not_before = "retrying", time.time() + delay
+                err(f"[deskpi] download failed (exit {rc}); retry {job.attempts + 1} in {delay:.0f}s\n")
+                self.cond.notify_all()
+            else:
+                self.stats["failed"] = self.stats.get("failed", 0) + 1
+                self._finish(job, "failed", rc)
+        self._save_stats()
+        self.publish(force=True)
+
+    def sample(self):
+        """Learn link and per-download speed from the running jobs."""
+        with self.cond:
+            running = [j for j in self.jobs.values() if j.state == "running"]
+            speeds = [j.speed for j in running if j.speed]
+            if len(running) == 1 and speeds:
+                self._ewma("job_bps", speeds[0])
+            if speeds:
+                self._peak = max(self._peak, sum(speeds))
+            elif self._peak and not running:
+                self._ewma("link_bps", max(self._peak, self.stats.get("job_bps") or 0))
+                self._peak = 0.0
+                self._save_stats()
+
+    def _download(self, argv: list, cwd: str, **io) -> int:
+        import ytdlp_scratch
+
+        wrap, env = list, None
+        if self.governor is not None:
+            wrap, env = (lambda cmd: self.governor.command("downloads", cmd)), self.governor.env("downloads")
+        if "--newline" not in argv:
+            argv = ["--newline"] + argv  # one progress line per update
+        return ytdlp_scratch.download(str(self.ytdlp), argv, wrap=wrap, env=env, cwd=cwd, **io)
+
+    def run(self):
+        while not self.stopping.is_set():
+            with self.cond:
+                self.dispatch()
+                self.cond.wait(PUBLISH_INTERVAL)
+            self.sample()
+            self.publish()
+
+    # --- socket server ---
+    def serve(self):
+        scheduler = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline() or b"{}")
+                except ValueError:
+                    return
+                if "next" in request:
+                    self.wfile.write(json.dumps({"ok": scheduler.bump(request["next"])}).encode() + b"\n")
+                    return
+                if not isinstance(request.get("argv"), list):
+                    return
+                waiter = Waiter()
+                job = scheduler.submit(request["argv"], request.get("cwd") or str(HOME), waiter)
+                try:
+                    while True:
+                        if not waiter.event.wait(0.5):
+                            if _peer_closed(self.connection):
+                                raise BrokenPipeError
+                            continue
+                        waiter.event.clear()
+                        while waiter.messages:
+                            message = waiter.messages.popleft()
+                            self.wfile.write(json.dumps(message).encode() + b"\n")
+                            if "rc" in message:
+                                return
+                        self.wfile.flush()
+                except OSError:
+                    scheduler.detach(job, waiter)
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)
+        self.server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        self.server.serve_forever(poll_interval=0.5)
+
+    def start(self) -> threading.Thread:
+        threading.Thread(target=self.serve, name="download-socket", daemon=True).start()
+        t = threading.Thread(target=self.run, name="download-scheduler", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.socket_path.unlink(missing_ok=True)
+        with self.cond:
+            for job in list(self.jobs.values()):
+                if job.proc is not None:
+                    _signal_group(job.proc, signal.SIGTERM)
+                self._finish(job, "cancelled", None)
+
+
+def _signal_group(proc, sig: int):
+    try:
+        os.killpg(proc.pid, sig)
+        if sig == signal.SIGTERM:
+            os.killpg(proc.pid, signal.SIGCONT)  # a paused group must wake to exit
+    except (OSError, AttributeError):
+        pass
+
+
+def _peer_closed(conn: socket.socket) -> bool:
+    try:
+        readable, _, _ = select.select([conn], [], [], 0)
+        return bool(readable) and conn.recv(1, socket.MSG_PEEK) == b""
+    except OSError:
+        return True
+
+
+def _offline() -> bool:
+    try:
+        from net_watch import read_uplink_state
+    except ImportError:
+        return False
+    return read_uplink_state() is False
+
+
+# --- client (the python -m yt_dlp hook, ytdlp_cache.py) ---
+def _request(message: dict, socket_path: Path) -> Optional[socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(message).encode() + b"\n")
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def submit(argv: list, socket_path: Path = SOCKET_FILE) -> Optional[int]:
+    """Run a download through the launcher's scheduler, relaying its output.
+
+    Returns yt-dlp's exit code, or None when no scheduler is listening.
+    """
+    sock = _request({"argv": argv, "cwd": os.getcwd()}, socket_path)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rb") as replies:
+        for raw in replies:
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "rc" in message:
+                return int(message["rc"])
+    print("ERROR: deskpi download scheduler went away mid-download", file=sys.stderr)
+    return 1
+
+
+def read_status(path: Path = STATUS_FILE) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _rate(bps: Optional[float]) -> str:
+    return "—" if not bps else f"{bps / (1 << 20):.1f} MB/s"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    if cmd == "status":
+        status = read_status()
+        if not status:
+            print("No download scheduler status (is the launcher running?)")
+            return 0
+        print(f"workers: {status['workers']}, link ≈ {_rate(status.get('link_bps'))}, "
+              f"per download ≈ {_rate(status.get('job_bps'))}, "
+              f"completed {status.get('completed', 0)}, failed {status.get('failed', 0)}")
+        for job in status["jobs"]:
+            pct = "" if job["percent"] is None else f" {job['percent']:5.1f}%"
+            print(f"  {job['state']:<9}{pct} {_rate(job['speed_bps']):>10}  {job['target']}"
+                  f" (attempt {job['attempts']}, {job['waiters']} waiting)")
+        for job in status.get("recent", [])[:5]:
+            print(f"  {job['state']:<9} {job['target']} in {job['seconds'] or 0:.0f}s"
+                  f" after {job['queued_s']:.0f}s queued, {_rate(job['throughput_bps'])}")
+        return 0
+    if cmd == "next" and len(argv) == 2:
+        sock = _request({"next": argv[1]}, SOCKET_FILE)
+        if sock is None:
+            raise SystemExit("❌ download scheduler is not running")
+        with sock, sock.makefile("rb") as replies:
+            ok = json.loads(replies.readline() or b"{}").get("ok")
+        print(f"⏫ {argv[1]} moved to the front" if ok else f"❌ no pending download for {argv[1]}")
+        return 0 if ok else 1
+    raise SystemExit("usage: download_scheduler.py [status|next VIDEO_ID]")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Import-time report for the launcher and PiKaraoke (`pk import-report`).
+
+Runs each target under `python -X importtime` in a fresh interpreter and shows
+the total plus the slowest modules by cumulative time. `--cold` points
+PYTHONPYCACHEPREFIX at an empty directory, so every module is compiled from
+source as on a first boot without precompiled bytecode; the default (warm) run
+uses the .pyc files the installer wrote.
+
+Each run is kept in ~/.deskpi-karaoke/import_times.json, and the report shows
+the change against the previous run of the same target and mode.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HOME = Path.home()
+VENV_PY = HOME / ".venv-pikaraoke" / "bin" / "python"
+HISTORY_FILE = HOME / ".deskpi-karaoke" / "import_times.json"
+MAX_HISTORY = 20
+
+# name -> (interpreter, module, working directory); the launcher is started by
+# the venv python from the .desktop entry
+TARGETS = {
+    "launcher": (VENV_PY if VENV_PY.exists() else Path(sys.executable), "autostart_pikaraoke", HOME),
+    "pikaraoke": (VENV_PY, "pikaraoke.app", HOME),
+}
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return [(module, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+        except ValueError:
+            continue  # the header line
+    return rows
+
+
+def measure(python: Path, module: str, cwd: Path, cold: bool = False) -> dict:
+    env = os.environ.copy()
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    with tempfile.TemporaryDirectory(prefix="pk-pycache-") as prefix:
+        if cold:
+            env["PYTHONPYCACHEPREFIX"] = prefix
+        start = time.monotonic()
+        result = subprocess.run(
+            [str(python), "-X", "importtime", "-c", f"import {module}"],
+            cwd=str(cwd),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall = time.monotonic() - start
+    rows = parse_importtime(result.stderr)
+    top = next((r for r in rows if r[0] == module), None)
+    return {
+        "ok": result.returncode == 0 and top is not None,
+        "error": result.stderr.strip().splitlines()[-1:] if result.returncode else [],
+        "total_ms": round(sum(r[1] for r in rows) / 1000.0, 1),
+        "module_ms": round(top[2] / 1000.0, 1) if top else None,
+        "wall_ms": round(wall * 1000.0, 1),
+        "modules": len(rows),
+        "slowest": [
+            {"module": m, "self_ms": round(s / 1000.0, 1), "cumulative_ms": round(c / 1000.0, 1)}
+            for m, s, c in sorted(rows, key=lambda r: r[2], reverse=True)[:15]
+        ],
+    }
+
+
+def load_history(path: Path = HISTORY_FILE) -> list:
+    try:
+        data = json.loads(path.read_text())
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(entries: list, path: Path = HISTORY_FILE):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entries[-MAX_HISTORY:], indent=1) + "\n")
+        tmp.replace(path)
+    except OSError:
+        pass
+
+
+def _previous(history: list, target: str, mode: str):
+    for entry in reversed(history):
+        if entry.get("target") == target and entry.get("mode") == mode and entry.get("ok"):
+            return entry
+    return None
+
+
+def print_result(target: str, mode: str, res: dict, prev):
+    print(f"\n=== {target} ({mode}) ===")
+    if not res["ok"]:
+        print(f"  ❌ import failed: {' '.join(res['error']) or 'unknown error'}")
+        return
+    delta = ""
+    if prev:
+        diff = res["module_ms"] - prev["module_ms"]
+        delta = f"  ({diff:+.1f} ms vs {prev['when']})"
+    print(f"  import {res['module_ms']:.1f} ms, {res['modules']} modules, wall {res['wall_ms']:.1f} ms{delta}")
+    print(f"  {'module':<40} {'self':>9} {'cumulative':>11}")
+    for row in res["slowest"]:
+        print(f"  {row['module']:<40} {row['self_ms']:>7.1f}ms {row['cumulative_ms']:>9.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pk import-report", description="Import cost of the launcher and PiKaraoke")
+    parser.add_argument("targets", nargs="*", metavar="TARGET",
+                        help=f"Targets to measure ({', '.join(sorted(TARGETS))}; default all)")
+    parser.add_argument("--cold", action="store_true", help="Ignore existing .pyc files (first-boot cost)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--no-save", action="store_true", help="Do not record this run")
+    args = parser.parse_args(argv)
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    mode = "cold" if args.cold else "warm"
+    history = load_history()
+    results = {}
+    for name in args.targets or sorted(TARGETS):
+        python, module, cwd = TARGETS[name]
+        if not python.exists():
+            print(f"⚠️  {name}: {python} not found, skipping")
+            continue
+        res = measure(python, module, cwd, cold=args.cold)
+        results[name] = res
+        if not args.json:
+            print_result(name, mode, res, _previous(history, name, mode))
+        history.append({"target": name, "mode": mode, "when": time.strftime("%Y-%m-%d %H:%M:%S"), **res})
+    if args.json:
+        print(json.dumps(results, indent=2))
+    if not args.no_save:
+        save_history(history)
+
+
+if __name__ == "__main__":
+    main()
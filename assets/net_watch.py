@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Event-driven connectivity watcher for the PiKaraoke launcher.
+
+Instead of sleeping a fixed interval between ping probes, the watcher blocks
+on kernel route/address change notifications (rtnetlink) and probes
+reachability as soon as a default route appears. Event sources, in order of
+preference:
+
+- rtnetlink multicast groups (kernel, no extra processes)
+- `nmcli monitor` (NetworkManager, if netlink is unavailable)
+- plain polling (last resort)
+
+Any object with `wait(timeout) -> bool` and `close()` can be passed in as the
+event source, which keeps the watcher testable without a real network. A
+source may also offer `wake()`, which makes a blocked `wait` return at once;
+`UplinkMonitor.stop()` uses it so shutdown does not sit out a long recheck.
+
+`UplinkMonitor` keeps watching after launch and publishes the current state
+to $XDG_RUNTIME_DIR/deskpi-karaoke/uplink.json, so helpers such as the yt-dlp
+wrapper can tell "offline" from "slow" without probing themselves.
+"""
+
+import json
+import os
+import select
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+PROC_ROUTE = Path("/proc/net/route")
+PROC_IPV6_ROUTE = Path("/proc/net/ipv6_route")
+
+# rtnetlink multicast groups (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+# How often to re-probe while a route exists but the probe keeps failing
+# (e.g. captive upstream, DNS not up yet). Events still wake us earlier.
+RECHECK_INTERVAL = 5
+# How often the uplink monitor re-confirms a working uplink; route events
+# (e.g. Wi-Fi dropping) wake it sooner
+ONLINE_RECHECK_INTERVAL = 60
+
+_RUNTIME = os.environ.get("XDG_RUNTIME_DIR")
+UPLINK_FILE = (Path(_RUNTIME) if _RUNTIME else Path.home()) / (
+    "deskpi-karaoke" if _RUNTIME else ".deskpi-karaoke") / "uplink.json"
+# A state file the monitor has not refreshed for this long is ignored
+UPLINK_STALE_AFTER = 3 * ONLINE_RECHECK_INTERVAL
+
+
+def check_internet(timeout=3):
+    """Default reachability probe: TCP connect to a public DNS resolver."""
+    try:
+        with socket.create_connection(("8.8.8.8", 53), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def default_route_interfaces(route_file: Path = PROC_ROUTE,
+                             ipv6_route_file: Path = PROC_IPV6_ROUTE) -> set:
+    """Return the set of interfaces that currently carry a default route."""
+    ifaces = set()
+    try:
+        for line in route_file.read_text().splitlines()[1:]:
+            fields = line.split()
+            # Iface Destination Gateway Flags RefCnt Use Metric Mask ...
+            if len(fields) >= 8 and fields[1] == "00000000" and fields[7] == "00000000":
+                ifaces.add(fields[0])
+    except OSError:
+        pass
+    try:
+        for line in ipv6_route_file.read_text().splitlines():
+            fields = line.split()
+            # dest dest_len src src_len next_hop metric refcnt use flags iface
+            if len(fields) >= 10 and fields[1] == "00" and set(fields[0]) == {"0"}:
+                if fields[9] != "lo":
+                    ifaces.add(fields[9])
+    except OSError:
+        pass
+    return ifaces
+
+
+def has_default_route(iface: Optional[str] = None, **kwargs) -> bool:
+    ifaces = default_route_interfaces(**kwargs)
+    return bool(ifaces) if iface is None else iface in ifaces
+
+
+class Wakeup:
+    """Self-pipe that interrupts a select() in another thread."""
+
+    def __init__(self):
+        self.r, self.w = os.pipe()
+        os.set_blocking(self.r, False)
+        os.set_blocking(self.w, False)
+
+    def fileno(self):
+        return self.r
+
+    def set(self):
+        try:
+            os.write(self.w, b"x")
+        except (BlockingIOError, OSError):
+            pass
+
+    def drain(self) -> bool:
+        woken = False
+        try:
+            while os.read(self.r, 4096):
+                woken = True
+        except (BlockingIOError, OSError):
+            pass
+        return woken
+
+    def close(self):
+        for fd in (self.r, self.w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PollingSource:
+    """Fallback source: no events, just sleeps for the requested timeout."""
+
+    name = "polling"
+
+    def __init__(self, interval=RECHECK_INTERVAL):
+        self.interval = interval
+        self.woken = threading.Event()
+
+    def wait(self, timeout):
+        self.woken.wait(max(0.0, min(timeout, self.interval)))
+        self.woken.clear()
+        return False
+
+    def wake(self):
+        self.woken.set()
+
+    def close(self):
+        pass
+
+
+class RtnetlinkSource:
+    """Wakes up on kernel link/address/route changes."""
+
+    name = "rtnetlink"
+
+    def __init__(self):
+        groups = (
+            RTMGRP_LINK
+            | RTMGRP_IPV4_IFADDR
+            | RTMGRP_IPV4_ROUTE
+            | RTMGRP_IPV6_IFADDR
+            | RTMGRP_IPV6_ROUTE
+        )
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.bind((0, groups))
+        self.sock.setblocking(False)
+        self.wakeup = Wakeup()
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.sock, self.wakeup], [], [], max(0.0, timeout))
+        if self.wakeup.drain() or self.sock not in ready:
+            return False
+        # Drain everything queued; one burst of messages is one event for us.
+        try:
+            while self.sock.recv(65536):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        return True
+
+    def wake(self):
+        self.wakeup.set()
+
+    def close(self):
+        self.sock.close()
+        self.wakeup.close()
+
+
+class NetworkManagerSource:
+    """Wakes up on any line printed by `nmcli monitor`.
+
+    If nmcli exits (NetworkManager restarted, binary removed), its pipe is at
+    EOF and would be readable forever; the source then degrades to sleeping
+    for the timeout like PollingSource instead of spinning the watcher.
+    """
+
+    name = "networkmanager"
+
+    def __init__(self, nmcli="nmcli"):
+        self.proc = subprocess.Popen(
+            [nmcli, "monitor"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.fd = self.proc.stdout.fileno()
+        os.set_blocking(self.fd, False)
+        self.wakeup = Wakeup()
+        self.exited = False
+
+    def wait(self, timeout):
+        watched = [self.wakeup] if self.exited else [self.fd, self.wakeup]
+        ready, _, _ = select.select(watched, [], [], max(0.0, timeout))
+        if self.wakeup.drain() or self.fd not in ready:
+            return False
+        try:
+            while True:
+                chunk = os.read(self.fd, 4096)
+                if not chunk:
+                    # EOF: nmcli is gone; treat what it printed last as one
+                    # more event and poll from now on.
+                    self.exited = True
+                    self.proc.poll()
+                    break
+        except BlockingIOError:
+            pass
+        return True
+
+    def wake(self):
+        self.wakeup.set()
+
+    def close(self):
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=2)
+        except Exception:
+            pass
+        self.proc.stdout.close()
+        self.wakeup.close()
+
+
+def open_event_source():
+    """Return the best available event source, falling back to polling."""
+    try:
+        return RtnetlinkSource()
+    except (AttributeError, OSError):
+        pass
+    nmcli = shutil.which("nmcli")
+    if nmcli:
+        try:
+            return NetworkManagerSource(nmcli)
+        except OSError:
+            pass
+    return PollingSource()
+
+
+class ConnectivityWatcher:
+    """Waits for an uplink, probing as soon as a default route shows up.
+
+    `probe` is called only when `route_check` says a default route exists, so
+    on a cold boot we never spend a ping on an interface that is still down.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], bool] = check_internet,
+        iface: Optional[str] = None,
+        source=None,
+        route_check: Optional[Callable[[], bool]] = None,
+        recheck_interval=RECHECK_INTERVAL,
+        on_probe: Optional[Callable[[bool], None]] = None,
+    ):
+        self.probe = probe
+        self.iface = iface
+        self.source = source if source is not None else open_event_source()
+        self.route_check = route_check or (lambda: has_default_route(self.iface))
+        self.recheck_interval = recheck_interval
+        self.on_probe = on_probe
+
+    def check_now(self) -> bool:
+        if not self.route_check():
+            return False
+        ok = bool(self.probe())
+        if self.on_probe:
+            self.on_probe(ok)
+        return ok
+
+    def wait_for_uplink(self, timeout) -> bool:
+        """Block until the probe succeeds or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.check_now():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.source.wait(min(remaining, self.recheck_interval))
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_uplink_state(online: bool, path: Path = UPLINK_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"online": online, "updated": time.time()}))
+    tmp.replace(path)
+
+
+def read_uplink_state(path: Path = UPLINK_FILE, stale_after=UPLINK_STALE_AFTER) -> Optional[bool]:
+    """Last state published by a running UplinkMonitor; None if unknown/stale."""
+    try:
+        data = json.loads(path.read_text())
+        if time.time() - float(data["updated"]) > stale_after:
+            return None
+        return bool(data["online"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class UplinkMonitor:
+    """Background thread that tracks the uplink for the life of the launcher.
+
+    `online` is set while the uplink works. Every check refreshes the state
+    file (so readers can spot a dead monitor), and `on_change(online)` is
+    called on each transition, starting with the first check.
+    """
+
+    def __init__(
+        self,
+        watcher: ConnectivityWatcher,
+        state_file: Optional[Path] = UPLINK_FILE,
+        on_change: Optional[Callable[[bool], None]] = None,
+        online_interval=ONLINE_RECHECK_INTERVAL,
+    ):
+        self.watcher = watcher
+        self.state_file = state_file
+        self.on_change = on_change
+        self.online_interval = online_interval
+        self.online = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self._last = None
+
+    def check(self) -> bool:
+        ok = self.watcher.check_now()
+        if self.state_file is not None:
+            try:
+                write_uplink_state(ok, self.state_file)
+            except OSError:
+                pass
+        if ok != self._last:
+            self._last = ok
+            (self.online.set if ok else self.online.clear)()
+            if self.on_change:
+                self.on_change(ok)
+        return ok
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                ok = self.check()
+                interval = self.online_interval if ok else self.watcher.recheck_interval
+                self.watcher.source.wait(interval)
+        finally:
+            self.watcher.close()
+
+    def start(self) -> threading.Thread:
+        self.thread = threading.Thread(target=self.run, name="uplink-monitor", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self, timeout=5.0):
+        """Stop the thread, waking it from its recheck wait; the thread closes
+        the event source on its way out."""
+        self.stopping.set()
+        wake = getattr(self.watcher.source, "wake", None)
+        if wake:
+            wake()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
@@ -1,37 +1,150 @@
-import tkinter as tk
+"""
+On-screen notifications for the PiKaraoke launcher.
+
+A single notification service owns one Tk root on one thread and is fed
+through a queue. The toast window is reused: new messages replace the text,
+bursts of updates are coalesced (only the latest is drawn), and each message
+expires at its own deadline. An error is never coalesced away or replaced by
+an info toast; info arriving while it is up waits until it is closed. The
+thread exits once nothing is showing, so the launcher process can finish;
+the next call starts it again.
+
+Without a display, messages go to stdout and tkinter is never imported.
+"""
+
+import os
+import queue
 import threading
+import time
 
+POLL_MS = 50
+IDLE_EXIT = 1.0  # seconds with nothing visible before the Tk thread exits
 
-def show_info(message, title="PiKaraoke", duration=3, x=400, y=200):
-    def popup():
+
+def _has_display():
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+class HeadlessNotifier:
+    """Fallback when there is no display: log to stdout."""
+
+    def notify(self, kind, message, title, duration, x, y):
+        tag = "ERROR" if kind == "error" else "INFO"
+        print(f"[{tag}] {message}", flush=True)
+
+
+class TkNotifier:
+    """One Tk root on a dedicated thread, driven by a message queue."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.failed = False
+
+    def notify(self, kind, message, title, duration, x, y):
+        if self.failed:
+            HeadlessNotifier().notify(kind, message, title, duration, x, y)
+            return
+        deadline = None if duration is None else time.monotonic() + duration
+        with self.lock:
+            self.queue.put((kind, message, title, deadline, x, y))
+            if self.thread is None:
+                # Not a daemon: a visible error must keep the process alive
+                self.thread = threading.Thread(target=self._run, name="pikaraoke-ui")
+                self.thread.start()
+
+    def _run(self):
         try:
+            import tkinter as tk
+
             root = tk.Tk()
-            root.title(title)
-            root.geometry(f"+{x}+{y}")
-            root.attributes("-topmost", True)
-            root.resizable(False, False)
-            tk.Label(root, text=message, padx=20, pady=20, font=("Arial", 12)).pack()
-            root.after(duration * 1000, root.destroy)
-            root.mainloop()
         except Exception as e:
-            print(f"[INFO] {message} (GUI error: {e})")
+            self.failed = True
+            with self.lock:
+                self.thread = None
+            print(f"[INFO] GUI unavailable ({e}); falling back to console output")
+            self._drain_headless()
+            return
 
-    threading.Thread(target=popup).start()
+        root.withdraw()
+        root.resizable(False, False)
+        root.protocol("WM_DELETE_WINDOW", lambda: hide())
+        label = tk.Label(root, padx=20, pady=20, font=("Arial", 12))
+        label.pack()
+        state = {"deadline": None, "visible": False, "kind": None, "idle_since": time.monotonic()}
+        pending = []
 
+        def hide():
+            root.withdraw()
+            state.update(visible=False, deadline=None, kind=None, idle_since=time.monotonic())
 
-def show_error(message, title="PiKaraoke Error", x=400, y=200):
-    def popup():
+        def pump():
+            try:
+                while True:
+                    pending.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            pending[:] = [m for m in pending if m[3] is None or m[3] > now]
+            errors = [i for i, m in enumerate(pending) if m[0] == "error"]
+            latest = None
+            if errors:
+                # the newest error wins; info queued after it waits its turn
+                latest = pending[errors[-1]]
+                del pending[: errors[-1] + 1]
+            elif pending and not (state["visible"] and state["kind"] == "error"):
+                latest = pending[-1]  # coalesce: keep the newest
+                pending.clear()
+            if latest is not None:
+                kind, message, title, deadline, x, y = latest
+                root.title(title)
+                root.geometry(f"+{x}+{y}")
+                label.config(text=message, fg="red" if kind == "error" else "black")
+                root.deiconify()
+                root.attributes("-topmost", True)
+                state.update(deadline=deadline, visible=True, kind=kind)
+            elif state["visible"] and state["deadline"] is not None and now >= state["deadline"]:
+                hide()
+            if not state["visible"] and now - state["idle_since"] >= IDLE_EXIT:
+                with self.lock:
+                    if self.queue.empty() and not pending:
+                        # under the lock: notify() now sees no thread and starts one
+                        self.thread = None
+                        root.destroy()
+                        return
+            root.after(POLL_MS, pump)
+
+        root.after(0, pump)
+        root.mainloop()
+
+    def _drain_headless(self):
+        fallback = HeadlessNotifier()
         try:
-            root = tk.Tk()
-            root.title(title)
-            root.geometry(f"+{x}+{y}")
-            root.attributes("-topmost", True)
-            root.resizable(False, False)
-            tk.Label(
-                root, text=message, padx=20, pady=20, font=("Arial", 12), fg="red"
-            ).pack()
-            root.mainloop()
-        except Exception as e:
-            print(f"[ERROR] {message} (GUI error: {e})")
+            while True:
+                kind, message, title, _, x, y = self.queue.get_nowait()
+                fallback.notify(kind, message, title, None, x, y)
+        except queue.Empty:
+            pass
+
+
+_service = None
+_service_lock = threading.Lock()
 
-    threading.Thread(target=popup).start()
+
+def get_notifier():
+    """Lazily create the process-wide notification service."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TkNotifier() if _has_display() else HeadlessNotifier()
+        return _service
+
+
+def show_info(message, title="PiKaraoke", duration=3, x=400, y=200):
+    get_notifier().notify("info", message, title, duration, x, y)
+
+
+def show_error(message, title="PiKaraoke Error", x=400, y=200):
+    # Errors stay up until the user closes them
+    get_notifier().notify("error", message, title, None, x, y)
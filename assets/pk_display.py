@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Chromium kiosk for PiKaraoke.
+
+Run by pikaraoke-display.service when the server runs headless as a systemd
+user service, and, with "kiosk": true, by the launcher itself in desktop mode
+(PiKaraoke is then started with --headless, and the launcher reloads the kiosk
+whenever its supervisor has restarted the server). Chromium runs in the governor's "player" scope so
+playback keeps priority over downloads, and starts fast:
+
+- the profile (user-data dir) and the disk cache live on tmpfs
+  ($XDG_RUNTIME_DIR, else /dev/shm), seeded from a snapshot in
+  ~/.deskpi-karaoke/chromium-profile that the installer provisions; changed
+  profile files are copied back every `sync_interval` seconds and when the
+  kiosk stops, and the cache is never written to the SD card
+- flags skip first-run/keyring/update/translate work and turn on GPU raster,
+  zero-copy and hardware video decode
+- with `prewarm`, Chromium is started at once on a local page that switches
+  to the splash screen as soon as the server answers, so its cold start
+  overlaps PiKaraoke's instead of following it
+
+Settings can be overridden in ~/.deskpi-karaoke/display.json, e.g.
+{"kiosk": true, "extra_flags": ["--force-device-scale-factor=1.5"]}.
+
+    pk_display.py [run|sync]
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from pk_governor import Governor
+from pk_supervisor import http_ready
+
+HOME = Path.home()
+CONFIG_FILE = HOME / ".deskpi-karaoke" / "display.json"
+SNAPSHOT_DIR = HOME / ".deskpi-karaoke" / "chromium-profile"  # provisioned by install.py
+PIKARAOKE_URL = "http://localhost:5555"
+SPLASH_URL = PIKARAOKE_URL + "/splash"
+READY_TIMEOUT = 300
+CHROMIUM_NAMES = ("chromium-browser", "chromium")
+CHROMIUM_FLAGS = [
+    "--kiosk",
+    "--noerrdialogs",
+    "--disable-infobars",
+    "--no-first-run",
+    "--autoplay-policy=no-user-gesture-required",
+]
+# Startup work a kiosk never needs
+STARTUP_FLAGS = [
+    "--no-default-browser-check",
+    "--password-store=basic",  # no keyring unlock wait
+    "--disable-session-crashed-bubble",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--check-for-update-interval=31536000",
+]
+GPU_FLAGS = [
+    "--ignore-gpu-blocklist",
+    "--enable-gpu-rasterization",
+    "--enable-zero-copy",
+    "--enable-accelerated-video-decode",
+]
+
+DEFAULT_CONFIG = {
+    "kiosk": False,  # desktop mode: the launcher runs this kiosk, PiKaraoke headless (opt-in)
+    "tmpfs_profile": True,
+    "sync_interval": 600,
+    "prewarm": True,
+    "gpu": True,
+    "cache_mb": 64,
+    "extra_flags": [],
+}
+# Not worth SD writes: rebuilt by Chromium, or only valid for one run
+SYNC_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "*.tmp", "Crashpad", "BrowserMetrics*", "Safe Browsing", "component_crx_cache",
+    "optimization_guide_*", "Cache", "DawnCache",
+)
+RESTART_DELAY = 5.0
+STOP_GRACE = 10.0
+WAIT_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>PiKaraoke</title></head>
+<body style="margin:0;background:#000"><script>
+// any answer from the server (even opaque) means it is up
+function poll() {
+  fetch("%(server)s/", {mode: "no-cors", cache: "no-store"})
+    .then(() => location.replace("%(splash)s"))
+    .catch(() => setTimeout(poll, 250));
+}
+poll();
+</script></body></html>
+"""
+
+
+def load_config(path: Path = CONFIG_FILE) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    try:
+        user = json.loads(path.read_text())
+        if isinstance(user, dict):
+            config.update({k: v for k, v in user.items() if k in DEFAULT_CONFIG})
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+def find_chromium():
+    for name in CHROMIUM_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def wait_for_server(timeout: float = READY_TIMEOUT, stopping: Optional[threading.Event] = None) -> bool:
+    stopping = stopping or threading.Event()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if http_ready(PIKARAOKE_URL):
+            return True
+        if stopping.wait(0.5):
+            return False
+    return False
+
+
+def tmpfs_root() -> Optional[Path]:
+    """Per-user RAM-backed directory for the live profile, if there is one."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and Path(runtime).is_dir():
+        return Path(runtime) / "deskpi-karaoke"
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / f"deskpi-karaoke-{os.getuid()}"
+    return None
+
+
+def tree_state(root: Path) -> Tuple[int, float]:
+    """(bytes, newest mtime) of the files under `root`; directory mtimes
+    count too, so removals show up."""
+    size, newest = 0, 0.0
+    for dirpath, _dirs, files in os.walk(root):
+        try:
+            newest = max(newest, os.lstat(dirpath).st_mtime)
+        except OSError:
+            pass
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            size += st.st_size
+            newest = max(newest, st.st_mtime)
+    return size, newest
+
+
+def mirror(src: Path, dst: Path) -> int:
+    """Make `dst` a copy of `src` minus SYNC_IGNORE, copying only files whose
+    size or mtime differ. Each file is replaced atomically, so an interrupted
+    sync leaves every file either old or new. Returns the bytes copied."""
+    copied = 0
+    for dirpath, dirs, files in os.walk(src):
+        ignored = SYNC_IGNORE(dirpath, dirs + files)
+        dirs[:] = [d for d in dirs if d not in ignored]
+        files = [f for f in files if f not in ignored]
+        target = dst / Path(dirpath).relative_to(src)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            s, d = Path(dirpath, name), target / name
+            try:
+                st = os.lstat(s)
+                try:
+                    dt = os.lstat(d)
+                    if dt.st_size == st.st_size and dt.st_mtime_ns == st.st_mtime_ns:
+                        continue
+                except FileNotFoundError:
+                    pass
+                tmp = d.with_name(d.name + ".pk-sync")
+                shutil.copy2(s, tmp, follow_symlinks=False)
+                os.replace(tmp, d)
+                copied += st.st_size
+            except FileNotFoundError:
+                continue  # Chromium removed it meanwhile
+        keep = set(dirs) | set(files)
+        for entry in os.scandir(target):
+            if entry.name in keep:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.unlink(entry.path)
+    return copied
+
+
+def mark_clean_exit(user_data: Path):
+    """Chromium killed at power-off leaves exit_type "Crashed" and offers to
+    restore the session; a kiosk always starts clean."""
+    prefs_file = user_data / "Default" / "Preferences"
+    try:
+        prefs = json.loads(prefs_file.read_text())
+        profile = prefs.setdefault("profile", {})
+        if profile.get("exit_type") == "Normal" and profile.get("exited_cleanly"):
+            return
+        profile.update(exit_type="Normal", exited_cleanly=True)
+        tmp = prefs_file.with_suffix(".pk-tmp")
+        tmp.write_text(json.dumps(prefs))
+        tmp.replace(prefs_file)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
+class KioskProfile:
+    """Chromium user-data and cache dirs on tmpfs, persisted to a snapshot.
+
+    Without a usable tmpfs (or with `tmpfs_profile` off) Chromium uses the
+    snapshot directory directly and `sync()` does nothing.
+    """
+
+    def __init__(self, snapshot: Path = SNAPSHOT_DIR, runtime_root: Optional[Path] = None,
+                 enabled: bool = True, cache_mb: int = 64, log: Callable[[str], None] = print):
+        self.snapshot = snapshot
+        self.root = (runtime_root or tmpfs_root()) if enabled else None
+        self.cache_mb = cache_mb
+        self.log = log
+        self.user_data = self.snapshot
+        self.cache = self.snapshot / "Cache"
+        self.synced_mtime = 0.0
+        self.bytes_synced = 0
+        self.lock = threading.Lock()
+
+    @property
+    def in_ram(self) -> bool:
+        return self.user_data != self.snapshot
+
+    def prepare(self) -> Tuple[Path, Path]:
+        """Seed the RAM profile (once per boot) and return (user-data, cache) dirs."""
+        self.snapshot.mkdir(parents=True, exist_ok=True)
+        if self.root is not None:
+            live = self.root / "chromium"
+            try:
+                if not (live / "Default").is_dir():
+                    self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+                    snap_bytes, _ = tree_state(self.snapshot)
+                    usage = shutil.disk_usage(self.root)
+                    if usage.free < 2 * snap_bytes + self.cache_mb * 1024 * 1024:
+                        raise OSError(f"only {usage.free // 2**20} MB free on {self.root}")
+                    shutil.rmtree(live, ignore_errors=True)
+                    shutil.copytree(self.snapshot, live, symlinks=True, ignore=SYNC_IGNORE)
+                self.user_data = live
+                self.cache = self.root / "chromium-cache"
+                self.cache.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                self.log(f"⚠️ Chromium profile stays on disk: {e}")
+                self.user_data, self.cache = self.snapshot, self.snapshot / "Cache"
+        _, self.synced_mtime = tree_state(self.user_data)
+        mark_clean_exit(self.user_data)
+        return self.user_data, self.cache
+
+    def sync(self, force: bool = False) -> bool:
+        """Copy what changed in the RAM profile back to the snapshot, if
+        anything did since the last sync."""
+        if not self.in_ram:
+            return False
+        with self.lock:
+            _, newest = tree_state(self.user_data)
+            if newest <= self.synced_mtime and not force:
+                return False
+            try:
+                self.bytes_synced += mirror(self.user_data, self.snapshot)
+            except OSError as e:
+                self.log(f"⚠️ Chromium profile sync failed: {e}")
+                return False
+            self.synced_mtime = newest
+            return True
+
+
+def chromium_command(chromium: str, config: dict, user_data: Path, cache: Path, url: str) -> list:
+    cmd = [chromium] + CHROMIUM_FLAGS + STARTUP_FLAGS
+    if config["gpu"]:
+        cmd += GPU_FLAGS
+    cmd += [
+        f"--user-data-dir={user_data}",
+        f"--disk-cache-dir={cache}",
+        f"--disk-cache-size={int(config['cache_mb']) * 1024 * 1024}",
+    ]
+    return cmd + list(config["extra_flags"]) + [url]
+
+
+class KioskDisplay:
+    def __init__(
+        self,
+        config: Optional[dict] = None,
+        governor: Optional[Governor] = None,
+        profile: Optional[KioskProfile] = None,
+        on_event: Optional[Callable[..., None]] = None,
+        chromium: Optional[str] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.config = config or load_config()
+        self.governor = governor
+        self.chromium = chromium
+        self.log = log
+        self.profile = profile or KioskProfile(enabled=self.config["tmpfs_profile"],
+                                               cache_mb=self.config["cache_mb"], log=log)
+        self.on_event = on_event
+        self.proc: Optional[subprocess.Popen] = None
+        self.stopping = threading.Event()
+        self.reloading = threading.Event()
+
+    def _event(self, name, **data):
+        if self.on_event:
+            try:
+                self.on_event(name, **data)
+            except Exception:
+                pass
+
+    def start_url(self, user_data: Path) -> Optional[str]:
+        """Wait page (prewarm) or the splash once the server answers; None when stopped."""
+        if self.config["prewarm"]:
+            page = user_data.parent / "pk-wait.html"
+            try:
+                page.write_text(WAIT_PAGE % {"server": PIKARAOKE_URL, "splash": SPLASH_URL})
+                return page.as_uri()
+            except OSError:
+                pass
+        if not wait_for_server(stopping=self.stopping):
+            if not self.stopping.is_set():
+                self.log(f"❌ PiKaraoke did not answer on {PIKARAOKE_URL} within {READY_TIMEOUT}s")
+            return None
+        return SPLASH_URL
+
+    def launch(self, chromium: str) -> Optional[subprocess.Popen]:
+        user_data, cache = self.profile.prepare()
+        url = self.start_url(user_data)
+        if url is None:
+            return None
+        cmd = chromium_command(chromium, self.config, user_data, cache, url)
+        env = None
+        if self.governor is not None:
+            cmd = self.governor.command("player", cmd)
+            env = self.governor.env("player")
+        self.log(f"🖥️ Starting display: {' '.join(cmd)}")
+        self._event("kiosk_start", prewarm=url != SPLASH_URL, profile="ram" if self.profile.in_ram else "disk")
+        return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, env=env)
+
+    def run(self) -> int:
+        """Keep Chromium up until stop(); non-zero if it could not be started."""
+        chromium = self.chromium or find_chromium()
+        if not chromium:
+            self.log("❌ Chromium not found")
+            return 1
+        while not self.stopping.is_set():
+            self.proc = self.launch(chromium)
+            if self.proc is None:
+                return 1
+            last_sync = time.monotonic()
+            while self.proc.poll() is None:
+                if self.stopping.wait(1.0) or self.reloading.is_set():
+                    break
+                if time.monotonic() - last_sync >= self.config["sync_interval"]:
+                    self.profile.sync()
+                    last_sync = time.monotonic()
+            self._terminate()
+            rc = self.proc.returncode
+            self.profile.sync()
+            if self.reloading.is_set():
+                self.reloading.clear()
+                self.log("🔁 PiKaraoke restarted; reloading the display")
+            elif not self.stopping.is_set():
+                self.log(f"⚠️ Chromium exited ({rc}); restarting in {RESTART_DELAY:.0f}s")
+                self.stopping.wait(RESTART_DELAY)
+        return 0
+
+    def _terminate(self):
+        proc = self.proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(STOP_GRACE)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def start(self) -> threading.Thread:
+        t = threading.Thread(target=self.run, name="kiosk", daemon=True)
+        t.start()
+        return t
+
+    def reload(self):
+        """Start Chromium over (wait page, then splash) once PiKaraoke has
+        been restarted; the page it showed belonged to the dead server."""
+        self.reloading.set()
+
+    def stop(self):
+        """Close Chromium; run() syncs the profile once it has exited."""
+        self.stopping.set()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "run"
+    if cmd == "sync":
+        profile = KioskProfile()
+        profile.prepare()
+        print("✅ Profile synced" if profile.sync(force=True) else "ℹ️ Profile is not in RAM; nothing to sync")
+        return 0
+    if cmd != "run":
+        raise SystemExit("usage: pk_display.py [run|sync]")
+    display = KioskDisplay(governor=Governor(), log=lambda m: print(m, flush=True))
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: display.stop())
+    return display.run()  # non-zero: systemd restarts us
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Resource scopes for PiKaraoke and its helpers.
+
+Every process we start is wrapped for one named scope of the policy:
+
+- "player"    — the Chromium display (playback critical)
+- "server"    — PiKaraoke's Flask server and the ffmpeg streams it runs; also
+                Chromium when PiKaraoke opens the browser itself, and then
+                the launcher drops the scope's memory limits
+- "downloads" — yt-dlp (and the Deno / ffmpeg merges it starts)
+- "transcode" — background normalize/transcode jobs
+
+Each scope has a CPU weight, an I/O weight and optional memory.high /
+memory.max. The governor turns a command into a command that runs in that
+scope, using the first backend that works here:
+
+- "systemd" — `systemd-run --user --scope` with CPUWeight/IOWeight/MemoryHigh/MemoryMax
+- "cgroup"  — a delegated cgroup v2 subtree written directly; the command is
+  started through `pk_governor.py exec`, which joins the group and execs
+- "nice"    — `nice` / `ionice` derived from the weights (no memory limits)
+- "none"    — unchanged
+
+The pid is preserved by all backends (each one execs), so the supervisor keeps
+watching the real process. Start the command with `Governor.env(scope)` so
+helpers it spawns know which scope they are already in.
+
+The policy is overridable in ~/.deskpi-karaoke/governor.json, e.g.
+{"backend": "nice", "scopes": {"downloads": {"cpu_weight": 20}}}.
+
+    pk_governor.py [show]
+    pk_governor.py exec SCOPE -- CMD...
+"""
+
+import copy
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+HOME = Path.home()
+POLICY_FILE = HOME / ".deskpi-karaoke" / "governor.json"
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+SCOPE_ENV = "PK_GOVERNOR_SCOPE"  # set inside a scope so nested wrappers are no-ops
+BACKEND_ENV = "PK_GOVERNOR_BACKEND"  # backend chosen by the launcher, reused without re-probing
+
+DEFAULT_POLICY = {
+    "backend": "auto",
+    "scopes": {
+        "player": {"cpu_weight": 1000, "io_weight": 1000, "memory_high": None, "memory_max": None},
+        "server": {"cpu_weight": 400, "io_weight": 400, "memory_high": "900M", "memory_max": "1400M"},
+        "downloads": {"cpu_weight": 40, "io_weight": 25, "memory_high": "400M", "memory_max": "700M"},
+        "transcode": {"cpu_weight": 10, "io_weight": 10, "memory_high": "300M", "memory_max": "600M"},
+    },
+}
+
+
+def load_policy(path: Path = POLICY_FILE) -> dict:
+    """DEFAULT_POLICY with any per-scope overrides from `path` merged in."""
+    policy = copy.deepcopy(DEFAULT_POLICY)
+    try:
+        user = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return policy
+    if not isinstance(user, dict):
+        return policy
+    policy["backend"] = user.get("backend", policy["backend"])
+    for name, limits in (user.get("scopes") or {}).items():
+        policy["scopes"].setdefault(name, {}).update(limits or {})
+    return policy
+
+
+# --- backends ---
+class NoneBackend:
+    name = "none"
+
+    def command(self, scope: str, limits: dict, argv: list) -> list:
+        return list(argv)
+
+
+class NiceBackend:
+    """Approximate weights with scheduler niceness and the I/O class.
+
+    CFS weight changes ~1.25x per nice level and 100 is nice 0; unprivileged
+    processes can only lower their priority, so weights above 100 map to 0.
+    """
+
+    name = "nice"
+
+    @staticmethod
+    def nice_for(weight: int) -> int:
+        if not weight or weight >= 100:
+            return 0
+        return min(19, int(round(math.log(100.0 / weight) / math.log(1.25))))
+
+    @staticmethod
+    def ionice_for(weight: int) -> Optional[list]:
+        if not weight or weight >= 100:
+            return None
+        if weight <= 10:
+            return ["-c", "3"]  # idle: only disk time nobody else wants
+        return ["-c", "2", "-n", str(min(7, int(round(7 * (1 - weight / 100.0)))))]
+
+    def command(self, scope: str, limits: dict, argv: list) -> list:
+        prefix = []
+        level = self.nice_for(limits.get("cpu_weight"))
+        if level and shutil.which("nice"):
+            prefix += ["nice", "-n", str(level)]
+        io = self.ionice_for(limits.get("io_weight"))
+        if io and shutil.which("ionice"):
+            prefix += ["ionice"] + io
+        return prefix + list(argv)
+
+
+class SystemdBackend:
+    name = "systemd"
+
+    @staticmethod
+    def available() -> bool:
+        if not shutil.which("systemd-run") or not os.environ.get("XDG_RUNTIME_DIR"):
+            return False
+        try:
+            state = subprocess.run(
+                ["systemctl", "--user", "is-system-running"],
+                capture_output=True, text=True, timeout=3,
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return state in ("running", "degraded", "starting")
+
+    def command(self, scope: str, limits: dict, argv: list) -> list:
+        props = []
+        if limits.get("cpu_weight"):
+            props += ["-p", f"CPUWeight={limits['cpu_weight']}"]
+        if limits.get("io_weight"):
+            props += ["-p", f"IOWeight={limits['io_weight']}"]
+        if limits.get("memory_high"):
+            props += ["-p", f"MemoryHigh={limits['memory_high']}"]
+        if limits.get("memory_max"):
+            props += ["-p", f"MemoryMax={limits['memory_max']}"]
+        return [
+            "systemd-run", "--user", "--scope", "--quiet", "--collect",
+            f"--description=deskpi-karaoke {scope}",
+        ] + props + ["--"] + list(argv)
+
+
+class CgroupBackend:
+    """cgroup v2 groups under the (delegated, writable) cgroup we run in.
+
+    cgroup v2 only lets a group hand controllers to children while it has no
+    processes of its own, so the first `setup()` moves the processes already
+    in the base group into a "launcher" leaf before enabling cpu/io/memory.
+    """
+
+    name = "cgroup"
+    CONTROLLERS = ("cpu", "io", "memory")
+
+    def __init__(self, root: Path = CGROUP_ROOT, base: Optional[Path] = None):
+        self.root = root
+        self.base = base or self._own_group()
+
+    def _own_group(self) -> Optional[Path]:
+        try:
+            for line in Path("/proc/self/cgroup").read_text().splitlines():
+                if line.startswith("0::"):
+                    group = self.root / line[3:].lstrip("/")
+                    # inside one of our own scopes: use its parent
+                    return group.parent if group.name.startswith("pk-") else group
+        except OSError:
+            pass
+        return None
+
+    def available(self) -> bool:
+        return bool(
+            self.base
+            and (self.root / "cgroup.controllers").exists()
+            and os.access(self.base / "cgroup.subtree_control", os.W_OK)
+            and os.access(self.base / "cgroup.procs", os.W_OK)
+        )
+
+    def setup(self, scope: str, limits: dict) -> Path:
+        group = self.base / f"pk-{scope}"
+        control = (self.base / "cgroup.subtree_control").read_text().split()
+        missing = [c for c in self.CONTROLLERS if c not in control]
+        if missing:
+            leaf = self.base / "pk-launcher"
+            leaf.mkdir(exist_ok=True)
+            for pid in (self.base / "cgroup.procs").read_text().split():
+                try:
+                    (leaf / "cgroup.procs").write_text(pid)
+                except OSError:
+                    pass  # exited meanwhile
+            available = (self.base / "cgroup.controllers").read_text().split()
+            for c in missing:
+                if c in available:
+                    (self.base / "cgroup.subtree_control").write_text(f"+{c}")
+        group.mkdir(exist_ok=True)
+        values = {
+            "cpu.weight": limits.get("cpu_weight"),
+            "io.weight": limits.get("io_weight"),
+            "memory.high": limits.get("memory_high"),
+            "memory.max": limits.get("memory_max"),
+        }
+        for knob, value in values.items():
+            if value and (group / knob).exists():
+                try:
+                    (group / knob).write_text(str(_bytes(value)) if knob.startswith("memory") else str(value))
+                except OSError:
+                    pass
+        return group
+
+    def enter(self, scope: str, limits: dict):
+        group = self.setup(scope, limits)
+        (group / "cgroup.procs").write_text(str(os.getpid()))
+
+    def command(self, scope: str, limits: dict, argv: list) -> list:
+        return [sys.executable, str(Path(__file__).resolve()), "exec", scope, "--"] + list(argv)
+
+
+def _bytes(value) -> int:
+    """"900M" / "1G" / 1234 → bytes."""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper()
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def select_backend(name: str = "auto"):
+    if name == "systemd" or (name == "auto" and SystemdBackend.available()):
+        return SystemdBackend()
+    cgroup = CgroupBackend()
+    if name == "cgroup" or (name == "auto" and cgroup.available()):
+        return cgroup
+    if name in ("nice", "auto"):
+        return NiceBackend()
+    return NoneBackend()
+
+
+class Governor:
+    def __init__(self, policy: Optional[dict] = None, backend=None):
+        self.policy = policy or load_policy()
+        name = os.environ.get(BACKEND_ENV) or self.policy.get("backend", "auto")
+        self.backend = backend or select_backend(name)
+
+    def limits(self, scope: str) -> dict:
+        return self.policy["scopes"].get(scope, {})
+
+    def drop_memory_limits(self, scope: str):
+        """Run `scope` without memory.high/max, e.g. when the player shares it."""
+        limits = self.policy["scopes"].get(scope)
+        if limits is not None:
+            limits.update(memory_high=None, memory_max=None)
+
+    def command(self, scope: str, argv: list) -> list:
+        """`argv` rewritten to run inside `scope` (unchanged if already there)."""
+        if os.environ.get(SCOPE_ENV) == scope or scope not in self.policy["scopes"]:
+            return list(argv)
+        return self.backend.command(scope, self.limits(scope), argv)
+
+    def env(self, scope: str, env: Optional[dict] = None) -> dict:
+        env = dict(os.environ if env is None else env)
+        env[SCOPE_ENV] = scope
+        env[BACKEND_ENV] = self.backend.name
+        return env
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["exec"] and len(argv) >= 4 and argv[2] == "--":
+        scope, cmd = argv[1], argv[3:]
+        governor = Governor(backend=CgroupBackend())
+        try:
+            governor.backend.enter(scope, governor.limits(scope))
+        except OSError as e:
+            print(f"⚠️ pk_governor: could not join scope {scope}: {e}", file=sys.stderr)
+        os.environ[SCOPE_ENV] = scope
+        os.execvp(cmd[0], cmd)
+    if argv[:1] in ([], ["show"]):
+        governor = Governor()
+        print(f"backend: {governor.backend.name}")
+        print(json.dumps(governor.policy["scopes"], indent=2))
+        return
+    raise SystemExit("usage: pk_governor.py [show] | exec SCOPE -- CMD...")
+
+
+if __name__ == "__main__":
+    main()
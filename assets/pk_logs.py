@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Bounded, rotating log pipeline for PiKaraoke.
+
+The launcher pipes the child's stdout/stderr through a reader thread that
+timestamps each line and hands it to `RotatingLog`, which:
+
+- buffers lines and writes them in batches (fewer, larger SD card writes)
+- rotates the active file once it reaches `max_segment_bytes`
+- gzips rotated segments on a low-priority background thread
+- deletes the oldest segments once the total passes `max_total_bytes`
+
+Run directly (`pk logs`) to tail, follow or grep across all segments.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+HOME = Path.home()
+LOG_DIR = HOME / ".deskpi-karaoke" / "logs"
+LOG_NAME = "pikaraoke"
+
+MAX_SEGMENT_BYTES = 1 * 1024 * 1024
+MAX_TOTAL_BYTES = 20 * 1024 * 1024
+FLUSH_BYTES = 32 * 1024
+FLUSH_INTERVAL = 5.0
+
+
+def timestamp():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RotatingLog:
+    def __init__(
+        self,
+        directory: Path = LOG_DIR,
+        name: str = LOG_NAME,
+        max_segment_bytes=MAX_SEGMENT_BYTES,
+        max_total_bytes=MAX_TOTAL_BYTES,
+        flush_bytes=FLUSH_BYTES,
+        flush_interval=FLUSH_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.path = self.directory / f"{name}.log"
+        self.max_segment_bytes = max_segment_bytes
+        self.max_total_bytes = max_total_bytes
+        self.flush_bytes = flush_bytes
+        self.lock = threading.Lock()
+        self.buf = []
+        self.buf_bytes = 0
+        try:
+            self.size = self.path.stat().st_size
+        except OSError:
+            self.size = 0
+        self.compressors = []
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(
+            target=self._flush_loop, args=(flush_interval,), daemon=True
+        )
+        self.flusher.start()
+
+    # --- writing ---
+    def write_line(self, line: str):
+        data = line if line.endswith("\n") else line + "\n"
+        with self.lock:
+            self.buf.append(data)
+            self.buf_bytes += len(data)
+            if self.buf_bytes >= self.flush_bytes:
+                self._flush_locked()
+
+    def log(self, message: str):
+        self.write_line(f"{timestamp()} {message}")
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        self.closed.set()
+        self.flush()
+        for t in list(self.compressors):
+            t.join()
+
+    def _flush_loop(self, interval):
+        while not self.closed.wait(interval):
+            self.flush()
+
+    def _flush_locked(self):
+        if not self.buf:
+            return
+        data = "".join(self.buf).encode("utf-8", errors="replace")
+        self.buf.clear()
+        self.buf_bytes = 0
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self.size += len(data)
+        if self.size >= self.max_segment_bytes:
+            self._rotate_locked()
+
+    # --- rotation ---
+    def _rotate_locked(self):
+        # Zero-padded counter keeps several rotations within a second sortable
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        n = 0
+        while True:
+            seg = self.directory / f"{self.name}.{stamp}-{n:03d}.log"
+            if not (seg.exists() or seg.with_suffix(".log.gz").exists()):
+                break
+            n += 1
+        self.path.rename(seg)
+        self.size = 0
+        t = threading.Thread(target=self._compress, args=(seg,), daemon=True)
+        self.compressors = [c for c in self.compressors if c.is_alive()] + [t]
+        t.start()
+
+    def _compress(self, seg: Path):
+        try:
+            # Lower this thread's priority only (Linux setpriority is per-thread)
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        gz = seg.with_suffix(".log.gz")
+        try:
+            with open(seg, "rb") as src, gzip.open(gz, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 256 * 1024)
+            seg.unlink()
+        except OSError:
+            gz.unlink(missing_ok=True)
+        prune_segments(self.directory, self.name, self.max_total_bytes)
+
+
+def segments(directory: Path = LOG_DIR, name: str = LOG_NAME) -> list:
+    """All log segments, oldest first, ending with the active file."""
+    rotated = [
+        p
+        for p in directory.glob(f"{name}.*.log*")
+        if p.name.endswith((".log", ".log.gz"))
+    ]
+    rotated.sort(key=lambda p: p.name.replace(".gz", ""))
+    active = directory / f"{name}.log"
+    return rotated + ([active] if active.exists() else [])
+
+
+def prune_segments(directory: Path, name: str, max_total_bytes: int):
+    segs = segments(directory, name)
+    sizes = {}
+    for p in segs:
+        try:
+            sizes[p] = p.stat().st_size
+        except FileNotFoundError:
+            continue  # compressed or pruned by another writer meanwhile
+    total = sum(sizes.values())
+    for p in segs[:-1]:
+        if total <= max_total_bytes:
+            break
+        if p not in sizes:
+            continue
+        try:
+            p.unlink()
+            total -= sizes[p]
+        except OSError:
+            pass
+
+
+def pump_lines(stream, log: RotatingLog, on_line=None):
+    """Copy a binary line stream into `log`, timestamping each line."""
+    for raw in iter(stream.readline, b""):
+        line = raw.decode("utf-8", errors="replace").rstrip("\n")
+        log.write_line(f"{timestamp()} {line}")
+        if on_line:
+            on_line(line)
+    stream.close()
+
+
+def start_pump(stream, log: RotatingLog, close_log=True, on_line=None) -> threading.Thread:
+    """Pump `stream` on a non-daemon thread, keeping the process alive until EOF."""
+
+    def target():
+        try:
+            pump_lines(stream, log, on_line)
+        finally:
+            if close_log:
+                log.close()
+
+    t = threading.Thread(target=target, name="pikaraoke-log-pump")
+    t.start()
+    return t
+
+
+# --- pk logs ---
+def _read_lines(path: Path):
+    opener = gzip.open if path.name.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def tail(n: int, directory: Path = LOG_DIR, name: str = LOG_NAME) -> list:
+    out = []
+    for seg in reversed(segments(directory, name)):
+        out = _read_lines(seg) + out
+        if len(out) >= n:
+            break
+    return out[-n:] if n > 0 else []
+
+
+def grep(pattern: str, directory: Path = LOG_DIR, name: str = LOG_NAME, ignore_case=False):
+    rx = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    for seg in segments(directory, name):
+        for line in _read_lines(seg):
+            if rx.search(line):
+                yield line
+
+
+def follow(directory: Path = LOG_DIR, name: str = LOG_NAME, interval=0.5):
+    path = directory / f"{name}.log"
+    pos = path.stat().st_size if path.exists() else 0
+    inode = path.stat().st_ino if path.exists() else None
+    while True:
+        try:
+            st = path.stat()
+        except OSError:
+            time.sleep(interval)
+            continue
+        if st.st_ino != inode or st.st_size < pos:
+            inode, pos = st.st_ino, 0  # rotated
+        if st.st_size > pos:
+            with open(path, "rb") as f:
+                f.seek(pos)
+                data = f.read()
+            pos += len(data)
+            sys.stdout.write(data.decode("utf-8", errors="replace"))
+            sys.stdout.flush()
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pk logs", description="Show PiKaraoke logs")
+    parser.add_argument("-n", "--lines", type=int, default=50, help="Lines to show (default 50)")
+    parser.add_argument("-f", "--follow", action="store_true", help="Keep printing new lines")
+    parser.add_argument("-g", "--grep", metavar="REGEX", help="Search all segments")
+    parser.add_argument("-i", "--ignore-case", action="store_true", help="Case-insensitive --grep")
+    parser.add_argument("--dir", type=Path, default=LOG_DIR, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.grep:
+        for line in grep(args.grep, args.dir, ignore_case=args.ignore_case):
+            print(line)
+        return
+    for line in tail(args.lines, args.dir):
+        print(line)
+    if args.follow:
+        try:
+            follow(args.dir)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
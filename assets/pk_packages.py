@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Python package pins and the offline wheelhouse, shared by install.py (first
+venv, `--refresh-wheelhouse`) and venv_slots.py (background updates).
+
+The wheelhouse under ~/.deskpi-karaoke/wheelhouse holds wheels for PKG_CORE
+plus a lock.json recording the pins, interpreter and machine it was built
+for, and a --require-hashes requirements file. A venv may install from it
+with --no-index only when all three still match.
+"""
+
+import json
+import platform
+from pathlib import Path
+from typing import Callable, List, Optional
+
+HOME = Path.home()
+WHEELHOUSE_DIR = HOME / ".deskpi-karaoke" / "wheelhouse"
+WHEELHOUSE_LOCK = WHEELHOUSE_DIR / "lock.json"
+WHEELHOUSE_REQS = WHEELHOUSE_DIR / "requirements.lock"
+
+PIKARAOKE_VERSION = "1.18.0"  # pinned: 1.19.0 has breaking splash screen bug
+
+PKG_CORE = [
+    "pip>=24.0",
+    "setuptools>=68",
+    "wheel",
+    "packaging>=24.0",
+    "yt-dlp",
+    f"pikaraoke=={PIKARAOKE_VERSION}",
+]
+
+
+def pyvenv_version(venv_dir: Path) -> str:
+    """Interpreter version recorded in a venv's pyvenv.cfg (no subprocess)."""
+    try:
+        for line in (venv_dir / "pyvenv.cfg").read_text().splitlines():
+            key, _, value = line.partition("=")
+            if key.strip() in ("version", "version_info"):
+                return value.strip()
+    except OSError:
+        pass
+    return ""
+
+
+def load_wheelhouse_lock() -> Optional[dict]:
+    try:
+        return json.loads(WHEELHOUSE_LOCK.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def wheelhouse_usable(python_version: str, log: Callable[[str], None] = print) -> bool:
+    """True if the wheelhouse matches the current pins, `python_version` and machine."""
+    lock = load_wheelhouse_lock()
+    if not lock or not WHEELHOUSE_REQS.exists():
+        return False
+    if lock.get("requirements") != PKG_CORE:
+        log("ℹ️  Wheelhouse was built for different pins; using the package index.")
+        return False
+    if lock.get("python") != python_version or lock.get("machine") != platform.machine():
+        log("ℹ️  Wheelhouse was built for another interpreter/machine; using the package index.")
+        return False
+    return all((WHEELHOUSE_DIR / p["file"]).exists() for p in lock["packages"])
+
+
+def wheelhouse_install_args() -> List[str]:
+    return [
+        "install",
+        "--no-index",
+        "--find-links",
+        str(WHEELHOUSE_DIR),
+        "--require-hashes",
+        "-r",
+        str(WHEELHOUSE_REQS),
+    ]
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Lightweight supervisor for the PiKaraoke server process.
+
+- waits for the local web port to answer before reporting "ready"
+- samples the child's RSS and CPU from /proc every poll
+- restarts the child with exponential backoff when it exits with an error,
+  never becomes ready, or passes the memory ceiling
+- writes its state to a small JSON status file (on tmpfs when available)
+
+The child is created by a `spawn()` callable returning anything Popen-like
+(`pid`, `poll()`, `terminate()`, `kill()`, `wait(timeout)`), and `/proc` is
+configurable, so the loop can be exercised with a fake child and a local
+stand-in HTTP server.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+HOME = Path.home()
+_RUNTIME = os.environ.get("XDG_RUNTIME_DIR")
+STATUS_DIR = Path(_RUNTIME) / "deskpi-karaoke" if _RUNTIME else HOME / ".deskpi-karaoke"
+STATUS_FILE = STATUS_DIR / "supervisor.json"
+
+READY_URL = "http://localhost:5555"
+READY_TIMEOUT = 120
+RSS_LIMIT_MB = 1200
+POLL_INTERVAL = 2.0
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+STABLE_AFTER = 120.0  # a child that ran this long resets the backoff
+STOP_GRACE = 10.0
+
+
+def http_ready(url: str, timeout: float = 2.0) -> bool:
+    """True if anything answers HTTP at `url` (error statuses count as up)."""
+    import urllib.error  # deferred: costly to import, and first used after spawn
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(url, timeout=timeout):
+            return True
+    except urllib.error.HTTPError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def http_json(url: str, timeout: float = 2.0):
+    """Decoded JSON body of a GET to `url`, or None if unreachable/invalid."""
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            return json.load(r)
+    except (OSError, ValueError):
+        return None
+
+
+class ProcStats:
+    """RSS and CPU% of one pid, read from /proc/<pid>/{status,stat}."""
+
+    def __init__(self, proc_root: Path = Path("/proc")):
+        self.proc_root = proc_root
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.last = None  # (pid, cpu_ticks, monotonic)
+
+    def rss_mb(self, pid: int) -> Optional[float]:
+        try:
+            for line in (self.proc_root / str(pid) / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def cpu_percent(self, pid: int) -> Optional[float]:
+        try:
+            stat = (self.proc_root / str(pid) / "stat").read_text()
+            # Fields after the ")" of comm; utime/stime are fields 14/15
+            fields = stat.rsplit(")", 1)[1].split()
+            cpu = int(fields[11]) + int(fields[12])
+        except (OSError, ValueError, IndexError):
+            return None
+        now = time.monotonic()
+        prev, self.last = self.last, (pid, cpu, now)
+        if not prev or prev[0] != pid or now <= prev[2]:
+            return None
+        return round(100.0 * (cpu - prev[1]) / self.ticks / (now - prev[2]), 1)
+
+
+class Supervisor:
+    def __init__(
+        self,
+        spawn: Callable[[], object],
+        ready_check: Callable[[], bool] = lambda: http_ready(READY_URL),
+        status_file: Path = STATUS_FILE,
+        rss_limit_mb: float = RSS_LIMIT_MB,
+        ready_timeout: float = READY_TIMEOUT,
+        poll_interval: float = POLL_INTERVAL,
+        backoff_initial: float = BACKOFF_INITIAL,
+        backoff_max: float = BACKOFF_MAX,
+        stable_after: float = STABLE_AFTER,
+        restart_on_clean_exit: bool = False,
+        proc_root: Path = Path("/proc"),
+        on_event: Optional[Callable[..., None]] = None,
+    ):
+        self.spawn = spawn
+        self.ready_check = ready_check
+        self.status_file = status_file
+        self.rss_limit_mb = rss_limit_mb
+        self.ready_timeout = ready_timeout
+        self.poll_interval = poll_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.restart_on_clean_exit = restart_on_clean_exit
+        self.stats = ProcStats(proc_root)
+        self.on_event = on_event
+        self.stopping = threading.Event()
+        self.child = None
+        self.status = {
+            "state": "idle",
+            "pid": None,
+            "starts": 0,
+            "restarts": 0,
+            "last_exit": None,
+            "last_restart_reason": None,
+            "rss_mb": None,
+            "cpu_percent": None,
+            "ready_since": None,
+        }
+
+    # --- status ---
+    def _event(self, name, **data):
+        if self.on_event:
+            try:
+                self.on_event(name, **data)
+            except Exception:
+                pass
+
+    def _set(self, **changes):
+        self.status.update(changes)
+        self.status["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.status_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.status_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.status, indent=2) + "\n")
+            tmp.replace(self.status_file)
+        except OSError:
+            pass
+
+    # --- child control ---
+    def _stop_child(self):
+        child, self.child = self.child, None
+        if child is None or child.poll() is not None:
+            return
+        child.terminate()
+        try:
+            child.wait(timeout=STOP_GRACE)
+        except Exception:
+            child.kill()
+            try:
+                child.wait(timeout=STOP_GRACE)
+            except Exception:
+                pass
+
+    def stop(self):
+        self.stopping.set()
+
+    def backoff_delay(self, failures: int) -> float:
+        if failures <= 0:
+            return 0.0
+        return min(self.backoff_max, self.backoff_initial * (2 ** (failures - 1)))
+
+    def _watch_once(self) -> Optional[str]:
+        """Watch the current child until it needs restarting; return the reason
+        (None means stop supervising)."""
+        started = time.monotonic()
+        ready = False
+        while not self.stopping.is_set():
+            code = self.child.poll()
+            if code is not None:
+                self._set(state="exited", pid=None, last_exit=code)
+                self._event("child_exit", code=code)
+                if code == 0 and not self.restart_on_clean_exit:
+                    return None
+                return f"exit {code}"
+            pid = self.child.pid
+            rss = self.stats.rss_mb(pid)
+            cpu = self.stats.cpu_percent(pid)
+            if not ready:
+                if self.ready_check():
+                    ready = True
+                    self._set(state="ready", ready_since=time.strftime("%Y-%m-%d %H:%M:%S"))
+                    self._event("ready", after=round(time.monotonic() - started, 3))
+                elif time.monotonic() - started > self.ready_timeout:
+                    return "not ready"
+            if rss is not None and rss > self.rss_limit_mb:
+                self._event("rss_limit", rss_mb=round(rss, 1))
+                return f"rss {rss:.0f} MB > {self.rss_limit_mb:.0f} MB"
+            if ready:
+                self._set(rss_mb=None if rss is None else round(rss, 1), cpu_percent=cpu)
+            # Poll fast until ready so readiness is reported promptly
+            self.stopping.wait(self.poll_interval if ready else min(0.25, self.poll_interval))
+        return None
+
+    def run(self):
+        """Supervise until stop() or a clean exit. Blocks."""
+        failures = 0
+        try:
+            while not self.stopping.is_set():
+                self._set(state="starting", ready_since=None)
+                try:
+                    self.child = self.spawn()
+                except Exception as e:
+                    self._event("spawn_failed", error=str(e))
+                    reason = f"spawn failed: {e}"
+                    started = time.monotonic()
+                else:
+                    self.status["starts"] += 1
+                    self._set(state="starting", pid=self.child.pid)
+                    self._event("spawn", pid=self.child.pid)
+                    started = time.monotonic()
+                    reason = self._watch_once()
+                    if reason is None:
+                        break
+                self._stop_child()
+                failures = 1 if time.monotonic() - started >= self.stable_after else failures + 1
+                delay = self.backoff_delay(failures)
+                self.status["restarts"] += 1
+                self._set(state="backoff", pid=None, last_restart_reason=reason)
+                self._event("restart", reason=reason, delay=delay)
+                self.stopping.wait(delay)
+        finally:
+            self._stop_child()
+            self._set(state="stopped", pid=None)
+
+
+def read_status(path: Path = STATUS_FILE) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+if __name__ == "__main__":
+    print(json.dumps(read_status(), indent=2))
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Thermal-aware fan control for the DeskPi Lite 4.
+
+Long sessions (downloads, merges, transcodes and Chromium video at once) push
+the Pi 4 into its soft thermal limit, the firmware caps the clock and playback
+drops frames. This controller, run by the launcher, keeps the case fan ahead
+of that:
+
+- reads the SoC temperature (/sys/class/thermal), the current/max CPU clock
+  (cpufreq) and the firmware throttle flags (get_throttled)
+- drives the DeskPi fan over its USB serial port (`pwm_000`–`pwm_100` on
+  /dev/ttyUSB0) from a fan curve fed with the temperature projected
+  `lookahead` seconds ahead from the recent trend, not the current reading
+- ramps up as soon as known heavy work starts: the normalizer and the yt-dlp
+  merge step announce themselves with `announce()` (a file in the runtime
+  directory, so any process can), before the heat shows up
+- reports throttle flag changes as events, which the launcher records in the
+  boot timeline (`pk boot-report`); state is published for `pk thermal`
+
+The sysfs root and fan device are configurable, so the controller runs
+against a fake sysfs tree and a plain file (see bench/thermal_bench.py). When
+the DeskPi vendor daemon (deskpi.service) is active it owns the fan and this
+controller only monitors. Settings can be overridden in
+~/.deskpi-karaoke/thermal.json, e.g. {"curve": [[50, 0], [55, 40], [65, 100]]}.
+
+    pk_thermal.py [status|watch]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+HOME = Path.home()
+_RUNTIME = os.environ.get("XDG_RUNTIME_DIR")
+STATUS_DIR = Path(_RUNTIME) / "deskpi-karaoke" if _RUNTIME else HOME / ".deskpi-karaoke"
+STATUS_FILE = STATUS_DIR / "thermal.json"
+HINT_DIR = STATUS_DIR / "heavy"
+CONFIG_FILE = HOME / ".deskpi-karaoke" / "thermal.json"
+
+DEFAULT_CONFIG = {
+    "fan": "auto",  # auto: drive the fan unless deskpi.service does; off: monitor only
+    "fan_device": "/dev/ttyUSB0",
+    "sysfs_root": "/",
+    "curve": [[45, 0], [50, 30], [60, 60], [68, 100]],  # (°C, PWM %), linear in between
+    "min_on": 25,  # the fan stalls below this duty
+    "hysteresis": 2.0,  # °C below the step-up point before slowing down again
+    "lookahead": 20.0,  # seconds the temperature trend is projected forward
+    "hint_boost": 8.0,  # °C added to the projection while heavy work is announced
+    "interval": 2.0,
+}
+TREND_WINDOW = 30.0
+PWM_STEP = 5  # smaller changes are not sent to the fan
+THROTTLE_FLAGS = {0: "under_voltage", 1: "freq_capped", 2: "throttled", 3: "soft_temp_limit"}
+THERMAL_ZONE = "sys/class/thermal/thermal_zone0/temp"
+CPUFREQ = "sys/devices/system/cpu/cpu0/cpufreq"
+GET_THROTTLED = "sys/devices/platform/soc/soc:firmware/get_throttled"
+
+
+def load_config(path: Path = CONFIG_FILE) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    try:
+        user = json.loads(path.read_text())
+        if isinstance(user, dict):
+            config.update({k: v for k, v in user.items() if k in DEFAULT_CONFIG})
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+# --- heavy-work hints ---
+def announce(kind: str, seconds: float, hint_dir: Path = HINT_DIR):
+    """Tell the fan controller that `kind` of heavy work runs for ~`seconds`.
+
+    The hint is a file whose mtime is its expiry; never raises.
+    """
+    try:
+        hint_dir.mkdir(parents=True, exist_ok=True)
+        path = hint_dir / f"{kind}-{os.getpid()}"
+        path.touch()
+        until = time.time() + max(1.0, seconds)
+        os.utime(path, (until, until))
+    except OSError:
+        pass
+
+
+def active_hints(hint_dir: Path = HINT_DIR, now: Optional[float] = None) -> List[str]:
+    """Kinds of heavy work announced and not yet expired; expired hints are removed."""
+    now = time.time() if now is None else now
+    kinds = []
+    try:
+        entries = list(os.scandir(hint_dir))
+    except OSError:
+        return kinds
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime > now:
+                kinds.append(entry.name.rsplit("-", 1)[0])
+            else:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+    return sorted(set(kinds))
+
+
+# --- hardware ---
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+class Sysfs:
+    """Temperature, clock and throttle readings under a (possibly fake) root."""
+
+    def __init__(self, root: Path = Path("/")):
+        self.root = Path(root)
+
+    def temperature(self) -> Optional[float]:
+        raw = _read(self.root / THERMAL_ZONE)
+        try:
+            return int(raw) / 1000.0
+        except (TypeError, ValueError):
+            return None
+
+    def cpu_mhz(self) -> Tuple[Optional[int], Optional[int]]:
+        """(current, maximum) clock of cpu0 in MHz."""
+        values = []
+        for name in ("scaling_cur_freq", "cpuinfo_max_freq"):
+            raw = _read(self.root / CPUFREQ / name)
+            try:
+                values.append(int(raw) // 1000)
+            except (TypeError, ValueError):
+                values.append(None)
+        return values[0], values[1]
+
+    def throttled(self) -> Optional[int]:
+        """Firmware throttle bitmask (bits 0–3 now, 16–19 since boot)."""
+        raw = _read(self.root / GET_THROTTLED)
+        try:
+            return int(raw, 16)
+        except (TypeError, ValueError):
+            return None
+
+
+class FanPort:
+    """DeskPi fan on its USB serial port (9600 8N1); a plain file works too."""
+
+    def __init__(self, device: Path):
+        self.device = Path(device)
+        self.fd: Optional[int] = None
+
+    def _open(self):
+        self.fd = os.open(self.device, os.O_WRONLY | os.O_NOCTTY | (os.O_APPEND if self.device.is_file() else 0))
+        if os.isatty(self.fd):
+            import termios
+
+            attrs = termios.tcgetattr(self.fd)
+            attrs[0] = 0  # iflag
+            attrs[1] = 0  # oflag: raw
+            attrs[2] = termios.CS8 | termios.CREAD | termios.CLOCAL
+            attrs[3] = 0  # lflag
+            attrs[4] = attrs[5] = termios.B9600
+            termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+
+    def set(self, pwm: int) -> bool:
+        try:
+            if self.fd is None:
+                self._open()
+            os.write(self.fd, f"pwm_{max(0, min(100, pwm)):03d}".encode())
+            return True
+        except OSError:
+            self.close()  # unplugged: reopen on the next change
+            return False
+
+    def close(self):
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = None
+
+
+def vendor_daemon_active() -> bool:
+    try:
+        return subprocess.run(["systemctl", "is-active", "--quiet", "deskpi.service"],
+                              check=False, timeout=5).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def fan_curve(temp: float, curve: list) -> int:
+    """PWM % for `temp`, linear between the curve's points."""
+    points = sorted((float(t), float(p)) for t, p in curve)
+    if temp <= points[0][0]:
+        return int(points[0][1])
+    for (t0, p0), (t1, p1) in zip(points, points[1:]):
+        if temp <= t1:
+            return int(round(p0 + (p1 - p0) * (temp - t0) / (t1 - t0)))
+    return int(points[-1][1])
+
+
+class ThermalController:
+    def __init__(
+        self,
+        sysfs: Optional[Sysfs] = None,
+        fan: Optional[FanPort] = None,
+        config: Optional[dict] = None,
+        hint_dir: Path = HINT_DIR,
+        status_file: Optional[Path] = STATUS_FILE,
+        on_event: Optional[Callable[..., None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+        log: Callable[[str], None] = print,
+    ):
+        self.config = config or load_config()
+        self.sysfs = sysfs or Sysfs(Path(self.config["sysfs_root"]))
+        self.fan = fan
+        self.hint_dir = hint_dir
+        self.status_file = status_file
+        self.on_event = on_event
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.log = log
+        self.history: deque = deque()  # (t, °C)
+        self.pwm: Optional[int] = None
+        self.flags = 0
+        self.status: dict = {}
+        self.stopping = threading.Event()
+
+    def _event(self, name, **data):
+        if self.on_event:
+            try:
+                self.on_event(name, **data)
+            except Exception:
+                pass
+
+    def slope(self) -> float:
+        """°C per second over the trend window (least squares)."""
+        if len(self.history) < 3:
+            return 0.0
+        n = len(self.history)
+        mt = sum(t for t, _ in self.history) / n
+        mc = sum(c for _, c in self.history) / n
+        var = sum((t - mt) ** 2 for t, _ in self.history)
+        if var <= 0:
+            return 0.0
+        return sum((t - mt) * (c - mc) for t, c in self.history) / var
+
+    def target(self, temp: float, hints: list) -> Tuple[int, float]:
+        """(PWM %, temperature the curve was read at)."""
+        cfg = self.config
+        projected = temp + max(0.0, self.slope()) * cfg["lookahead"]
+        if hints:
+            projected += cfg["hint_boost"]
+        pwm = fan_curve(projected, cfg["curve"])
+        if self.pwm is not None and pwm < self.pwm:
+            # slow down only once clearly below the point that sped us up
+            pwm = max(pwm, min(self.pwm, fan_curve(projected + cfg["hysteresis"], cfg["curve"])))
+        if 0 < pwm < cfg["min_on"]:
+            pwm = cfg["min_on"]
+        return pwm, round(projected, 1)
+
+    def step(self) -> dict:
+        now = self.clock()
+        temp = self.sysfs.temperature()
+        cur_mhz, max_mhz = self.sysfs.cpu_mhz()
+        flags = self.sysfs.throttled()
+        hints = active_hints(self.hint_dir, self.wall_clock())
+        if temp is not None:
+            self.history.append((now, temp))
+            while self.history and now - self.history[0][0] > TREND_WINDOW:
+                self.history.popleft()
+
+        if flags is not None:
+            current = flags & 0xF
+            raised = [THROTTLE_FLAGS[b] for b in THROTTLE_FLAGS if current & (1 << b) and not self.flags & (1 << b)]
+            cleared = [THROTTLE_FLAGS[b] for b in THROTTLE_FLAGS if self.flags & (1 << b) and not current & (1 << b)]
+            if raised:
+                self.log(f"🌡️ throttling: {', '.join(raised)} at {temp}°C, {cur_mhz} MHz")
+                self._event("throttle", flags=raised, temp=temp, mhz=cur_mhz, pwm=self.pwm, hints=hints)
+            if cleared:
+                self._event("throttle_clear", flags=cleared, temp=temp, mhz=cur_mhz)
+            self.flags = current
+
+        projected = None
+        if temp is not None:
+            pwm, projected = self.target(temp, hints)
+            if self.fan is not None and (
+                self.pwm is None or abs(pwm - self.pwm) >= PWM_STEP or (pwm != self.pwm and pwm in (0, 100))
+            ):
+                if self.fan.set(pwm):
+                    self.pwm = pwm
+        self.status = {
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "temp_c": temp,
+            "trend_c_per_min": round(self.slope() * 60, 2),
+            "projected_c": projected,
+            "pwm": self.pwm,
+            "fan": "controlled" if self.fan is not None else "monitor only",
+            "cpu_mhz": cur_mhz,
+            "max_mhz": max_mhz,
+            "throttle_flags": [THROTTLE_FLAGS[b] for b in THROTTLE_FLAGS if self.flags & (1 << b)],
+            "throttled_since_boot": bool(flags and flags >> 16 & 0xF),
+            "hints": hints,
+        }
+        self.publish()
+        return self.status
+
+    def publish(self):
+        if self.status_file is None:
+            return
+        try:
+            self.status_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.status_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.status, indent=2) + "\n")
+            tmp.replace(self.status_file)
+        except OSError:
+            pass
+
+    def claim_fan(self):
+        """Take the fan unless configured off or the vendor daemon drives it."""
+        if self.fan is None and self.config["fan"] != "off" and not vendor_daemon_active():
+            self.fan = FanPort(Path(self.config["fan_device"]))
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                self.step()
+            except Exception as e:  # a bad reading must not stop fan control
+                self.log(f"⚠️ thermal: {e}")
+            self.stopping.wait(self.config["interval"])
+
+    def start(self) -> Optional[threading.Thread]:
+        if self.sysfs.temperature() is None:
+            return None  # no thermal zone: not a Pi (or not this one)
+        self.claim_fan()
+        t = threading.Thread(target=self.run, name="thermal", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        """Stop controlling; the fan keeps its last speed."""
+        self.stopping.set()
+        if self.fan is not None:
+            self.fan.close()
+
+
+def read_status(path: Path = STATUS_FILE) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    if cmd == "status":
+        status = read_status()
+        if not status:
+            print("No thermal status (is the launcher running on a Pi?)")
+            return 0
+        print(f"🌡️ {status['temp_c']}°C ({status['trend_c_per_min']:+.1f}°C/min, "
+              f"projected {status['projected_c']}°C), fan {status['pwm']}% ({status['fan']})")
+        print(f"   CPU {status['cpu_mhz']}/{status['max_mhz']} MHz, "
+              f"throttle: {', '.join(status['throttle_flags']) or 'none'}"
+              f"{' (has throttled since boot)' if status['throttled_since_boot'] else ''}")
+        if status["hints"]:
+            print(f"   heavy work: {', '.join(status['hints'])}")
+        return 0
+    if cmd == "watch":
+        # Foreground controller, e.g. when the launcher is not running
+        controller = ThermalController(status_file=None, on_event=lambda n, **d: print(n, d))
+        controller.claim_fan()
+        try:
+            while True:
+                s = controller.step()
+                print(f"{s['temp_c']}°C → {s['projected_c']}°C projected, fan {s['pwm']}%, "
+                      f"{s['cpu_mhz']} MHz {' '.join(s['throttle_flags'])} {' '.join(s['hints'])}")
+                time.sleep(controller.config["interval"])
+        except KeyboardInterrupt:
+            controller.stop()
+        return 0
+    raise SystemExit("usage: pk_thermal.py [status|watch]")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+First-time Wi-Fi setup for a box at a new venue.
+
+When the launcher finds no network at all, it runs this package as root
+(`python3 -m raspi_portal`): a single asyncio service that scans once, opens
+an access point (hostapd + dnsmasq), serves the setup page and the OS
+captive-portal probes, and on submit switches wlan0 back to client mode via
+NetworkManager and verifies the uplink.
+"""
+
+import asyncio
+
+from .netctl import Dnsmasq, Hostapd, IpAddr, Nmcli
+from .portal import AP_SSID, Portal
+from .web import PortalHTTP
+
+__all__ = ["AP_SSID", "Dnsmasq", "Hostapd", "IpAddr", "Nmcli", "Portal", "PortalHTTP", "needs_setup"]
+
+
+def needs_setup(iface: str = "wlan0", nmcli: Nmcli = None) -> bool:
+    """True if `iface` is a Wi-Fi device and no device is connected at all
+    (a LAN without uplink is fine: PiKaraoke runs offline there)."""
+    states = asyncio.run((nmcli or Nmcli()).device_states())
+    if states.get(iface, ("", ""))[0] != "wifi":
+        return False
+    return not any(state.startswith("connected") for kind, state in states.values() if kind != "loopback")
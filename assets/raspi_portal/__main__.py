@@ -0,0 +1,55 @@
+"""
+python3 -m raspi_portal [--iface wlan0] [--port 80] [--status-file PATH] [--timeout SECONDS]
+
+Needs root (hostapd, dnsmasq, port 80). Exit status: 0 joined a network with
+internet, 3 joined but no internet, 1 timed out or failed.
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+from . import AP_SSID, Hostapd, Portal, PortalHTTP
+
+EXIT_NO_UPLINK = 3
+
+
+async def serve(args) -> int:
+    portal = Portal(iface=args.iface, ap_ssid=args.ssid, hostapd=Hostapd(args.ssid, country=args.country),
+                    status_file=args.status_file)
+    http = PortalHTTP(portal, port=args.port)
+    await http.start()
+    task = asyncio.create_task(portal.run(timeout=args.timeout or None))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        joined = await task
+    except asyncio.CancelledError:
+        joined = False
+    except RuntimeError as e:
+        print(f"❌ portal: {e}", file=sys.stderr)
+        joined = False
+    finally:
+        await http.stop()
+    if not joined:
+        return 1
+    return 0 if portal.switch.get("online") else EXIT_NO_UPLINK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="raspi_portal", description="Captive portal for Wi-Fi setup")
+    parser.add_argument("--iface", default="wlan0")
+    parser.add_argument("--ssid", default=AP_SSID, help="Name of the setup network (default: %(default)s)")
+    parser.add_argument("--country", help="Regulatory country code for the AP, e.g. US")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--status-file", type=Path)
+    parser.add_argument("--timeout", type=float, default=0, help="Give up after this many seconds (0: never)")
+    args = parser.parse_args(argv)
+    return asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
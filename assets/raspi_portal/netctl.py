@@ -0,0 +1,226 @@
+"""
+Async wrappers around the system tools the portal drives: nmcli, ip,
+hostapd and dnsmasq.
+
+Each wrapper is a small class with async methods, so the portal can be given
+stand-ins (see bench/fakes/fake_portal_net.py) and its state machine and HTTP
+layer run on any Linux box without Wi-Fi hardware or root.
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+AP_ADDRESS = "10.42.0.1"
+AP_PREFIX = 24
+DHCP_RANGE = ("10.42.0.10", "10.42.0.100")
+CONNECT_TIMEOUT = 30  # nmcli --wait for association + DHCP
+DAEMON_READY_TIMEOUT = 10.0
+STOP_GRACE = 5.0
+
+
+async def run(*cmd: str, timeout: float = 30.0) -> Tuple[int, str, str]:
+    """(returncode, stdout, stderr) of a short command; 124 on timeout."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        return 127, "", str(e)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return 124, "", f"{cmd[0]}: timed out after {timeout:.0f}s"
+    return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+
+def split_terse(line: str) -> List[str]:
+    """Fields of one `nmcli -t` line (":" separated, "\\:" and "\\\\" escaped)."""
+    fields, cur, escaped = [], [], False
+    for ch in line:
+        if escaped:
+            cur.append(ch)
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == ":":
+            fields.append("".join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    fields.append("".join(cur))
+    return fields
+
+
+class Nmcli:
+    def __init__(self, binary: str = "nmcli", runner=run):
+        self.binary = binary
+        self.run = runner
+
+    async def scan(self, iface: str) -> List[dict]:
+        """Visible networks, one entry per SSID (strongest), strongest first."""
+        rc, out, _ = await self.run(
+            self.binary, "-t", "-f", "SSID,SIGNAL,SECURITY", "device", "wifi", "list",
+            "ifname", iface, "--rescan", "yes", timeout=20,
+        )
+        best: Dict[str, dict] = {}
+        for line in out.splitlines() if rc == 0 else []:
+            fields = split_terse(line)
+            if len(fields) < 3 or not fields[0]:
+                continue
+            ssid, signal, security = fields[0], int(fields[1] or 0), fields[2].strip()
+            if ssid not in best or signal > best[ssid]["signal"]:
+                best[ssid] = {"ssid": ssid, "signal": signal,
+                              "secure": bool(security and security != "--")}
+        return sorted(best.values(), key=lambda n: -n["signal"])
+
+    async def device_states(self) -> Dict[str, Tuple[str, str]]:
+        """{device: (type, state)}, e.g. {"wlan0": ("wifi", "disconnected")}."""
+        rc, out, _ = await self.run(self.binary, "-t", "-f", "DEVICE,TYPE,STATE", "device", timeout=10)
+        states = {}
+        for line in out.splitlines() if rc == 0 else []:
+            fields = split_terse(line)
+            if len(fields) >= 3:
+                states[fields[0]] = (fields[1], fields[2])
+        return states
+
+    async def set_managed(self, iface: str, managed: bool):
+        await self.run(self.binary, "device", "set", iface, "managed", "yes" if managed else "no", timeout=10)
+
+    async def connect(self, iface: str, ssid: str, psk: str = "") -> Tuple[bool, str]:
+        cmd = [self.binary, "--wait", str(CONNECT_TIMEOUT), "device", "wifi", "connect", ssid]
+        if psk:
+            cmd += ["password", psk]
+        rc, out, err = await self.run(*cmd, "ifname", iface, timeout=CONNECT_TIMEOUT + 10)
+        message = (err or out).strip().splitlines()
+        return rc == 0, message[-1] if message else f"nmcli exit {rc}"
+
+    async def forget(self, ssid: str):
+        await self.run(self.binary, "connection", "delete", "id", ssid, timeout=10)
+
+
+class IpAddr:
+    def __init__(self, binary: str = "ip", runner=run):
+        self.binary = binary
+        self.run = runner
+
+    async def up(self, iface: str, address: str = AP_ADDRESS, prefix: int = AP_PREFIX):
+        await self.run(self.binary, "addr", "flush", "dev", iface)
+        await self.run(self.binary, "addr", "add", f"{address}/{prefix}", "dev", iface)
+        await self.run(self.binary, "link", "set", iface, "up")
+
+    async def flush(self, iface: str):
+        await self.run(self.binary, "addr", "flush", "dev", iface)
+
+
+class Daemon:
+    """A long-running helper (hostapd, dnsmasq) owned by the portal."""
+
+    name = "daemon"
+    ready_marker: Optional[str] = None  # output line meaning "up"; None: alive after a moment
+
+    def __init__(self, binary: str):
+        self.binary = binary
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self._workdir: Optional[Path] = None
+        self.output: List[str] = []
+
+    @property
+    def workdir(self) -> Path:
+        if self._workdir is None:
+            self._workdir = Path(tempfile.mkdtemp(prefix=f"pk-portal-{self.name}-"))
+        return self._workdir
+
+    def command(self, iface: str) -> List[str]:
+        raise NotImplementedError
+
+    @property
+    def running(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self, iface: str):
+        await self.stop()
+        self.output = []
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.command(iface), stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        ready = asyncio.get_running_loop().create_future()
+        asyncio.create_task(self._pump(ready))
+        if self.ready_marker:
+            await asyncio.wait({ready}, timeout=DAEMON_READY_TIMEOUT)
+        else:
+            await asyncio.sleep(0.5)
+        if not self.running or (self.ready_marker and not (ready.done() and ready.result())):
+            tail = " | ".join(self.output[-3:])
+            await self.stop()
+            raise RuntimeError(f"{self.name} did not start: {tail or 'no output'}")
+
+    async def _pump(self, ready: asyncio.Future):
+        async for raw in self.proc.stdout:
+            line = raw.decode(errors="replace").rstrip()
+            self.output = (self.output + [line])[-20:]
+            if self.ready_marker and self.ready_marker in line and not ready.done():
+                ready.set_result(True)
+        if not ready.done():
+            ready.set_result(False)  # exited before it was ready
+
+    async def stop(self):
+        proc, self.proc = self.proc, None
+        if proc is None or proc.returncode is not None:
+            return
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), STOP_GRACE)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+
+class Hostapd(Daemon):
+    name = "hostapd"
+    ready_marker = "AP-ENABLED"
+
+    def __init__(self, ssid: str, channel: int = 6, country: Optional[str] = None, binary: str = "hostapd"):
+        super().__init__(binary)
+        self.ssid = ssid
+        self.channel = channel
+        self.country = country
+
+    def config(self, iface: str) -> str:
+        lines = [f"interface={iface}", "driver=nl80211", f"ssid={self.ssid}", "hw_mode=g",
+                 f"channel={self.channel}", "auth_algs=1", "wmm_enabled=1", "ignore_broadcast_ssid=0"]
+        if self.country:
+            lines += [f"country_code={self.country}", "ieee80211d=1"]
+        return "\n".join(lines) + "\n"
+
+    def command(self, iface: str) -> List[str]:
+        conf = self.workdir / "hostapd.conf"
+        conf.write_text(self.config(iface))
+        return [self.binary, str(conf)]
+
+
+class Dnsmasq(Daemon):
+    """DHCP for AP clients; every DNS name resolves to the portal."""
+
+    name = "dnsmasq"
+
+    def __init__(self, address: str = AP_ADDRESS, dhcp_range: Tuple[str, str] = DHCP_RANGE,
+                 binary: str = "dnsmasq"):
+        super().__init__(binary)
+        self.address = address
+        self.dhcp_range = dhcp_range
+
+    def command(self, iface: str) -> List[str]:
+        return [
+            self.binary, "--keep-in-foreground", "--log-facility=-", "--conf-file=/dev/null",
+            f"--interface={iface}", "--bind-interfaces", f"--listen-address={self.address}",
+            "--no-resolv", "--no-hosts", f"--address=/#/{self.address}",
+            f"--dhcp-range={self.dhcp_range[0]},{self.dhcp_range[1]},255.255.255.0,5m",
+            f"--dhcp-option=114,http://{self.address}/",  # RFC 8910 captive-portal URI
+            f"--dhcp-leasefile={self.workdir / 'leases'}",
+        ]
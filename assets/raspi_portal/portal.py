@@ -0,0 +1,181 @@
+"""
+Captive-portal state machine: AP mode until someone picks a network, then
+client mode with a verified uplink.
+
+    idle → scanning → ap → switching → verifying → connected
+                      ↑__________|  (wrong password, no association)
+
+Networks are scanned once, before the access point takes over the radio, and
+the cached list is served from then on. A switch is timed per phase (AP down,
+association, uplink) and the result is written to the status file, which the
+launcher turns into boot-timeline events.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from .netctl import AP_ADDRESS, Dnsmasq, Hostapd, IpAddr, Nmcli
+
+AP_SSID = "DeskPi-Karaoke-Setup"
+SWITCH_GRACE = 1.0  # let the "connecting" page reach the phone before the AP goes
+UPLINK_TIMEOUT = 30.0
+UPLINK_POLL = 0.5
+
+
+async def probe_uplink() -> bool:
+    from net_watch import check_internet
+
+    return await asyncio.to_thread(check_internet, 2)
+
+
+class Portal:
+    def __init__(
+        self,
+        iface: str = "wlan0",
+        ap_ssid: str = AP_SSID,
+        nmcli: Optional[Nmcli] = None,
+        ip: Optional[IpAddr] = None,
+        hostapd: Optional[Hostapd] = None,
+        dnsmasq: Optional[Dnsmasq] = None,
+        uplink: Callable[[], Awaitable[bool]] = probe_uplink,
+        uplink_timeout: float = UPLINK_TIMEOUT,
+        switch_grace: float = SWITCH_GRACE,
+        status_file: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+        log: Callable[[str], None] = print,
+    ):
+        self.iface = iface
+        self.ap_ssid = ap_ssid
+        self.address = AP_ADDRESS
+        self.nmcli = nmcli or Nmcli()
+        self.ip = ip or IpAddr()
+        self.hostapd = hostapd or Hostapd(ap_ssid)
+        self.dnsmasq = dnsmasq or Dnsmasq()
+        self.uplink = uplink
+        self.uplink_timeout = uplink_timeout
+        self.switch_grace = switch_grace
+        self.status_file = status_file
+        self.clock = clock
+        self.log = log
+        self.state = "idle"
+        self.networks: list = []
+        self.scan_seconds: Optional[float] = None
+        self.ap_seconds: Optional[float] = None
+        self.target: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.switch: dict = {}
+        self.attempts = 0
+        self.done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- status ---
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "ap_ssid": self.ap_ssid,
+            "target": self.target,
+            "error": self.last_error,
+            "networks": len(self.networks),
+            "scan_seconds": self.scan_seconds,
+            "ap_seconds": self.ap_seconds,
+            "attempts": self.attempts,
+            "switch": self.switch,
+        }
+
+    def _set(self, state: str):
+        self.state = state
+        self.log(f"portal: {state}" + (f" ({self.last_error})" if state == "ap" and self.last_error else ""))
+        if self.status_file is None:
+            return
+        try:
+            self.status_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.status_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.status(), indent=2) + "\n")
+            tmp.replace(self.status_file)
+        except OSError:
+            pass
+
+    # --- AP mode ---
+    async def start_ap(self):
+        started = self.clock()
+        if not self.networks:
+            self._set("scanning")
+            self.networks = await self.nmcli.scan(self.iface)
+            self.scan_seconds = round(self.clock() - started, 3)
+        await self.nmcli.set_managed(self.iface, False)
+        await self.ip.up(self.iface, self.address)
+        await self.hostapd.start(self.iface)
+        await self.dnsmasq.start(self.iface)
+        self.ap_seconds = round(self.clock() - started, 3)
+        self._set("ap")
+
+    async def stop_ap(self):
+        await self.dnsmasq.stop()
+        await self.hostapd.stop()
+        await self.ip.flush(self.iface)
+        await self.nmcli.set_managed(self.iface, True)
+
+    # --- switching ---
+    def request_connect(self, ssid: str, psk: str = "") -> bool:
+        """Start switching to `ssid`; False if not in AP mode (already switching)."""
+        if self.state != "ap" or not ssid:
+            return False
+        self.target, self.last_error = ssid, None
+        self._set("switching")
+        self._task = asyncio.create_task(self._switch(ssid, psk))
+        return True
+
+    async def _wait_uplink(self) -> bool:
+        deadline = self.clock() + self.uplink_timeout
+        while self.clock() < deadline:
+            if await self.uplink():
+                return True
+            await asyncio.sleep(UPLINK_POLL)
+        return False
+
+    async def _switch(self, ssid: str, psk: str):
+        self.attempts += 1
+        await asyncio.sleep(self.switch_grace)
+        t0 = self.clock()
+        await self.stop_ap()
+        t1 = self.clock()
+        ok, message = await self.nmcli.connect(self.iface, ssid, psk)
+        t2 = self.clock()
+        self.switch = {"ap_down": round(t1 - t0, 3), "associate": round(t2 - t1, 3)}
+        if not ok:
+            await self.nmcli.forget(ssid)  # no half-made profile for a wrong password
+            self.last_error = f"could not join {ssid}: {message}"
+            self.switch["total"] = round(self.clock() - t0, 3)
+            try:
+                await self.start_ap()
+            except RuntimeError as e:  # AP did not come back: nothing left to serve
+                self.last_error = f"{self.last_error}; {e}"
+                self._set("failed")
+                self.done.set()
+            return
+        self._set("verifying")
+        online = await self._wait_uplink()
+        t3 = self.clock()
+        self.switch.update(uplink=round(t3 - t2, 3), total=round(t3 - t0, 3), online=online)
+        if not online:
+            self.last_error = f"joined {ssid} but no internet within {self.uplink_timeout:.0f}s"
+        self._set("connected")
+        self.done.set()
+
+    async def run(self, timeout: Optional[float] = None) -> bool:
+        """AP mode until a network is joined (True) or `timeout` passes."""
+        try:
+            await self.start_ap()
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if self.state in ("scanning", "ap", "switching"):
+                if self._task:
+                    self._task.cancel()
+                await self.stop_ap()
+                self._set("stopped")
+        return self.state == "connected"
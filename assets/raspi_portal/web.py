@@ -0,0 +1,145 @@
+"""
+Portal HTTP layer on asyncio streams: the setup page, a JSON status API and
+the captive-portal detection URLs phones and laptops probe after joining a
+network.
+
+While in AP mode every probe is answered with something other than the
+expected "success" reply, so the OS opens its sign-in sheet on the setup
+page; requests for any other host are redirected to it as well.
+"""
+
+import asyncio
+import html
+import json
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .portal import Portal
+
+MAX_BODY = 4096
+READ_TIMEOUT = 10.0
+# Android/ChromeOS, Windows, Firefox and generic probes: redirect
+REDIRECT_PROBES = {"/generate_204", "/gen_204", "/connecttest.txt", "/ncsi.txt",
+                   "/redirect", "/canonical.html", "/success.txt"}
+# Apple: anything but the "Success" page opens the sheet, so serve the page
+PAGE_PROBES = {"/hotspot-detect.html", "/library/test/success.html"}
+
+_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1">
+<title>DeskPi Karaoke Wi-Fi setup</title>
+<style>body{{font-family:sans-serif;max-width:28em;margin:1.5em auto;padding:0 1em}}
+select,input,button{{font-size:1.1em;width:100%;margin:.3em 0;padding:.4em;box-sizing:border-box}}
+.err{{color:#b00}}</style></head>
+<body><h1>🎤 Wi-Fi setup</h1>{message}
+<form method="post" action="/connect">
+<label>Network<select name="ssid">{options}</select></label>
+<label>or hidden network name<input name="hidden" autocomplete="off"></label>
+<label>Password<input name="psk" type="password" autocomplete="off"></label>
+<button type="submit">Connect</button></form>
+<p>PiKaraoke is already running: <a href="http://{address}:5555/">open it</a> to sing offline.</p>
+</body></html>
+"""
+
+_SWITCHING = """<!doctype html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Connecting…</title><style>body{{font-family:sans-serif;max-width:28em;margin:1.5em auto;padding:0 1em}}</style>
+</head><body><h1>Connecting to {ssid}…</h1>
+<p>The setup network <b>{ap}</b> goes away now. Join <b>{ssid}</b> on this phone
+and open PiKaraoke again. If the password was wrong, <b>{ap}</b> comes back in
+under a minute with an error message.</p></body></html>
+"""
+
+
+def setup_page(portal: Portal) -> str:
+    options = "".join(
+        f'<option value="{html.escape(n["ssid"], quote=True)}">'
+        f'{html.escape(n["ssid"])} ({n["signal"]}%{", open" if not n["secure"] else ""})</option>'
+        for n in portal.networks
+    ) or '<option value="">(no networks found)</option>'
+    message = f'<p class="err">{html.escape(portal.last_error)}</p>' if portal.last_error else ""
+    return _PAGE.format(options=options, message=message, address=portal.address)
+
+
+class PortalHTTP:
+    def __init__(self, portal: Portal, host: str = "0.0.0.0", port: int = 80):
+        self.portal = portal
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.base_events.Server] = None
+        self.requests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, reuse_address=True)
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    # --- request handling ---
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(self._read(reader), READ_TIMEOUT)
+            if request is None:
+                return
+            self.requests += 1
+            status, headers, body = self.route(*request)
+            head = [f"HTTP/1.1 {status}", f"Content-Length: {len(body)}", "Connection: close",
+                    "Cache-Control: no-store"] + [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # slow, truncated or malformed request: just close
+        finally:
+            writer.close()
+
+    async def _read(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        parts = line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None
+        headers = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = min(int(headers.get("content-length") or 0), MAX_BODY)
+        body = await reader.readexactly(length) if length else b""
+        return parts[0].upper(), parts[1], headers, body
+
+    def _redirect(self) -> Tuple[str, dict, bytes]:
+        return "302 Found", {"Location": f"http://{self.portal.address}/"}, b""
+
+    def _html(self, text: str) -> Tuple[str, dict, bytes]:
+        return "200 OK", {"Content-Type": "text/html; charset=utf-8"}, text.encode()
+
+    def _json(self, data) -> Tuple[str, dict, bytes]:
+        return "200 OK", {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+    def route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[str, dict, bytes]:
+        path = urlsplit(target).path or "/"
+        host = headers.get("host", "").split(":")[0]
+        if path in REDIRECT_PROBES:
+            return self._redirect()
+        if path in PAGE_PROBES:
+            return self._html(setup_page(self.portal))
+        if host and host not in (self.portal.address, "localhost", "127.0.0.1"):
+            return self._redirect()  # someone's start page, via the DNS catch-all
+        if path in ("/", "/setup") and method == "GET":
+            return self._html(setup_page(self.portal))
+        if path == "/networks.json":
+            return self._json(self.portal.networks)
+        if path == "/status.json":
+            return self._json(self.portal.status())
+        if path == "/connect" and method == "POST":
+            form = parse_qs(body.decode(errors="replace"))
+            ssid = (form.get("hidden", [""])[0] or form.get("ssid", [""])[0]).strip()
+            psk = form.get("psk", [""])[0]
+            if not self.portal.request_connect(ssid, psk):
+                return "303 See Other", {"Location": "/"}, b""
+            return self._html(_SWITCHING.format(ssid=html.escape(ssid), ap=html.escape(self.portal.ap_ssid)))
+        return "404 Not Found", {"Content-Type": "text/plain"}, b"not found"
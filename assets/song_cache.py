@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Disk-quota manager for the PiKaraoke song library.
+
+Tracks how often and how recently each song was played and, in the
+background, deletes the least valuable downloads before the SD card fills up:
+
+- eviction starts when the library passes its quota or the filesystem's free
+  space drops below `min_free`, and stops at the low-water mark
+  (`low_water` bytes of library and `free_target` bytes free)
+- value = (1 + plays) * 0.5 ** (days since last played or added / half-life),
+  i.e. LFU weighted by LRU; the lowest value goes first
+
+Only *managed* songs are ever deleted: files PiKaraoke downloaded through
+yt-dlp, recognised by their YouTube ID in the download archive
+(~/.deskpi-karaoke/ytdlp-archive.txt), or marked with `manage`. Songs copied
+in by hand are manual and never touched, the same "never touch songs blindly"
+rule the uninstallers follow. Pinned songs, songs in PiKaraoke's queue or on
+screen, and downloads younger than MIN_AGE are skipped as well.
+
+Plays are counted by polling PiKaraoke's /now_playing. Configuration lives in
+~/.deskpi-karaoke/song_cache.json, e.g.
+{"quota": "12G", "low_water": "10G", "min_free": "2G"}; statistics in
+song_stats.json next to it.
+
+    song_cache.py [status|plan|evict|pin REL|unpin REL|manage REL|unmanage REL]
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from song_manifest import YTDLP_ARCHIVE, SongManifest, parse_title
+
+HOME = Path.home()
+CONFIG_FILE = HOME / ".deskpi-karaoke" / "song_cache.json"
+STATS_FILE = HOME / ".deskpi-karaoke" / "song_stats.json"
+PIKARAOKE_URL = "http://localhost:5555"
+
+DEFAULT_CONFIG = {
+    "quota": None,  # library size that triggers eviction; None = free-space guard only
+    "low_water": None,  # evict down to this size (default: 90% of quota)
+    "min_free": "2G",  # filesystem free space that triggers eviction
+    "free_target": "3G",  # ...and the free space eviction stops at
+    "half_life_days": 30,
+}
+CHECK_INTERVAL = 300.0  # background usage check; new downloads wake it sooner
+PLAY_POLL_INTERVAL = 10.0
+MIN_AGE = 2 * 3600  # never evict a download this fresh
+MAX_EVICTION_LOG = 50
+
+
+def _bytes(value) -> Optional[int]:
+    """"12G" / "900M" / 1234 → bytes (None stays None)."""
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip().upper()
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def load_config(path: Path = CONFIG_FILE) -> dict:
+    """DEFAULT_CONFIG with the user's values merged in, sizes in bytes."""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        user = json.loads(path.read_text())
+        if isinstance(user, dict):
+            config.update(user)
+    except (OSError, ValueError):
+        pass
+    for key in ("quota", "low_water", "min_free", "free_target"):
+        try:
+            config[key] = _bytes(config[key])
+        except (TypeError, ValueError):
+            config[key] = _bytes(DEFAULT_CONFIG[key])
+    if config["quota"] and not config["low_water"]:
+        config["low_water"] = int(config["quota"] * 0.9)
+    return config
+
+
+def archived_ids(archive: Path = YTDLP_ARCHIVE) -> set:
+    """YouTube IDs yt-dlp recorded in its --download-archive."""
+    try:
+        return {line.split()[-1] for line in archive.read_text().splitlines() if line.strip()}
+    except OSError:
+        return set()
+
+
+def song_key(title: str) -> str:
+    """Normalised "Artist - Title" as PiKaraoke shows it (filename minus ---id)."""
+    return " ".join(title.lower().split())
+
+
+class SongCache:
+    def __init__(
+        self,
+        manifest: SongManifest,
+        config: Optional[dict] = None,
+        stats_file: Path = STATS_FILE,
+        archive: Path = YTDLP_ARCHIVE,
+        now_playing: Optional[Callable[[], Optional[str]]] = None,
+        queued: Optional[Callable[[], List[str]]] = None,
+        disk_usage: Callable[[Path], tuple] = shutil.disk_usage,
+        log: Callable[[str], None] = print,
+    ):
+        self.manifest = manifest
+        self.songs_dir = manifest.songs_dir
+        self.config = config or load_config()
+        self.stats_file = stats_file
+        self.archive = archive
+        self.now_playing = now_playing or pikaraoke_now_playing
+        self.queued = queued or pikaraoke_queue
+        self.disk_usage = disk_usage
+        self.log = log
+        self.lock = threading.Lock()
+        self.stats: Dict[str, dict] = {}
+        self.evictions: List[dict] = []
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self._last_title = None
+        self.load()
+
+    # --- persistence ---
+    def load(self):
+        try:
+            data = json.loads(self.stats_file.read_text())
+            self.stats = data.get("songs", {})
+            self.evictions = data.get("evictions", [])
+        except (OSError, ValueError, AttributeError):
+            self.stats, self.evictions = {}, []
+
+    def save(self):
+        with self.lock:
+            payload = json.dumps({"songs": self.stats, "evictions": self.evictions[-MAX_EVICTION_LOG:]},
+                                 separators=(",", ":"))
+        self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.stats_file.with_suffix(".tmp")
+        tmp.write_text(payload)
+        tmp.replace(self.stats_file)
+
+    def _stat(self, rel: str) -> dict:
+        if rel not in self.stats:
+            try:
+                # ctime: when the file arrived here (yt-dlp may set mtime to the upload date)
+                added = min(time.time(), os.stat(self.songs_dir / rel).st_ctime)
+            except OSError:
+                added = time.time()
+            self.stats[rel] = {"plays": 0, "last_played": None, "added": added}
+        return self.stats[rel]
+
+    # --- manifest listener ---
+    def listener(self, kind: str, rel: str, entry: Optional[dict]):
+        with self.lock:
+            if kind == "added":
+                self._stat(rel)
+            elif kind == "removed":
+                self.stats.pop(rel, None)
+        if kind == "added":
+            self.wake.set()  # a download just landed: re-check usage now
+
+    # --- plays ---
+    def record_play(self, rel: str):
+        with self.lock:
+            stat = self._stat(rel)
+            stat["plays"] += 1
+            stat["last_played"] = time.time()
+
+    def find_by_title(self, title: str) -> Optional[str]:
+        key = song_key(title)
+        for rel, entry in self.manifest.songs().items():
+            stem = Path(rel).name.rsplit(".", 1)[0]
+            if song_key(stem.rpartition("---")[0] or stem) == key:
+                return rel
+        return None
+
+    def poll_now_playing(self) -> Optional[str]:
+        """Count a play when PiKaraoke's now-playing title changes."""
+        title = self.now_playing()
+        if title == self._last_title:
+            return None
+        self._last_title = title
+        rel = self.find_by_title(title) if title else None
+        if rel:
+            self.record_play(rel)
+            self.save()
+        return rel
+
+    # --- flags ---
+    def set_flag(self, rel: str, flag: str, value: Optional[bool]):
+        with self.lock:
+            stat = self._stat(rel)
+            if value is None:
+                stat.pop(flag, None)
+            else:
+                stat[flag] = value
+        self.save()
+
+    def is_managed(self, rel: str, ids: set) -> bool:
+        """Called from the normalizer's threads; takes the stats lock."""
+        with self.lock:
+            return self._is_managed(rel, ids)
+
+    def _is_managed(self, rel: str, ids: set) -> bool:
+        override = self.stats.get(rel, {}).get("managed")
+        if override is not None:
+            return bool(override)
+        return parse_title(Path(rel).name).get("youtube_id") in ids
+
+    # --- eviction ---
+    def usage(self) -> dict:
+        songs = self.manifest.songs()
+        try:
+            free = self.disk_usage(self.songs_dir).free
+        except OSError:
+            free = None
+        return {"library": sum(e["size"] for e in songs.values()), "free": free, "songs": len(songs)}
+
+    def needs_eviction(self, usage: dict) -> bool:
+        quota, min_free = self.config["quota"], self.config["min_free"]
+        return bool((quota and usage["library"] > quota)
+                    or (min_free and usage["free"] is not None and usage["free"] < min_free))
+
+    def score(self, rel: str, now: float) -> float:
+        stat = self.stats.get(rel, {})
+        last = stat.get("last_played") or stat.get("added") or now
+        age_days = max(0.0, now - last) / 86400.0
+        return (1 + stat.get("plays", 0)) * 0.5 ** (age_days / self.config["half_life_days"])
+
+    def candidates(self) -> List[tuple]:
+        """[(score, rel, size)] of evictable songs, least valuable first."""
+        now = time.time()
+        ids = archived_ids(self.archive)
+        protected = set()
+        for path in self.queued():
+            try:
+                protected.add(Path(path).resolve().relative_to(self.songs_dir.resolve()).as_posix())
+            except (OSError, ValueError):
+                pass
+        if self._last_title:
+            playing = self.find_by_title(self._last_title)
+            if playing:
+                protected.add(playing)
+        out = []
+        with self.lock:
+            for rel, entry in self.manifest.songs().items():
+                stat = self.stats.get(rel, {})
+                if stat.get("pinned") or rel in protected or not self._is_managed(rel, ids):
+                    continue
+                if now - (stat.get("added") or entry.get("mtime") or now) < MIN_AGE:
+                    continue
+                out.append((self.score(rel, now), rel, entry["size"]))
+        out.sort(key=lambda c: (c[0], c[1]))
+        return out
+
+    def plan(self, usage: Optional[dict] = None) -> List[tuple]:
+        """Candidates to delete to get back under the low-water mark."""
+        usage = usage or self.usage()
+        if not self.needs_eviction(usage):
+            return []
+        low_water, free_target = self.config["low_water"], self.config["free_target"]
+        library, free = usage["library"], usage["free"]
+        chosen = []
+        for score, rel, size in self.candidates():
+            over_quota = bool(low_water and library > low_water)
+            short_of_space = bool(free_target and free is not None and free < free_target)
+            if not (over_quota or short_of_space):
+                break
+            chosen.append((score, rel, size))
+            library -= size
+            if free is not None:
+                free += size
+        return chosen
+
+    def delete(self, rel: str) -> bool:
+        """Delete one managed song file, never anything outside the library."""
+        path = self.songs_dir / rel
+        try:
+            resolved = path.resolve()
+            resolved.relative_to(self.songs_dir.resolve())
+        except (OSError, ValueError):
+            return False
+        if path.is_symlink() or not path.is_file():
+            return False
+        try:
+            path.unlink()
+        except OSError as e:
+            self.log(f"⚠️ Could not evict {rel}: {e}")
+            return False
+        # Listeners (download archive, stats) hear about it even without inotify
+        self.manifest.remove_path(path)
+        return True
+
+    def evict(self, dry_run: bool = False) -> List[tuple]:
+        chosen = self.plan()
+        if dry_run:
+            return chosen
+        done = []
+        for score, rel, size in chosen:
+            if self.delete(rel):
+                done.append((score, rel, size))
+                self.log(f"🧹 Evicted {rel} ({size / (1 << 20):.0f} MB, score {score:.2f})")
+        if done:
+            with self.lock:
+                self.evictions.append({"at": time.time(), "songs": [rel for _, rel, _ in done],
+                                       "bytes": sum(size for _, _, size in done)})
+            self.manifest.save()
+            self.save()
+        return done
+
+    # --- service ---
+    def run(self):
+        next_check = 0.0
+        while not self.stopping.is_set():
+            try:
+                self.poll_now_playing()
+                if self.wake.is_set() or time.monotonic() >= next_check:
+                    self.wake.clear()
+                    self.evict()
+                    next_check = time.monotonic() + CHECK_INTERVAL
+            except Exception as e:  # never take the launcher down
+                self.log(f"⚠️ song cache: {e}")
+            self.wake.wait(PLAY_POLL_INTERVAL)
+        self.save()
+
+    def start(self) -> threading.Thread:
+        t = threading.Thread(target=self.run, name="song-cache", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+
+
+def pikaraoke_now_playing(url: str = PIKARAOKE_URL) -> Optional[str]:
+    """Title on screen: the file name minus extension and ---id (None if idle)."""
+    from pk_supervisor import http_json
+
+    data = http_json(f"{url}/now_playing")
+    return (data or {}).get("now_playing") or None
+
+
+def pikaraoke_queue(url: str = PIKARAOKE_URL) -> List[str]:
+    """File paths in PiKaraoke's queue (empty if it is not running)."""
+    from pk_supervisor import http_json
+
+    data = http_json(f"{url}/get_queue")
+    return [item["file"] for item in data or [] if isinstance(item, dict) and item.get("file")]
+
+
+def _mb(n: Optional[int]) -> str:
+    return "—" if n is None else f"{n / (1 << 20):,.0f} MB"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    manifest = SongManifest()
+    cache = SongCache(manifest)
+    flags = {
+        "pin": ("pinned", True),
+        "unpin": ("pinned", None),
+        "manage": ("managed", True),
+        "unmanage": ("managed", False),  # explicit: wins over the download archive
+    }
+    if cmd in flags:
+        if len(argv) != 2 or argv[1] not in manifest.songs():
+            raise SystemExit(f"usage: song_cache.py {cmd} REL (a path listed by `pk songs`)")
+        cache.set_flag(argv[1], *flags[cmd])
+        print(f"✅ {cmd}: {argv[1]}")
+    elif cmd == "status":
+        usage = cache.usage()
+        cfg = cache.config
+        ids = archived_ids()
+        songs = manifest.songs()
+        managed = [r for r in songs if cache.is_managed(r, ids)]
+        pinned = [r for r, s in cache.stats.items() if s.get("pinned")]
+        print(f"library: {usage['songs']} songs, {_mb(usage['library'])} "
+              f"(quota {_mb(cfg['quota'])}, low water {_mb(cfg['low_water'])})")
+        print(f"free:    {_mb(usage['free'])} (min {_mb(cfg['min_free'])}, target {_mb(cfg['free_target'])})")
+        print(f"managed: {len(managed)}, manual: {len(songs) - len(managed)}, pinned: {len(pinned)}")
+        for ev in cache.evictions[-5:]:
+            print(f"evicted {time.strftime('%Y-%m-%d %H:%M', time.localtime(ev['at']))}: "
+                  f"{len(ev['songs'])} songs, {_mb(ev['bytes'])}")
+    elif cmd in ("plan", "evict"):
+        rows = cache.evict(dry_run=cmd == "plan")
+        for score, rel, size in rows:
+            print(f"{score:8.3f} {_mb(size):>9}  {rel}")
+        verb = "would evict" if cmd == "plan" else "evicted"
+        print(f"{verb} {len(rows)} songs, {_mb(sum(r[2] for r in rows))}")
+    else:
+        raise SystemExit("usage: song_cache.py [status|plan|evict|pin REL|unpin REL|manage REL|unmanage REL]")
+
+
+if __name__ == "__main__":
+    main()
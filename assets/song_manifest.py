@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Persistent, incrementally maintained index of the PiKaraoke song library.
+
+The index (~/.deskpi-karaoke/song_manifest.json) stores path, size, mtime,
+duration and a title parsed from the filename for every song under
+~/pikaraoke-songs. At startup it is one JSON read; a reconcile walk only
+re-indexes entries whose size/mtime changed, and durations are probed with
+ffprobe on first use (`duration()`), not during the walk. While running,
+inotify events update the index as files are downloaded, renamed or deleted.
+
+The launcher's watcher waits for PiKaraoke to report ready before its first
+walk, and with a governor it runs each walk as `song_manifest.py scan` in the
+"transcode" scope, then adopts the result, so the walk's I/O does not compete
+with the server start or playback.
+
+Other helpers (cache manager, normalizer) subscribe via `listeners` to learn
+about new and removed songs without their own directory scans.
+
+Usage: song_manifest.py [scan [SONGS_DIR MANIFEST_FILE]|watch|list]
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+HOME = Path.home()
+SONGS_DIR = HOME / "pikaraoke-songs"
+MANIFEST_FILE = HOME / ".deskpi-karaoke" / "song_manifest.json"
+YTDLP_ARCHIVE = HOME / ".deskpi-karaoke" / "ytdlp-archive.txt"
+SONG_EXTENSIONS = {".mp4", ".mp3", ".mkv", ".webm", ".avi", ".mov", ".zip", ".cdg", ".m4a"}
+SAVE_DELAY = 3.0  # debounce manifest writes after bursts of events
+
+# linux/inotify.h
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def parse_title(filename: str) -> dict:
+    """PiKaraoke names downloads "<title>---<youtube id>.<ext>"."""
+    stem = filename.rsplit(".", 1)[0]
+    title, _, yt_id = stem.rpartition("---")
+    if not title:
+        title, yt_id = stem, ""
+    artist, sep, song = title.partition(" - ")
+    info = {"title": (song if sep else title).strip()}
+    if sep:
+        info["artist"] = artist.strip()
+    if yt_id:
+        info["youtube_id"] = yt_id
+    return info
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True,
+            text=True,
+            timeout=20,
+        ).stdout.strip()
+        return round(float(out), 2)
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def forget_archived(youtube_id: str, archive: Path = YTDLP_ARCHIVE) -> bool:
+    """Drop a video from yt-dlp's --download-archive so it can be fetched again
+    after the song file was deleted."""
+    try:
+        lines = archive.read_text().splitlines()
+    except OSError:
+        return False
+    kept = [line for line in lines if line.split()[-1:] != [youtube_id]]
+    if len(kept) == len(lines):
+        return False
+    archive.write_text("".join(line + "\n" for line in kept))
+    return True
+
+
+def archive_listener(kind: str, rel: str, entry: Optional[dict]):
+    """Manifest listener: keep the download archive in step with deletions."""
+    if kind == "removed":
+        youtube_id = parse_title(Path(rel).name).get("youtube_id")
+        if youtube_id:
+            forget_archived(youtube_id)
+
+
+class Inotify:
+    """Minimal ctypes inotify wrapper with recursive directory watches."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, Path] = {}
+
+    def add_tree(self, root: Path):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            self.add_watch(Path(dirpath))
+
+    def add_watch(self, path: Path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def read(self, timeout: Optional[float]) -> list:
+        """Return [(mask, path)] for pending events, waiting up to timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events, i = [], 0
+        while i + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, i)
+            name = data[i + _EVENT.size : i + _EVENT.size + length].rstrip(b"\0")
+            i += _EVENT.size + length
+            base = self.dirs.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, None))
+            elif base is not None:
+                events.append((mask, base / os.fsdecode(name) if name else base))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SongManifest:
+    def __init__(self, songs_dir: Path = SONGS_DIR, manifest_file: Path = MANIFEST_FILE,
+                 duration_probe: Callable[[Path], Optional[float]] = probe_duration,
+                 governor=None, walk_scope: str = "transcode"):
+        self.songs_dir = Path(songs_dir)
+        self.manifest_file = Path(manifest_file)
+        self.duration_probe = duration_probe
+        self.governor = governor  # pk_governor.Governor: walks run in `walk_scope`
+        self.walk_scope = walk_scope
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.listeners: List[Callable[[str, str, Optional[dict]], None]] = []
+        self.dirty = False
+        self.stopping = threading.Event()
+        self.load()
+
+    # --- persistence ---
+    def load(self):
+        try:
+            data = json.loads(self.manifest_file.read_text())
+            if data.get("root") == str(self.songs_dir):
+                self.entries = data.get("songs", {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            data = {"root": str(self.songs_dir), "updated": time.time(), "songs": self.entries}
+            payload = json.dumps(data, separators=(",", ":"))
+            self.dirty = False
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_file.with_suffix(".tmp")
+        tmp.write_text(payload)
+        tmp.replace(self.manifest_file)
+
+    def songs(self) -> Dict[str, dict]:
+        with self.lock:
+            return dict(self.entries)
+
+    def duration(self, rel: str) -> Optional[float]:
+        """Length of a song, probed on first use and kept in the index."""
+        with self.lock:
+            entry = self.entries.get(rel)
+            if entry is None:
+                return None
+            if entry.get("duration") is not None:
+                return entry["duration"]
+        value = self.duration_probe(self.songs_dir / rel)
+        with self.lock:
+            if value is not None and self.entries.get(rel) is entry:
+                entry["duration"] = value
+                self.dirty = True
+        return value
+
+    # --- updates ---
+    def _notify(self, kind: str, rel: str, entry: Optional[dict]):
+        for cb in list(self.listeners):
+            try:
+                cb(kind, rel, entry)
+            except Exception:
+                pass
+
+    def _rel(self, path: Path) -> Optional[str]:
+        try:
+            rel = path.relative_to(self.songs_dir)
+        except ValueError:
+            return None
+        if any(part.startswith(".") for part in rel.parts):
+            return None
+        return rel.as_posix()
+
+    def update_path(self, path: Path, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """(Re)index one file if it is a song and changed; returns the change kind."""
+        rel = self._rel(path)
+        if rel is None or path.suffix.lower() not in SONG_EXTENSIONS:
+            return None
+        try:
+            st = st or path.stat()
+        except OSError:
+            return self.remove_path(path)
+        with self.lock:
+            old = self.entries.get(rel)
+            if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                return None
+        entry = {"size": st.st_size, "mtime": st.st_mtime, "duration": None}
+        entry.update(parse_title(path.name))
+        with self.lock:
+            self.entries[rel] = entry
+            self.dirty = True
+        kind = "changed" if old else "added"
+        self._notify(kind, rel, entry)
+        return kind
+
+    def remove_path(self, path: Path) -> Optional[str]:
+        rel = self._rel(path)
+        if rel is None:
+            return None
+        with self.lock:
+            prefix = rel + "/"
+            gone = [k for k in self.entries if k == rel or k.startswith(prefix)]
+            for k in gone:
+                del self.entries[k]
+            if gone:
+                self.dirty = True
+        for k in gone:
+            self._notify("removed", k, None)
+        return "removed" if gone else None
+
+    def reconcile(self) -> dict:
+        """Walk the library; only files whose size/mtime changed are re-indexed."""
+        counts = {"added": 0, "changed": 0, "removed": 0}
+        seen = set()
+        stack = [self.songs_dir]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for de in it:
+                        if de.name.startswith("."):
+                            continue
+                        if de.is_dir(follow_symlinks=False):
+                            stack.append(Path(de.path))
+                            continue
+                        path = Path(de.path)
+                        rel = self._rel(path)
+                        if rel is None or path.suffix.lower() not in SONG_EXTENSIONS:
+                            continue
+                        seen.add(rel)
+                        kind = self.update_path(path, de.stat())
+                        if kind:
+                            counts[kind] += 1
+            except OSError:
+                continue
+        with self.lock:
+            stale = [k for k in self.entries if k not in seen]
+        for k in stale:
+            if self.remove_path(self.songs_dir / k):
+                counts["removed"] += 1
+        if self.dirty:
+            self.save()
+        return counts
+
+    def adopt(self) -> dict:
+        """Reload the index written by another process (a scoped `scan`) and
+        tell listeners what it changed."""
+        with self.lock:
+            old = self.entries
+        self.load()
+        with self.lock:
+            new = self.entries
+            self.dirty = False
+        counts = {"added": 0, "changed": 0, "removed": 0}
+        for rel in old.keys() - new.keys():
+            counts["removed"] += 1
+            self._notify("removed", rel, None)
+        for rel, entry in new.items():
+            before = old.get(rel)
+            if before is None:
+                kind = "added"
+            elif (before["size"], before["mtime"]) != (entry["size"], entry["mtime"]):
+                kind = "changed"
+            else:
+                if entry.get("duration") is None and before.get("duration") is not None:
+                    with self.lock:
+                        entry["duration"] = before["duration"]  # probed here meanwhile
+                        self.dirty = True
+                continue
+            counts[kind] += 1
+            self._notify(kind, rel, entry)
+        return counts
+
+    def refresh(self) -> dict:
+        """reconcile(), in the governor's walk scope when there is a governor."""
+        if self.governor is None:
+            return self.reconcile()
+        if self.dirty:
+            self.save()  # the scan starts from our latest state
+        cmd = [sys.executable, str(Path(__file__).resolve()), "scan", str(self.songs_dir), str(self.manifest_file)]
+        try:
+            subprocess.run(
+                self.governor.command(self.walk_scope, cmd),
+                env=self.governor.env(self.walk_scope),
+                capture_output=True,
+                timeout=600,
+                check=True,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return self.reconcile()
+        return self.adopt()
+
+    def handle_event(self, mask: int, path: Optional[Path], inotify: Optional[Inotify] = None):
+        if path is None:  # queue overflow: fall back to a walk
+            self.refresh()
+            return
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if inotify:
+                    inotify.add_tree(path)
+                for f in path.rglob("*"):
+                    if f.is_file():
+                        self.update_path(f)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.remove_path(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.update_path(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.remove_path(path)
+
+    # --- service ---
+    def watch(self, reconcile_interval: float = 3600.0, ready: Optional[threading.Event] = None):
+        """Reconcile once `ready` is set, then follow inotify events until stop().
+
+        The watches go in before the walk, so changes made while it runs are
+        queued and applied on top of its result.
+        """
+        self.songs_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            inotify = Inotify()
+            inotify.add_tree(self.songs_dir)
+        except (OSError, AttributeError):
+            inotify = None
+        while ready is not None and not ready.is_set():
+            if self.stopping.wait(1.0):
+                if inotify:
+                    inotify.close()
+                return
+        self.refresh()
+        last_walk = time.monotonic()
+        last_change = None
+        try:
+            while not self.stopping.is_set():
+                if inotify is None:
+                    self.stopping.wait(min(60.0, reconcile_interval))
+                    self.refresh()
+                    continue
+                for mask, path in inotify.read(timeout=1.0):
+                    self.handle_event(mask, path, inotify)
+                now = time.monotonic()
+                if self.dirty:
+                    last_change = last_change or now
+                    if now - last_change >= SAVE_DELAY:
+                        self.save()
+                        last_change = None
+                if now - last_walk >= reconcile_interval:
+                    self.refresh()
+                    last_walk = now
+        finally:
+            if inotify:
+                inotify.close()
+            if self.dirty:
+                self.save()
+
+    def start(self, ready: Optional[threading.Event] = None) -> threading.Thread:
+        t = threading.Thread(target=self.watch, kwargs={"ready": ready}, name="song-manifest", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self.stopping.set()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "scan"
+    if cmd == "scan" and len(argv) == 3:
+        manifest = SongManifest(Path(argv[1]), Path(argv[2]))
+    else:
+        manifest = SongManifest()
+    if cmd == "scan":
+        start = time.monotonic()
+        counts = manifest.reconcile()
+        print(
+            f"✅ {len(manifest.entries)} songs indexed in {time.monotonic() - start:.2f}s "
+            f"(+{counts['added']} ~{counts['changed']} -{counts['removed']})"
+        )
+    elif cmd == "watch":
+        try:
+            manifest.watch()
+        except KeyboardInterrupt:
+            pass
+    elif cmd == "list":
+        for rel, e in sorted(manifest.songs().items()):
+            print(f"{e.get('artist', ''):<25} {e['title']:<40} {manifest.duration(rel) or '?':>8}  {rel}")
+        if manifest.dirty:
+            manifest.save()  # keep what was probed for the next listing
+    else:
+        raise SystemExit("usage: song_manifest.py [scan [SONGS_DIR MANIFEST_FILE]|watch|list]")
+
+
+if __name__ == "__main__":
+    main()
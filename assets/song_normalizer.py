@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Background normalize/transcode pool for downloaded songs.
+
+New songs in the library are prepared before anyone queues them, so playback
+never needs live ffmpeg work or software decode:
+
+- video is transcoded to H.264 (yuv420p, at most 720 lines) only when ffprobe
+  shows the source is something else; a compatible stream is copied
+- audio gets two-pass EBU R128 loudness normalization (ffmpeg `loudnorm`)
+  unless it is already within LOUDNESS_TOLERANCE of the target
+
+Only managed downloads (see song_cache.py) in containers that can carry
+H.264 + AAC under the same file name (.mp4, .m4v, .mov, .mkv) are rewritten;
+everything else is left alone. The result replaces the song atomically, so a
+song being streamed keeps playing from the old file.
+
+Workers run ffmpeg in the governor's "transcode" scope (idle CPU/IO), songs in
+PiKaraoke's queue go first, and per-song results are kept in
+~/.deskpi-karaoke/normalize_state.json: after a reboot the pool resumes with
+whatever is not done yet. Settings can be overridden in
+~/.deskpi-karaoke/normalize.json, e.g. {"workers": 2, "target_lufs": -14}.
+
+    song_normalizer.py [status|run|retry REL]
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from pk_thermal import announce
+from song_cache import archived_ids, pikaraoke_queue
+from song_manifest import SongManifest
+
+HOME = Path.home()
+STATE_FILE = HOME / ".deskpi-karaoke" / "normalize_state.json"
+CONFIG_FILE = HOME / ".deskpi-karaoke" / "normalize.json"
+
+DEFAULT_CONFIG = {
+    "enabled": True,
+    "workers": 1,
+    "target_lufs": -16.0,
+    "true_peak": -1.5,
+    "lra": 11.0,
+    "max_height": 720,
+    "crf": 22,
+}
+REWRITABLE = {".mp4", ".m4v", ".mov", ".mkv"}
+H264_PIX_FMTS = {"yuv420p", "yuvj420p"}
+LOUDNESS_TOLERANCE = 1.0  # LU
+SETTLE_SECONDS = 60  # let yt-dlp finish and write its archive entry first
+QUEUE_POLL_INTERVAL = 15.0
+MAX_ATTEMPTS = 3
+TMP_PREFIX = ".pk-normalize-"  # dot-file: invisible to the song manifest
+_LOUDNORM_JSON = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}", re.DOTALL)
+
+
+def load_config(path: Path = CONFIG_FILE) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    try:
+        user = json.loads(path.read_text())
+        if isinstance(user, dict):
+            config.update({k: v for k, v in user.items() if k in DEFAULT_CONFIG})
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+# --- ffmpeg helpers ---
+def probe_streams(path: Path, timeout: float = 60) -> Optional[dict]:
+    """First video and audio stream of `path` as ffprobe reports them."""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_streams", "-show_format", "-of", "json", str(path)],
+            capture_output=True, text=True, timeout=timeout,
+        ).stdout
+        data = json.loads(out)
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+    streams = data.get("streams", [])
+    return {
+        "video": next((s for s in streams if s.get("codec_type") == "video"
+                       and not s.get("disposition", {}).get("attached_pic")), None),
+        "audio": next((s for s in streams if s.get("codec_type") == "audio"), None),
+        "duration": float(data.get("format", {}).get("duration") or 0),
+    }
+
+
+def video_ok(video: Optional[dict], max_height: int) -> bool:
+    """True if the Pi 4 decodes this stream in hardware at the target size."""
+    if video is None:
+        return True
+    return (
+        video.get("codec_name") == "h264"
+        and (video.get("height") or 0) <= max_height
+        and video.get("pix_fmt") in H264_PIX_FMTS
+    )
+
+
+def loudnorm_filter(config: dict, measured: Optional[dict] = None) -> str:
+    f = f"loudnorm=I={config['target_lufs']}:TP={config['true_peak']}:LRA={config['lra']}"
+    if measured is None:
+        return f + ":print_format=json"
+    return (
+        f + f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true"
+    )
+
+
+def loudness_ok(measured: dict, config: dict) -> bool:
+    try:
+        return (abs(float(measured["input_i"]) - config["target_lufs"]) <= LOUDNESS_TOLERANCE
+                and float(measured["input_tp"]) <= config["true_peak"])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def build_command(src: Path, dst: Path, copy_video: bool, measured: Optional[dict], config: dict) -> list:
+    """ffmpeg command writing the normalized song to `dst` (mp4-compatible streams)."""
+    cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", str(src),
+           "-map", "0:v:0?", "-map", "0:a:0?"]
+    if copy_video:
+        cmd += ["-c:v", "copy"]
+    else:
+        cmd += ["-c:v", "libx264", "-preset", "veryfast", "-crf", str(config["crf"]),
+                "-vf", f"scale=-2:'min({config['max_height']},ih)'", "-pix_fmt", "yuv420p"]
+    if measured is None:
+        cmd += ["-c:a", "copy"]
+    else:
+        cmd += ["-af", loudnorm_filter(config, measured), "-c:a", "aac", "-b:a", "192k", "-ar", "48000"]
+    if src.suffix.lower() != ".mkv":
+        cmd += ["-movflags", "+faststart"]
+    return cmd + [str(dst)]
+
+
+class SongNormalizer:
+    def __init__(
+        self,
+        manifest: SongManifest,
+        config: Optional[dict] = None,
+        state_file: Path = STATE_FILE,
+        is_managed: Optional[Callable[[str], bool]] = None,
+        queued: Callable[[], List[str]] = pikaraoke_queue,
+        governor=None,
+        log: Callable[[str], None] = print,
+    ):
+        self.manifest = manifest
+        self.songs_dir = manifest.songs_dir
+        self.config = config or load_config()
+        self.state_file = state_file
+        self.is_managed = is_managed or self._in_archive
+        self.queued = queued
+        self.governor = governor
+        self.log = log
+        self.cond = threading.Condition()
+        self.state: Dict[str, dict] = {}
+        self.pending: Dict[str, float] = {}  # rel -> not before (epoch)
+        self.running: Dict[str, subprocess.Popen] = {}
+        self.queue_order: Dict[str, int] = {}
+        self._queue_polled = 0.0
+        self.stopping = threading.Event()
+        self.load()
+
+    @staticmethod
+    def _in_archive(rel: str) -> bool:
+        from song_manifest import parse_title
+
+        return parse_title(Path(rel).name).get("youtube_id") in archived_ids()
+
+    # --- persistence ---
+    def load(self):
+        try:
+            data = json.loads(self.state_file.read_text())
+            self.state = data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            self.state = {}
+
+    def save(self):
+        with self.cond:
+            payload = json.dumps(self.state, separators=(",", ":"))
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(payload)
+        tmp.replace(self.state_file)
+
+    def _record(self, rel: str, **fields):
+        with self.cond:
+            self.state[rel] = fields
+        self.save()
+
+    # --- queueing ---
+    def wants(self, rel: str, entry: dict) -> bool:
+        if Path(rel).suffix.lower() not in REWRITABLE:
+            return False
+        done = self.state.get(rel)
+        if not done:
+            return True
+        if done.get("size") != entry.get("size") or done.get("mtime") != entry.get("mtime"):
+            return True  # the file changed since we handled it
+        return done.get("status") == "failed" and done.get("attempts", 0) < MAX_ATTEMPTS
+
+    def enqueue(self, rel: str, not_before: float = 0.0):
+        with self.cond:
+            self.pending[rel] = max(not_before, self.pending.get(rel, 0.0))
+            self.cond.notify()
+
+    def listener(self, kind: str, rel: str, entry: Optional[dict]):
+        if kind == "removed":
+            with self.cond:
+                self.pending.pop(rel, None)
+                gone = self.state.pop(rel, None)
+            if gone:
+                self.save()
+        elif entry is not None and self.config["enabled"] and self.wants(rel, entry):
+            self.enqueue(rel, time.time() + SETTLE_SECONDS)
+
+    def resume(self):
+        """Queue every song that is not done yet (after a reboot or crash)."""
+        for leftover in self.songs_dir.rglob(f"{TMP_PREFIX}*"):
+            leftover.unlink(missing_ok=True)
+        count = 0
+        for rel, entry in self.manifest.songs().items():
+            if self.wants(rel, entry):
+                self.enqueue(rel)
+                count += 1
+        return count
+
+    def _refresh_queue_order(self):
+        if time.monotonic() - self._queue_polled < QUEUE_POLL_INTERVAL:
+            return
+        self._queue_polled = time.monotonic()
+        order = {}
+        root = self.songs_dir.resolve()
+        for pos, path in enumerate(self.queued()):
+            try:
+                order.setdefault(Path(path).resolve().relative_to(root).as_posix(), pos)
+            except (OSError, ValueError):
+                pass
+        self.queue_order = order
+
+    def next_job(self, timeout: float = 5.0) -> Optional[str]:
+        """Pending song to do next: queued songs by position, then oldest first."""
+        self._refresh_queue_order()
+        with self.cond:
+            now = time.time()
+            ready = [(self.queue_order.get(rel, 1 << 30), nb, rel)
+                     for rel, nb in self.pending.items() if rel not in self.running]
+            # a queued song skips the settle delay; the rest wait for it
+            ready = [r for r in ready if r[0] < (1 << 30) or r[1] <= now]
+            if not ready:
+                self.cond.wait(timeout)
+                return None
+            _, _, rel = min(ready)
+            del self.pending[rel]
+            self.running[rel] = None
+            return rel
+
+    # --- work ---
+    def _run(self, rel: str, cmd: list, timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+        env = None
+        if self.governor is not None:
+            cmd = self.governor.command("transcode", cmd)
+            env = self.governor.env("transcode")
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+        with self.cond:
+            self.running[rel] = proc
+        try:
+            _, err = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            _, err = proc.communicate()
+        return subprocess.CompletedProcess(cmd, proc.returncode, "", err)
+
+    def measure_loudness(self, rel: str, path: Path) -> Optional[dict]:
+        cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-i", str(path), "-map", "0:a:0",
+               "-af", loudnorm_filter(self.config), "-f", "null", "-"]
+        result = self._run(rel, cmd)
+        m = _LOUDNORM_JSON.search(result.stderr or "")
+        if result.returncode != 0 or not m:
+            return None
+        try:
+            return json.loads(m.group(0))
+        except ValueError:
+            return None
+
+    def process(self, rel: str) -> str:
+        """Normalize one song; returns the recorded status."""
+        path = self.songs_dir / rel
+        try:
+            st = path.stat()
+        except OSError:
+            return "gone"
+        if not self.is_managed(rel):
+            return "manual"  # not recorded: re-checked if it becomes managed
+        before = (st.st_size, st.st_mtime)
+        attempts = self.state.get(rel, {}).get("attempts", 0) + 1
+        start = time.monotonic()
+        info = probe_streams(path)
+        if info is None:
+            self._record(rel, status="failed", attempts=attempts, error="ffprobe",
+                         size=st.st_size, mtime=st.st_mtime)
+            return "failed"
+        copy_video = video_ok(info["video"], self.config["max_height"])
+        measured = self.measure_loudness(rel, path) if info["audio"] else None
+        if self.stopping.is_set():
+            return "stopped"  # resumed on next start
+        if info["audio"] and measured is None:
+            self._record(rel, status="failed", attempts=attempts, error="loudness measurement",
+                         size=st.st_size, mtime=st.st_mtime)
+            return "failed"
+        normalize_audio = bool(measured) and not loudness_ok(measured, self.config)
+        summary = {
+            "video": "copy" if copy_video else "h264",
+            "audio": "normalized" if normalize_audio else ("copy" if info["audio"] else "none"),
+            "input_i": measured and measured.get("input_i"),
+        }
+        if copy_video and not normalize_audio:
+            self._record(rel, status="done", size=st.st_size, mtime=st.st_mtime, seconds=0.0, **summary)
+            return "done"
+
+        tmp = path.with_name(f"{TMP_PREFIX}{os.getpid()}-{path.name}")
+        cmd = build_command(path, tmp, copy_video, measured if normalize_audio else None, self.config)
+        if not copy_video:
+            announce("transcode", max(60.0, 1.5 * info["duration"]))  # let the fan ramp ahead of x264
+        result = self._run(rel, cmd)
+        try:
+            out = probe_streams(tmp) if result.returncode == 0 else None
+            ok = out is not None and abs(out["duration"] - info["duration"]) <= max(1.0, 0.01 * info["duration"])
+            if self.stopping.is_set() and not ok:
+                return "stopped"  # resumed on next start
+            if not ok:
+                err = (result.stderr or "").strip().splitlines()[-1:] or ["output check failed"]
+                self._record(rel, status="failed", attempts=attempts, error=err[0][:200],
+                             size=st.st_size, mtime=st.st_mtime)
+                return "failed"
+            cur = path.stat()
+            if (cur.st_size, cur.st_mtime) != before:
+                return "changed"  # replaced meanwhile; the manifest re-queues it
+            new = tmp.stat()
+            # Record first: the rename's inotify event must find the file done
+            self._record(rel, status="done", size=new.st_size, mtime=new.st_mtime,
+                         seconds=round(time.monotonic() - start, 1), **summary)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.log(f"🎚️ Normalized {rel} (video {summary['video']}, audio {summary['audio']}, "
+                 f"{time.monotonic() - start:.0f}s)")
+        return "done"
+
+    def worker(self):
+        while not self.stopping.is_set():
+            rel = self.next_job()
+            if rel is None:
+                continue
+            try:
+                self.process(rel)
+            except Exception as e:  # keep the pool alive
+                self.log(f"⚠️ normalizer: {rel}: {e}")
+            finally:
+                with self.cond:
+                    self.running.pop(rel, None)
+
+    def start(self) -> List[threading.Thread]:
+        if not self.config["enabled"] or not shutil.which("ffmpeg"):
+            return []
+        self.resume()
+        threads = []
+        for i in range(max(1, int(self.config["workers"]))):
+            t = threading.Thread(target=self.worker, name=f"normalizer-{i}", daemon=True)
+            t.start()
+            threads.append(t)
+        return threads
+
+    def stop(self):
+        self.stopping.set()
+        with self.cond:
+            for proc in self.running.values():
+                if proc is not None and proc.poll() is None:
+                    proc.terminate()
+            self.cond.notify_all()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    manifest = SongManifest()
+    normalizer = SongNormalizer(manifest)
+    if cmd == "status":
+        counts = {}
+        for entry in normalizer.state.values():
+            counts[entry.get("status")] = counts.get(entry.get("status"), 0) + 1
+        todo = sum(1 for rel, e in manifest.songs().items() if normalizer.wants(rel, e))
+        print(f"done: {counts.get('done', 0)}, failed: {counts.get('failed', 0)}, to do: {todo}")
+        for rel, e in sorted(normalizer.state.items()):
+            if e.get("status") == "failed":
+                print(f"  ❌ {rel}: {e.get('error')} (attempt {e.get('attempts')})")
+    elif cmd == "run":
+        # Foreground pass over everything pending, in the transcode scope
+        from pk_governor import Governor
+
+        normalizer.governor = Governor()
+        normalizer.resume()
+        while normalizer.pending:
+            with normalizer.cond:
+                rel = min(normalizer.pending)
+                del normalizer.pending[rel]
+            print(f"{rel}: {normalizer.process(rel)}")
+    elif cmd == "retry" and len(argv) == 2:
+        with normalizer.cond:
+            normalizer.state.pop(argv[1], None)
+        normalizer.save()
+        print(f"✅ {argv[1]} will be normalized again")
+    else:
+        raise SystemExit("usage: song_normalizer.py [status|run|retry REL]")
+
+
+if __name__ == "__main__":
+    main()
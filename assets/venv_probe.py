@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Fast, in-process version probes for the PiKaraoke venv.
+
+Reads `site-packages/<name>-<ver>.dist-info/METADATA` through
+importlib.metadata instead of spawning `pip show` (about a second on a Pi 4
+SD card). Results are cached in ~/.deskpi-karaoke/version_cache.json keyed by
+the mtime of the dist-info directory (or of the binary, for deno), so a boot
+with nothing changed costs a couple of stat() calls.
+"""
+
+import json
+import re
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+HOME = Path.home()
+VENV_DIR = HOME / ".venv-pikaraoke"
+DENO_EXE = HOME / ".deno" / "bin" / "deno"
+CACHE_FILE = HOME / ".deskpi-karaoke" / "version_cache.json"
+
+
+def _load_cache() -> dict:
+    try:
+        return json.loads(CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        CACHE_FILE.write_text(json.dumps(cache, indent=2, sort_keys=True) + "\n")
+    except OSError:
+        pass
+
+
+def _cached(key: str, path: Path, compute):
+    """Return compute() for `path`, reusing the cached value while mtime holds."""
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry and entry.get("path") == str(path) and entry.get("mtime") == mtime:
+        return entry.get("version")
+    version = compute()
+    if version:
+        cache[key] = {"path": str(path), "mtime": mtime, "version": version}
+        _save_cache(cache)
+    return version
+
+
+def site_packages(venv: Path = VENV_DIR) -> list:
+    return sorted((venv / "lib").glob("python*/site-packages"))
+
+
+def find_dist_info(name: str, venv: Path = VENV_DIR) -> Optional[Path]:
+    """Locate <name>-<version>.dist-info in the venv (PEP 503-normalized)."""
+    wanted = re.sub(r"[-_.]+", "_", name).lower()
+    for sp in site_packages(venv):
+        for d in sp.glob("*.dist-info"):
+            dist_name = d.name[: -len(".dist-info")].rsplit("-", 1)[0]
+            if re.sub(r"[-_.]+", "_", dist_name).lower() == wanted:
+                return d
+    return None
+
+
+def dist_version(name: str, venv: Path = VENV_DIR) -> Optional[str]:
+    """Installed version of a distribution in `venv`, or None."""
+    dist_info = find_dist_info(name, venv)
+    if dist_info is None:
+        return None
+    return _cached(f"dist:{venv}:{name}", dist_info, lambda: _read_version(dist_info))
+
+
+def _read_version(dist_info: Path) -> Optional[str]:
+    # Imported on a cache miss only; importlib.metadata is slow to load
+    from importlib.metadata import PathDistribution
+
+    return PathDistribution(dist_info).version
+
+
+def pikaraoke_version(venv: Path = VENV_DIR) -> Optional[str]:
+    return dist_version("pikaraoke", venv)
+
+
+def ytdlp_version(venv: Path = VENV_DIR) -> Optional[str]:
+    return dist_version("yt-dlp", venv)
+
+
+def deno_version(deno: Path = DENO_EXE) -> Optional[str]:
+    """deno has no metadata on disk; run it once per binary mtime."""
+
+    def compute():
+        try:
+            out = subprocess.run(
+                [str(deno), "--version"], capture_output=True, text=True, timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        m = re.search(r"deno (\S+)", out)
+        return m.group(1) if m else None
+
+    return _cached(f"bin:{deno}", deno, compute)
+
+
+if __name__ == "__main__":
+    print(f"pikaraoke : {pikaraoke_version() or 'not installed'}")
+    print(f"yt-dlp    : {ytdlp_version() or 'not installed'}")
+    print(f"deno      : {deno_version() or 'not installed'}")
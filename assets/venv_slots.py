@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Blue/green PiKaraoke virtualenvs.
+
+~/.venv-pikaraoke is a symlink to one slot under ~/.deskpi-karaoke/venvs/.
+Updates never touch the active slot:
+
+- `stage()` builds a fresh venv in a new slot (meant to run in the background
+  while PiKaraoke is up), from the offline wheelhouse when it matches the
+  pins (pk_packages.py), installs the `python -m yt_dlp` hook
+  (ytdlp_cache.py), byte-compiles it and smoke-tests it: imports,
+  `pikaraoke --help` and `python -m yt_dlp --version` through the hook. Only
+  a slot that passes is recorded as staged; a failed build is deleted.
+- `activate_staged()` runs at the next launch, before PiKaraoke starts, and
+  swaps the symlink atomically (rename over the old link).
+- The previously active slot is kept, so `pk rollback` is one more swap.
+
+An existing real directory at ~/.venv-pikaraoke is moved into the slots
+directory as "legacy" the first time a slot is staged. Its scripts keep
+working because their shebangs point at ~/.venv-pikaraoke, which then
+resolves through the link.
+
+    venv_slots.py [status|stage|activate|rollback]
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+from pk_packages import PKG_CORE, pyvenv_version, wheelhouse_install_args, wheelhouse_usable
+
+HOME = Path.home()
+VENV_LINK = HOME / ".venv-pikaraoke"
+SLOTS_DIR = HOME / ".deskpi-karaoke" / "venvs"
+STATE_FILE = SLOTS_DIR / "slots.json"
+LEGACY_SLOT = "legacy"
+
+PACKAGES = PKG_CORE  # the set install.py installs into the first venv
+SMOKE_IMPORTS = "import pikaraoke, yt_dlp, flask"
+SMOKE_TIMEOUT = 120
+PIP_TIMEOUT = 1800
+
+
+# --- state ---
+def load_state(path: Path = STATE_FILE) -> dict:
+    try:
+        data = json.loads(path.read_text())
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict, path: Path = STATE_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2) + "\n")
+    tmp.replace(path)
+
+
+@contextmanager
+def _locked(name: str, blocking: bool = True):
+    """flock on SLOTS_DIR/<name>; yields False if non-blocking and busy."""
+    SLOTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(SLOTS_DIR / name, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def active_slot(link: Path = VENV_LINK) -> Optional[str]:
+    """Name of the slot the link points at (None if it is not a slot link)."""
+    if not link.is_symlink():
+        return None
+    target = Path(os.readlink(link))
+    if not target.is_absolute():
+        target = link.parent / target
+    return target.name if target.parent.resolve() == SLOTS_DIR.resolve() else None
+
+
+# --- slot operations ---
+def adopt_legacy(log: Callable[[str], None] = print) -> Optional[str]:
+    """Move a real ~/.venv-pikaraoke directory into the slots and link it."""
+    if VENV_LINK.is_symlink() or not VENV_LINK.is_dir():
+        return active_slot()
+    dest = SLOTS_DIR / LEGACY_SLOT
+    if dest.exists():
+        dest = SLOTS_DIR / f"{LEGACY_SLOT}-{time.strftime('%Y%m%d-%H%M%S')}"
+    SLOTS_DIR.mkdir(parents=True, exist_ok=True)
+    os.rename(VENV_LINK, dest)
+    os.symlink(dest, VENV_LINK)
+    state = load_state()
+    state["active"] = dest.name
+    save_state(state)
+    log(f"📦 Moved existing venv into slot {dest.name}")
+    return dest.name
+
+
+def swap_to(slot: str):
+    """Point ~/.venv-pikaraoke at `slot` with a single rename."""
+    target = SLOTS_DIR / slot
+    tmp = VENV_LINK.with_name(VENV_LINK.name + ".swap")
+    if tmp.is_symlink() or tmp.exists():
+        tmp.unlink()
+    os.symlink(target, tmp)
+    os.replace(tmp, VENV_LINK)
+
+
+def _run(cmd, log, timeout):
+    try:
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log(f"   {cmd[0]}: {e}")
+        return False
+    for line in result.stdout.splitlines()[-20:]:
+        log(f"   {line}")
+    return result.returncode == 0
+
+
+def smoke_test(slot_dir: Path, log: Callable[[str], None] = print) -> bool:
+    py = slot_dir / "bin" / "python"
+    checks = [
+        ("imports", [str(py), "-c", SMOKE_IMPORTS]),
+        ("pikaraoke --help", [str(slot_dir / "bin" / "pikaraoke"), "--help"]),
+        ("python -m yt_dlp --version", [str(py), "-m", "yt_dlp", "--version"]),
+    ]
+    for name, cmd in checks:
+        if not _run(cmd, log, SMOKE_TIMEOUT):
+            log(f"❌ Smoke test failed: {name}")
+            return False
+        log(f"✅ Smoke test passed: {name}")
+    return True
+
+
+def build_slot(slot_dir: Path, packages: list, log: Callable[[str], None] = print) -> bool:
+    py = slot_dir / "bin" / "python"
+    pip = [str(py), "-m", "pip", "--disable-pip-version-check"]
+    if not _run([sys.executable, "-m", "venv", str(slot_dir)], log, PIP_TIMEOUT):
+        return False
+    installed = False
+    if packages == PKG_CORE and wheelhouse_usable(pyvenv_version(slot_dir), log):
+        log("📦 Installing from the offline wheelhouse (no index)")
+        installed = _run(pip + wheelhouse_install_args(), log, PIP_TIMEOUT)
+    if not installed and not _run(pip + ["install", "--upgrade"] + packages, log, PIP_TIMEOUT):
+        return False
+    try:
+        from ytdlp_cache import install_hook
+
+        install_hook(slot_dir)  # PiKaraoke's `python -m yt_dlp` calls go through the cache
+    except (ImportError, OSError) as e:
+        log(f"❌ Could not install the yt-dlp hook: {e}")
+        return False
+    # purelib of the new venv, compiled on all cores (see install.py precompile_venv)
+    return _run([str(py), "-c", "import compileall, sysconfig; "
+                                "compileall.compile_dir(sysconfig.get_paths()['purelib'], quiet=1, workers=0)"],
+                log, PIP_TIMEOUT)
+
+
+def stage(packages: list = PACKAGES, log: Callable[[str], None] = print) -> Optional[str]:
+    """Build, test and record a new slot. Returns its name, or None."""
+    with _locked(".stage.lock", blocking=False) as got:
+        if not got:
+            log("ℹ️ Another update is already being staged")
+            return None
+        with _locked(".state.lock"):
+            adopt_legacy(log)
+        slot = base = time.strftime("%Y%m%d-%H%M%S")
+        n = 1
+        while (SLOTS_DIR / slot).exists():  # never build over an existing slot
+            n += 1
+            slot = f"{base}-{n}"
+        slot_dir = SLOTS_DIR / slot
+        log(f"🔧 Staging venv slot {slot}: {' '.join(packages)}")
+        start = time.monotonic()
+        if not (build_slot(slot_dir, packages, log) and smoke_test(slot_dir, log)):
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            log(f"❌ Staging failed after {time.monotonic() - start:.0f}s; active venv untouched")
+            return None
+        with _locked(".state.lock"):
+            state = load_state()
+            old = state.get("staged")
+            state["staged"] = slot
+            state["staged_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            save_state(state)
+            if old and old != slot:
+                shutil.rmtree(SLOTS_DIR / old, ignore_errors=True)
+        log(f"✅ Staged slot {slot} in {time.monotonic() - start:.0f}s; it goes live on next launch")
+        return slot
+
+
+def prune(state: dict):
+    keep = {state.get("active"), state.get("previous"), state.get("staged")}
+    for p in SLOTS_DIR.iterdir():
+        if p.is_dir() and not p.is_symlink() and p.name not in keep:
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def activate_staged(log: Callable[[str], None] = print) -> Optional[str]:
+    """Swap a staged slot in (call before starting PiKaraoke)."""
+    with _locked(".state.lock"):
+        state = load_state()
+        slot = state.get("staged")
+        if not slot:
+            return None
+        if not (SLOTS_DIR / slot / "bin" / "python").exists():
+            log(f"⚠️ Staged slot {slot} is missing; ignoring it")
+            state.pop("staged", None)
+            save_state(state)
+            return None
+        adopt_legacy(log)
+        current = active_slot()
+        swap_to(slot)
+        state.update(active=slot, previous=current, activated_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+        state.pop("staged", None)
+        state.pop("staged_at", None)
+        save_state(state)
+        prune(state)
+        log(f"🔁 Switched venv to slot {slot} (previous: {current})")
+        return slot
+
+
+def rollback(log: Callable[[str], None] = print) -> Optional[str]:
+    """Swap back to the previously active slot."""
+    with _locked(".state.lock"):
+        state = load_state()
+        previous = state.get("previous")
+        if not previous or not (SLOTS_DIR / previous / "bin" / "python").exists():
+            log("❌ No previous venv to roll back to")
+            return None
+        current = active_slot()
+        swap_to(previous)
+        state.update(active=previous, previous=current, activated_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+        save_state(state)
+        log(f"⏪ Rolled back venv to slot {previous}; restart PiKaraoke (or reboot) to use it")
+        return previous
+
+
+def status() -> dict:
+    state = load_state()
+    state["link"] = os.readlink(VENV_LINK) if VENV_LINK.is_symlink() else (
+        "directory (not yet slotted)" if VENV_LINK.is_dir() else "missing")
+    state["slots"] = sorted(p.name for p in SLOTS_DIR.glob("*") if p.is_dir()) if SLOTS_DIR.exists() else []
+    return state
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "status"
+    if cmd == "status":
+        print(json.dumps(status(), indent=2))
+    elif cmd == "stage":
+        sys.exit(0 if stage() else 1)
+    elif cmd == "activate":
+        if not activate_staged():
+            print("ℹ️ Nothing staged")
+    elif cmd == "rollback":
+        sys.exit(0 if rollback() else 1)
+    else:
+        raise SystemExit("usage: venv_slots.py [status|stage|activate|rollback]")
+
+
+if __name__ == "__main__":
+    main()
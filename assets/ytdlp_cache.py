@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Caching front-end for yt-dlp metadata lookups.
+
+PiKaraoke never runs `yt-dlp` from PATH: every search, download, `--version`
+and `-U` is `[sys.executable, "-m", "yt_dlp", ...]` in its venv. The installer
+therefore puts a startup hook in the venv's site-packages (`install_hook()`:
+deskpi_ytdlp_hook.pth plus a small finder module) that resolves
+`yt_dlp.__main__` — which only `-m yt_dlp` ever imports — to this file, so
+`python -m yt_dlp ARGS` runs main() here instead. `import yt_dlp` and the
+venv's `yt-dlp` console script are untouched; passthrough calls use the
+latter, so they never come back through the hook.
+
+Search and info calls (`-j`/`-J`) are cached by video ID or search query
+(plus the remaining flags) in ~/.cache/deskpi-karaoke/ytdlp with a TTL, and
+evicted least-recently-used once the cache passes its byte budget. Anything else — downloads, `--version`,
+`-U` — is handed straight to the venv's real yt-dlp; downloads are queued
+with the launcher's download scheduler (download_scheduler.py) and keep their
+temp files in the RAM scratch area (see ytdlp_scratch.py).
+
+While the launcher's uplink monitor reports no uplink, calls that would need
+the network (PiKaraoke's searches and downloads) fail at once (exit 2,
+message on stderr) instead of hanging on DNS and socket timeouts; cached
+results are still served. They work again as soon as the monitor sees an
+uplink, without restarting PiKaraoke.
+
+    ytdlp_cache.py --deskpi-cache-stats
+    ytdlp_cache.py --deskpi-cache-clear
+    ytdlp_cache.py --deskpi-install-hook VENV_DIR
+"""
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+HOME = Path.home()
+VENV_DIR = HOME / ".venv-pikaraoke"
+HOOK_NAME = "deskpi_ytdlp_hook"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", HOME / ".cache")) / "deskpi-karaoke" / "ytdlp"
+CACHE_BUDGET_BYTES = 64 * 1024 * 1024
+SEARCH_TTL = 6 * 3600
+VIDEO_TTL = 24 * 3600
+
+METADATA_FLAGS = {"-j", "--dump-json", "-J", "--dump-single-json"}
+# Options that change what is printed; anything unknown makes us pass through
+_VALUE_OPTS = {"-f", "--format", "-o", "--output", "--extractor-args", "--js-runtimes",
+               "--cookies", "-S", "--format-sort", "--playlist-items", "-I",
+               "--compat-options", "--proxy", "-P", "--paths"}
+# Present on calls that do not download media
+_NO_DOWNLOAD = METADATA_FLAGS | {"-U", "--update", "--version", "-h", "--help", "-s", "--simulate",
+                                 "--skip-download", "-F", "--list-formats", "--rm-cache-dir"}
+# Answered locally by yt-dlp, so they are allowed while offline
+_OFFLINE_OK = {"--version", "-h", "--help"}
+OFFLINE_EXIT = 2
+_YT_ID = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/)([A-Za-z0-9_-]{11})")
+
+
+def _real_ytdlp() -> Path:
+    """The venv's `yt-dlp` console script. Under the hook this is the
+    interpreter's own venv; it imports yt_dlp directly, so it bypasses the hook."""
+    own = Path(sys.executable).with_name("yt-dlp")
+    return own if own.exists() else VENV_DIR / "bin" / "yt-dlp"
+
+
+REAL_YTDLP = _real_ytdlp()
+
+
+def hook_source(wrapper: Path) -> str:
+    return f'''# deskpi-karaoke: run `python -m yt_dlp` through {wrapper}
+# (written by ytdlp_cache.install_hook, loaded by {HOOK_NAME}.pth)
+import os
+import sys
+
+WRAPPER = {str(wrapper)!r}
+
+
+class YtdlpMainFinder:
+    """Resolve yt_dlp.__main__, which only `-m yt_dlp` imports, to WRAPPER."""
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        if name != "yt_dlp.__main__" or not os.path.exists(WRAPPER):
+            return None
+        from importlib.util import spec_from_file_location
+
+        if os.path.dirname(WRAPPER) not in sys.path:
+            sys.path.append(os.path.dirname(WRAPPER))  # its sibling modules
+        return spec_from_file_location(name, WRAPPER)
+
+
+sys.meta_path.insert(0, YtdlpMainFinder)
+'''
+
+
+def site_packages(venv_dir: Path) -> Optional[Path]:
+    found = sorted(Path(venv_dir).glob("lib/python3*/site-packages"))
+    return found[-1] if found else None
+
+
+def hook_installed(venv_dir: Path = VENV_DIR, wrapper: Path = HOME / "ytdlp_cache.py") -> bool:
+    site = site_packages(venv_dir)
+    try:
+        return bool(site) and (site / f"{HOOK_NAME}.py").read_text() == hook_source(wrapper)
+    except OSError:
+        return False
+
+
+def install_hook(venv_dir: Path = VENV_DIR, wrapper: Path = HOME / "ytdlp_cache.py") -> Path:
+    """Route the venv's `python -m yt_dlp` through `wrapper` (this module)."""
+    site = site_packages(venv_dir)
+    if site is None:
+        raise FileNotFoundError(f"no site-packages under {venv_dir}")
+    (site / f"{HOOK_NAME}.py").write_text(hook_source(wrapper))
+    (site / f"{HOOK_NAME}.pth").write_text(f"import {HOOK_NAME}\n")
+    return site
+
+
+def split_args(argv: list) -> Tuple[list, list]:
+    """(positionals, flags) with option values kept next to their option."""
+    positionals, flags, i = [], [], 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in _VALUE_OPTS and i + 1 < len(argv):
+            flags.extend(argv[i : i + 2])
+            i += 2
+            continue
+        (flags if arg.startswith("-") else positionals).append(arg)
+        i += 1
+    return positionals, flags
+
+
+def is_download(argv: list) -> bool:
+    return bool(split_args(argv)[0]) and not _NO_DOWNLOAD.intersection(argv)
+
+
+def video_id(target: str) -> Optional[str]:
+    """YouTube video ID in a URL or bare ID, else None."""
+    m = _YT_ID.search(target)
+    return m.group(1) if m else (target if re.fullmatch(r"[A-Za-z0-9_-]{11}", target) else None)
+
+
+def cache_key(argv: list) -> Optional[Tuple[str, str, int]]:
+    """Return (kind, key, ttl) for cacheable metadata calls, else None."""
+    if not METADATA_FLAGS.intersection(argv):
+        return None
+    positionals, flags = split_args(argv)
+    if len(positionals) != 1:
+        return None
+    target = positionals[0]
+    flag_hash = hashlib.sha256("\0".join(flags).encode()).hexdigest()[:12]
+    m = re.match(r"ytsearch(\d*):(.*)", target, re.DOTALL)
+    if m:
+        query = " ".join(m.group(2).lower().split())
+        return "search", f"search:{m.group(1)}:{query}:{flag_hash}", SEARCH_TTL
+    vid = video_id(target)
+    if vid:
+        return "video", f"video:{vid}:{flag_hash}", VIDEO_TTL
+    return None
+
+
+class MetadataCache:
+    def __init__(self, directory: Path = CACHE_DIR, budget_bytes: int = CACHE_BUDGET_BYTES):
+        self.directory = Path(directory)
+        self.budget_bytes = budget_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key: str, ttl: float) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created", 0) > ttl or entry.get("key") != key:
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock
+        except OSError:
+            pass
+        return entry.get("stdout")
+
+    def put(self, key: str, stdout: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"key": key, "created": time.time(), "stdout": stdout}))
+        tmp.replace(path)
+        self.evict()
+
+    def entries(self) -> list:
+        out = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+                out.append((st.st_mtime, st.st_size, p))
+            except OSError:
+                pass
+        return out
+
+    def evict(self):
+        """Drop least-recently-used entries until under the byte budget."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.budget_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            path.unlink(missing_ok=True)
+
+
+def passthrough(argv: list):
+    """Exec the real yt-dlp. Downloads are queued with the launcher's download
+    scheduler when it runs, else go to the governor's "downloads" scope and
+    RAM scratch directly; cached metadata lookups stay in the caller's scope
+    since a search is waiting on them."""
+    if is_download(argv):
+        try:
+            import download_scheduler
+        except ImportError:
+            pass
+        else:
+            rc = download_scheduler.submit(argv)
+            if rc is not None:
+                sys.exit(rc)
+    wrap, env = list, None
+    try:
+        from pk_governor import Governor
+
+        governor = Governor()
+        wrap, env = (lambda cmd: governor.command("downloads", cmd)), governor.env("downloads")
+    except (ImportError, OSError):
+        pass
+    if is_download(argv):
+        try:
+            import ytdlp_scratch
+        except ImportError:
+            pass
+        else:
+            sys.exit(ytdlp_scratch.download(str(REAL_YTDLP), argv, wrap=wrap, env=env))
+    cmd = wrap([str(REAL_YTDLP)] + argv)
+    if env is not None:
+        os.environ.update(env)
+    os.execvp(cmd[0], cmd)
+
+
+def offline() -> bool:
+    """True only if a running uplink monitor says there is no uplink."""
+    try:
+        from net_watch import read_uplink_state
+    except ImportError:
+        return False
+    return read_uplink_state() is False
+
+
+def refuse_offline() -> int:
+    print("ERROR: no internet uplink (deskpi-karaoke offline mode); "
+          "YouTube is available again once the uplink is back", file=sys.stderr)
+    return OFFLINE_EXIT
+
+
+def run(argv: list, cache: Optional[MetadataCache] = None) -> int:
+    key = cache_key(argv)
+    if key is None:
+        if offline() and not _OFFLINE_OK.intersection(argv):
+            return refuse_offline()
+        passthrough(argv)
+    kind, k, ttl = key
+    cache = cache or MetadataCache()
+    hit = cache.get(k, ttl)
+    if hit is not None:
+        sys.stdout.write(hit)
+        sys.stdout.flush()
+        return 0
+    if offline():
+        return refuse_offline()
+    result = subprocess.run([str(REAL_YTDLP)] + argv, stdout=subprocess.PIPE, text=True)
+    sys.stdout.write(result.stdout)
+    sys.stdout.flush()
+    if result.returncode == 0 and result.stdout.strip():
+        try:
+            cache.put(k, result.stdout)
+        except OSError:
+            pass
+    return result.returncode
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--deskpi-cache-stats"]:
+        entries = MetadataCache().entries()
+        total = sum(size for _, size, _ in entries)
+        mb = 1024 * 1024
+        print(f"{len(entries)} entries, {total / mb:.1f} MB of {CACHE_BUDGET_BYTES / mb:.0f} MB in {CACHE_DIR}")
+        return 0
+    if argv[:1] == ["--deskpi-cache-clear"]:
+        MetadataCache().clear()
+        print(f"🧹 Cleared {CACHE_DIR}")
+        return 0
+    if argv[:1] == ["--deskpi-install-hook"] and len(argv) == 2:
+        print(f"🪝 python -m yt_dlp hook installed in {install_hook(Path(argv[1]))}")
+        return 0
+    return run(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
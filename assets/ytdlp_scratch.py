@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+RAM-backed scratch space for yt-dlp downloads.
+
+The installer mounts a size-bounded tmpfs at ~/.cache/deskpi-karaoke/scratch
+and the generated yt-dlp config points `--paths temp:` at it, so fragments,
+.part files and the ffmpeg merge stay in RAM. Only the finished file reaches
+the library, moved there in one sequential write.
+
+PiKaraoke's downloads arrive here through the `python -m yt_dlp` hook
+(ytdlp_cache.py). yt-dlp ignores the temp path when `-o` is absolute, which
+is how PiKaraoke calls it, so `download()` rewrites `-o /dir/template` into
+`-P home:/dir -o template` and gives each download its own scratch
+subdirectory. It spills to disk (a hidden directory next to the library, so
+the final move is a rename) when the tmpfs has less than SCRATCH_MIN_FREE left
+at the start, and re-runs the download there if the tmpfs fills up midway.
+"""
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+try:
+    from pk_thermal import announce
+except ImportError:  # fan control is optional for the shim
+    announce = None
+
+HOME = Path.home()
+SCRATCH_DIR = HOME / ".cache" / "deskpi-karaoke" / "scratch"  # tmpfs mount point (install.py)
+SPILL_DIR_NAME = ".deskpi-scratch"  # dot-directory: ignored by the song manifest
+SCRATCH_MIN_FREE = 192 * 1024 * 1024  # a 720p song plus its merge, with margin
+_NO_SPACE = ("No space left on device", "[Errno 28]")
+_HEAVY_STEPS = ("[Merger]", "[VideoConvertor]", "[VideoRemuxer]", "[ExtractAudio]")
+HEAVY_STEP_SECONDS = 90  # a 720p merge/convert on a Pi 4, with margin
+
+
+def split_output(argv: list) -> Tuple[list, Optional[str]]:
+    """Rewrite an absolute `-o DIR/TEMPLATE` as `-P home:DIR -o TEMPLATE`.
+
+    Returns (argv, home_dir); home_dir is None when nothing was rewritten
+    (relative template, or fields in the directory part).
+    """
+    out = list(argv)
+    for i, arg in enumerate(out[:-1]):
+        if arg not in ("-o", "--output"):
+            continue
+        directory, template = os.path.split(out[i + 1])
+        if not os.path.isabs(out[i + 1]) or "%(" in directory or not template:
+            return out, None
+        out[i + 1] = template
+        return out[:i] + ["-P", f"home:{directory}"] + out[i:], directory
+    return out, None
+
+
+def _free(path: Path) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+def scratch_for(home: Optional[str], root: Path = SCRATCH_DIR,
+                min_free: int = SCRATCH_MIN_FREE) -> Tuple[Path, bool]:
+    """(parent directory for this download's scratch, True if it is the tmpfs)."""
+    if root.is_dir() and _free(root) >= min_free:
+        return root, True
+    return spill_dir(home), False
+
+
+def spill_dir(home: Optional[str]) -> Path:
+    if home:
+        return Path(home) / SPILL_DIR_NAME
+    return SCRATCH_DIR.parent / "spill"
+
+
+def run_ytdlp(cmd: list, env: Optional[dict] = None, out: Optional[Callable[[str], None]] = None,
+              err: Optional[Callable[[str], None]] = None,
+              on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+              cwd: Optional[str] = None) -> Tuple[int, bool]:
+    """Run yt-dlp with stdout passed through and stderr forwarded line by line.
+
+    Returns (returncode, ran_out_of_space). SIGTERM/SIGINT are handed on to
+    the child, so a caller stopping the wrapper stops the download. A caller
+    that wants the output (the download scheduler) passes `out`/`err` line
+    callbacks and gets the Popen, in its own process group, via `on_start`.
+    """
+    proc = subprocess.Popen(cmd, stdout=None if out is None else subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env, cwd=cwd, start_new_session=on_start is not None)
+    if on_start is not None:
+        on_start(proc)
+    no_space = []
+
+    def forward(line):
+        sys.stderr.write(line)
+        sys.stderr.flush()
+
+    def pump(stream, sink, watch):
+        for raw in stream:
+            line = raw.decode(errors="replace")
+            if watch and any(s in line for s in _NO_SPACE):
+                no_space.append(line)
+            if line.startswith(_HEAVY_STEPS) and announce is not None:
+                announce("merge", HEAVY_STEP_SECONDS)
+            sink(line)
+
+    readers = [threading.Thread(target=pump, args=(proc.stderr, err or forward, True), daemon=True)]
+    if out is not None:
+        readers.append(threading.Thread(target=pump, args=(proc.stdout, out, False), daemon=True))
+    for reader in readers:
+        reader.start()
+    previous = {}
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            previous[sig] = signal.signal(sig, lambda s, _f: proc.send_signal(s))
+        except ValueError:  # not the main thread
+            pass
+    try:
+        rc = proc.wait()
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    for reader in readers:
+        reader.join(timeout=5)
+    return rc, bool(no_space)
+
+
+def _attempt(real: str, argv: list, parent: Path, wrap: Callable[[list], list],
+             env: Optional[dict], **io) -> Tuple[int, bool]:
+    parent.mkdir(parents=True, exist_ok=True)
+    scratch = parent / f"{os.getpid()}-{int(time.time() * 1000)}"
+    scratch.mkdir()
+    try:
+        return run_ytdlp(wrap([real, "-P", f"temp:{scratch}"] + argv), env, **io)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if parent.name == SPILL_DIR_NAME:
+            try:
+                parent.rmdir()  # only if no other download is using it
+            except OSError:
+                pass
+
+
+def download(real: str, argv: list, wrap: Callable[[list], list] = list,
+             env: Optional[dict] = None, root: Path = SCRATCH_DIR, **io) -> int:
+    """Run one yt-dlp download with its temp files in RAM when they fit.
+
+    `io` (out, err, on_start, cwd) is handed to run_ytdlp().
+    """
+    argv, home = split_output(argv)
+    parent, in_ram = scratch_for(home, root)
+    rc, no_space = _attempt(real, argv, parent, wrap, env, **io)
+    if rc != 0 and in_ram and no_space:
+        (io.get("err") or sys.stderr.write)("WARNING: RAM scratch full; retrying the download on disk\n")
+        rc, _ = _attempt(real, argv, spill_dir(home), wrap, env, **io)
+    return rc
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the download scheduler (assets/download_scheduler.py).
+
+Runs --songs downloads the way PiKaraoke 1.18.0's DownloadManager does —
+one at a time from a single worker, each waiting for the previous — against
+the fake yt-dlp in bench/fakes/fake_ytdlp.py (a simulated link). Once
+directly, as PiKaraoke does on its own (a failure is final), and once
+through the scheduler via the client the `python -m yt_dlp` hook uses.
+--fail songs fail their first attempt, which the scheduler retries.
+
+Reports when the first song is ready, when all are, how many failed and how
+many yt-dlp runs it took.
+
+    python3 bench/download_bench.py [--songs 10] [--link-mbps 4] [--size-mb 8] [--fail 1] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+FAKE_YTDLP = BENCH_DIR / "fakes" / "fake_ytdlp.py"
+sys.path.insert(0, str(ROOT / "assets"))
+
+import download_scheduler  # noqa: E402
+
+
+def video_ids(n: int) -> list:
+    return [f"song{i:02d}xxxxx"[:11] for i in range(n)]
+
+
+def request(vid: str, library: Path) -> list:
+    return ["-f", "best", "-o", f"{library}/%(title)s---%(id)s.%(ext)s",
+            f"https://www.youtube.com/watch?v={vid}"]
+
+
+def run_unscheduled(ids: list, library: Path, env: dict) -> dict:
+    start = time.monotonic()
+    ready, rcs = {}, []
+    for vid in ids:
+        proc = subprocess.run([sys.executable, str(FAKE_YTDLP)] + request(vid, library), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        ready[vid] = time.monotonic() - start
+        rcs.append(proc.returncode)
+    return {"next_up_s": ready[ids[0]], "all_s": max(ready.values()),
+            "failed": sum(1 for rc in rcs if rc != 0)}
+
+
+def run_scheduled(ids: list, library: Path, env: dict, tmp: Path) -> dict:
+    os.environ.update(env)
+    scheduler = download_scheduler.DownloadScheduler(
+        ytdlp=FAKE_YTDLP,
+        config=dict(download_scheduler.DEFAULT_CONFIG, backoff_initial=0.5),
+        socket_path=tmp / "downloads.sock",
+        status_file=tmp / "downloads.json",
+        stats_file=tmp / "download_stats.json",
+        is_offline=lambda: False,
+        cpu_count=4,
+        log=lambda m: None,
+    )
+    scheduler.start()
+    time.sleep(0.2)
+    start = time.monotonic()
+    ready, rcs = {}, []
+    for vid in ids:  # PiKaraoke's worker waits for each download
+        proc = subprocess.run(
+            [sys.executable, "-c",
+             "import sys, download_scheduler; from pathlib import Path; "
+             "sys.exit(download_scheduler.submit(sys.argv[2:], Path(sys.argv[1])))",
+             str(tmp / "downloads.sock")] + request(vid, library),
+            env=dict(os.environ, PYTHONPATH=str(ROOT / "assets")), capture_output=True)
+        ready[vid] = time.monotonic() - start
+        rcs.append(proc.returncode)
+    scheduler.stop()
+    return {"next_up_s": ready[ids[0]], "all_s": max(ready.values()),
+            "failed": sum(1 for rc in rcs if rc != 0), "workers": scheduler.workers()}
+
+
+def runs(state: Path) -> int:
+    return sum(1 for line in (state / "runs.log").read_text().splitlines() if " start " in line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scheduled vs unscheduled yt-dlp downloads against a fake")
+    parser.add_argument("--songs", type=int, default=10)
+    parser.add_argument("--link-mbps", type=float, default=4.0, help="Simulated link, MB/s")
+    parser.add_argument("--size-mb", type=float, default=8.0, help="Size of each download")
+    parser.add_argument("--fail", type=int, default=1, help="Songs whose first attempt fails")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    ids = video_ids(args.songs)
+    report = {"songs": args.songs, "link_mbps": args.link_mbps, "size_mb": args.size_mb}
+    for mode in ("unscheduled", "scheduled"):
+        with tempfile.TemporaryDirectory(prefix="pk-download-bench-") as tmp:
+            tmp = Path(tmp)
+            env = dict(os.environ, FAKE_YTDLP_DIR=str(tmp / "fake"), FAKE_LINK_MBPS=str(args.link_mbps),
+                       FAKE_YTDLP_SIZE_MB=str(args.size_mb), FAKE_YTDLP_FAIL=" ".join(ids[1:1 + args.fail]))
+            library = tmp / "songs"
+            if mode == "unscheduled":
+                result = run_unscheduled(ids, library, env)
+            else:
+                result = run_scheduled(ids, library, env, tmp)
+            result["ytdlp_runs"] = runs(tmp / "fake")
+            result["files"] = len(list(library.glob("*.mp4")))
+            report[mode] = {k: round(v, 2) if isinstance(v, float) else v for k, v in result.items()}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.songs} songs ({args.fail} failing once) of {args.size_mb:g} MB, one at a time, "
+          f"over a {args.link_mbps:g} MB/s link")
+    print(f"  {'mode':<12} {'first':>8} {'all':>8} {'runs':>5} {'failed':>7}")
+    for mode in ("unscheduled", "scheduled"):
+        r = report[mode]
+        print(f"  {mode:<12} {r['next_up_s']:>7.1f}s {r['all_s']:>7.1f}s {r['ytdlp_runs']:>5} {r['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Bench stand-in for Chromium in kiosk mode (assets/pk_display.py).
+
+Reads its whole --user-data-dir at start, then "starts up" for
+FAKE_CHROMIUM_STARTUP seconds. A file:// URL is treated as the pre-warm wait
+page: the server and splash URLs are taken from it and the server is polled
+the way its script does. Once the splash page answers, the time is appended to
+FAKE_CHROMIUM_LOG. Until SIGTERM it then does what playback does: rewrites
+FAKE_CHROMIUM_PROFILE_KB per second in place in a profile database and appends
+FAKE_CHROMIUM_CACHE_KB per second of media to the disk cache; the byte counts
+are logged on exit.
+"""
+
+import json
+import os
+import re
+import signal
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+running = True
+
+
+def stop(*_):
+    global running
+    running = False
+
+
+def answers(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def main():
+    signal.signal(signal.SIGTERM, stop)
+    opts = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    url = sys.argv[-1]
+    user_data = Path(opts["user-data-dir"])
+    cache = Path(opts.get("disk-cache-dir", user_data / "Cache"))
+    for dirpath, _dirs, files in os.walk(user_data):
+        for name in files:
+            try:
+                Path(dirpath, name).read_bytes()
+            except OSError:
+                pass
+    time.sleep(float(os.environ.get("FAKE_CHROMIUM_STARTUP", "3.0")))
+    splash = url
+    if url.startswith("file://"):
+        page = Path(url[len("file://"):]).read_text()
+        server = re.search(r'fetch\("([^"]+)"', page).group(1)
+        splash = re.search(r'location\.replace\("([^"]+)"\)', page).group(1)
+        while running and not answers(server):
+            time.sleep(0.25)
+    if running and answers(splash):
+        with open(os.environ["FAKE_CHROMIUM_LOG"], "a") as log:
+            log.write(json.dumps({"splash_at": time.time(), "url": url}) + "\n")
+
+    profile_chunk = os.urandom(int(os.environ.get("FAKE_CHROMIUM_PROFILE_KB", "16")) * 1024)
+    cache_chunk = os.urandom(int(os.environ.get("FAKE_CHROMIUM_CACHE_KB", "512")) * 1024)
+    history = user_data / "Default" / "History"
+    history.parent.mkdir(parents=True, exist_ok=True)
+    history.touch()
+    cache.mkdir(parents=True, exist_ok=True)
+    n = 0
+    while running:
+        size = history.stat().st_size
+        with open(history, "r+b") as f:  # SQLite-style page rewrites
+            f.seek((n * len(profile_chunk)) % max(1, size - len(profile_chunk)) if size > len(profile_chunk) else 0)
+            f.write(profile_chunk)
+        with open(cache / f"f_{n // 8:06d}", "ab") as f:
+            f.write(cache_chunk)
+        n += 1
+        time.sleep(1.0)
+    with open(os.environ["FAKE_CHROMIUM_LOG"], "a") as log:
+        log.write(json.dumps({"profile_bytes": n * len(profile_chunk), "cache_bytes": n * len(cache_chunk)}) + "\n")
+
+if __name__ == "__main__":
+    main()
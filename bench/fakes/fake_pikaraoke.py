@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Bench stand-in for the pikaraoke server: after FAKE_PIKARAOKE_STARTUP
+seconds, answers HTTP on localhost:5555 (the launcher's readiness probe)."""
+
+import http.server
+import os
+import sys
+import time
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"fake pikaraoke"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    if "--help" in sys.argv:
+        print("usage: pikaraoke [--headless] (fake)")
+        sys.exit(0)
+    print("fake pikaraoke starting", flush=True)
+    time.sleep(float(os.environ.get("FAKE_PIKARAOKE_STARTUP", "0")))
+    http.server.ThreadingHTTPServer(("127.0.0.1", 5555), Handler).serve_forever()
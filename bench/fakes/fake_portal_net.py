@@ -0,0 +1,86 @@
+"""Bench stand-ins for the captive portal's nmcli / ip / hostapd / dnsmasq
+wrappers (assets/raspi_portal/netctl.py), with configurable latencies.
+
+`FakeNetwork` holds the simulated world: which networks are visible, their
+passwords, and whether the uplink is up. Joining a network brings the uplink
+up after `uplink_delay` seconds.
+"""
+
+import asyncio
+import time
+
+
+class FakeNetwork:
+    def __init__(self, networks=None, scan_delay=1.5, associate_delay=3.0, uplink_delay=1.0,
+                 daemon_delay=0.3, ip_delay=0.05):
+        self.networks = networks or {"VenueWiFi": "letmein", "Guest": ""}
+        self.scan_delay = scan_delay
+        self.associate_delay = associate_delay
+        self.uplink_delay = uplink_delay
+        self.daemon_delay = daemon_delay
+        self.ip_delay = ip_delay
+        self.connected = None
+        self.online_at = None
+        self.calls = []
+
+    async def uplink(self) -> bool:
+        return self.online_at is not None and time.monotonic() >= self.online_at
+
+
+class FakeNmcli:
+    def __init__(self, net: FakeNetwork):
+        self.net = net
+
+    async def scan(self, iface):
+        self.net.calls.append("scan")
+        await asyncio.sleep(self.net.scan_delay)
+        return [{"ssid": ssid, "signal": 80 - 10 * i, "secure": bool(psk)}
+                for i, (ssid, psk) in enumerate(self.net.networks.items())]
+
+    async def device_states(self):
+        return {"wlan0": ("wifi", "connected" if self.net.connected else "disconnected"),
+                "lo": ("loopback", "unmanaged")}
+
+    async def set_managed(self, iface, managed):
+        self.net.calls.append(f"managed={managed}")
+
+    async def connect(self, iface, ssid, psk=""):
+        self.net.calls.append(f"connect {ssid}")
+        await asyncio.sleep(self.net.associate_delay)
+        if self.net.networks.get(ssid) != psk:
+            return False, "Error: Connection activation failed: Secrets were required, but not provided."
+        self.net.connected = ssid
+        self.net.online_at = time.monotonic() + self.net.uplink_delay
+        return True, f"Device '{iface}' successfully activated"
+
+    async def forget(self, ssid):
+        self.net.calls.append(f"forget {ssid}")
+
+
+class FakeIp:
+    def __init__(self, net: FakeNetwork):
+        self.net = net
+
+    async def up(self, iface, address="10.42.0.1", prefix=24):
+        await asyncio.sleep(self.net.ip_delay)
+
+    async def flush(self, iface):
+        await asyncio.sleep(self.net.ip_delay)
+
+
+class FakeDaemon:
+    def __init__(self, net: FakeNetwork, name: str):
+        self.net = net
+        self.name = name
+        self.running = False
+
+    async def start(self, iface):
+        self.net.calls.append(f"{self.name} start")
+        await asyncio.sleep(self.net.daemon_delay)
+        self.running = True
+
+    async def stop(self):
+        if self.running:
+            self.net.calls.append(f"{self.name} stop")
+            await asyncio.sleep(self.net.daemon_delay / 3)
+        self.running = False
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Bench stand-in for yt-dlp downloads.
+
+Downloads FAKE_YTDLP_SIZE_MB (video + 12% audio, as two streams) over a
+simulated link of FAKE_LINK_MBPS MB/s shared evenly by every fake running
+against the same FAKE_YTDLP_DIR, printing yt-dlp style `--newline` progress.
+The finished file is written from `-P home:DIR` and `-o TEMPLATE`
+(`%(id)s`, `%(title)s`, `%(ext)s`). Video IDs listed in FAKE_YTDLP_FAIL
+fail their first attempt. Every run is appended to FAKE_YTDLP_DIR/runs.log.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+TICK = 0.05
+
+
+def arg_values(argv, *names):
+    return [argv[i + 1] for i, a in enumerate(argv[:-1]) if a in names]
+
+
+def main(argv):
+    state = Path(os.environ.get("FAKE_YTDLP_DIR", "/tmp/fake-ytdlp"))
+    active = state / "active"
+    active.mkdir(parents=True, exist_ok=True)
+    target = [a for a in argv if not a.startswith("-") and a not in arg_values(argv, "-P", "-o", "--paths", "--output")][-1]
+    vid = target.rsplit("=", 1)[-1][-11:]
+    with open(state / "runs.log", "a") as log:
+        log.write(f"{time.time():.3f} start {vid}\n")
+    failures = set(os.environ.get("FAKE_YTDLP_FAIL", "").split())
+    attempts = state / f"attempts-{vid}"
+    attempts.write_text(str(int(attempts.read_text()) + 1 if attempts.exists() else 1))
+    if vid in failures and attempts.read_text() == "1":
+        time.sleep(0.2)
+        print("ERROR: [youtube] fake HTTP Error 403: Forbidden", file=sys.stderr)
+        return 1
+
+    link = float(os.environ.get("FAKE_LINK_MBPS", "4")) * (1 << 20)
+    size = float(os.environ.get("FAKE_YTDLP_SIZE_MB", "8")) * (1 << 20)
+    me = active / str(os.getpid())
+    me.touch()
+    try:
+        for stream in (size * 0.88, size * 0.12):
+            done = 0.0
+            while done < stream:
+                share = link / max(1, len(list(active.iterdir())))
+                time.sleep(TICK)
+                done = min(stream, done + share * TICK)
+                print(f"[download] {100 * done / stream:5.1f}% of {stream / (1 << 20):.2f}MiB "
+                      f"at {share / (1 << 20):.2f}MiB/s ETA 00:00", flush=True)
+    finally:
+        me.unlink()
+    home = next((p[5:] for p in arg_values(argv, "-P", "--paths") if p.startswith("home:")), ".")
+    template = (arg_values(argv, "-o", "--output") or ["%(title)s---%(id)s.%(ext)s"])[0]
+    out = Path(home) / template.replace("%(id)s", vid).replace("%(title)s", "Fake Song").replace("%(ext)s", "mp4")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(b"\0" * 1024)
+    with open(state / "runs.log", "a") as log:
+        log.write(f"{time.time():.3f} done {vid}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1 @@
+"""Bench stand-in for pip (found first via PYTHONPATH; see bench/harness.py)."""
@@ -0,0 +1,62 @@
+"""
+Bench stand-in for `python -m pip`.
+
+`install` sleeps FAKE_PIP_LATENCY seconds per requirement and writes minimal
+dist-info metadata into the running interpreter's site-packages, plus console
+scripts for pikaraoke (a local HTTP server, see fake_pikaraoke.py) and yt-dlp.
+"""
+
+import os
+import re
+import sys
+import sysconfig
+import time
+from pathlib import Path
+
+FAKES = Path(__file__).resolve().parent.parent.parent
+VERSIONS = {"pikaraoke": "1.18.0", "yt-dlp": "2025.1.1", "yt_dlp": "2025.1.1"}
+
+
+def _dist_info(name: str, version: str):
+    purelib = Path(sysconfig.get_paths()["purelib"])
+    d = purelib / f"{name.replace('-', '_')}-{version}.dist-info"
+    d.mkdir(parents=True, exist_ok=True)
+    (d / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+
+
+def _script(name: str, body: str):
+    bin_dir = Path(sys.prefix) / "bin"
+    path = bin_dir / name
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(0o755)
+
+
+def install(args):
+    reqs = [a for a in args if not a.startswith("-") and not os.path.exists(a)]
+    for req in reqs:
+        time.sleep(float(os.environ.get("FAKE_PIP_LATENCY", "0")))
+        name = re.split(r"[<>=!~\[ ]", req, 1)[0]
+        pinned = re.search(r"==([\w.]+)", req)
+        version = pinned.group(1) if pinned else VERSIONS.get(name, "1.0.0")
+        _dist_info(name, version)
+        print(f"fake pip: installed {name} {version}")
+        if name == "pikaraoke":
+            _script(
+                "pikaraoke",
+                "import runpy, sys\n"
+                f"sys.argv[0] = {str(FAKES / 'fake_pikaraoke.py')!r}\n"
+                f"runpy.run_path({str(FAKES / 'fake_pikaraoke.py')!r}, run_name='__main__')\n",
+            )
+        elif name == "yt-dlp":
+            _script("yt-dlp", f"print({version!r})\n")
+
+
+def main(argv):
+    if argv[:1] == ["install"]:
+        install(argv[1:])
+    elif argv[:1] == ["--version"]:
+        print("pip 24.0 (fake)")
+    return 0
+
+
+sys.exit(main(sys.argv[1:]))
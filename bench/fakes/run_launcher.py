@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Run ~/autostart_pikaraoke.py with a simulated network.
+
+The uplink "comes up" at FAKE_NET_UP_AT (epoch seconds): until then wlan0 has
+no default route, and at that moment the event source wakes the watcher the
+way a kernel route notification would. The reachability probe and the fake
+`ping` on PATH answer from the same timestamp.
+"""
+
+import os
+import runpy
+import sys
+import time
+from pathlib import Path
+
+HOME = Path.home()
+UP_AT = float(os.environ.get("FAKE_NET_UP_AT", "0"))
+
+
+def is_up() -> bool:
+    return time.time() >= UP_AT
+
+
+class SimulatedRouteEvents:
+    name = "simulated"
+
+    def wait(self, timeout):
+        remaining = UP_AT - time.time()
+        if 0 < remaining <= timeout:
+            time.sleep(remaining)
+            return True
+        time.sleep(max(0.0, min(timeout, 0.05)) if remaining <= 0 else timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+sys.path.insert(0, str(HOME))
+import net_watch  # noqa: E402
+
+net_watch.open_event_source = SimulatedRouteEvents
+net_watch.has_default_route = lambda iface=None: is_up()
+net_watch.check_internet = lambda timeout=3: is_up()
+sys.argv = [str(HOME / "autostart_pikaraoke.py")] + sys.argv[1:]
+runpy.run_path(str(HOME / "autostart_pikaraoke.py"), run_name="__main__")
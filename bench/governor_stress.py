@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stress harness for the resource governor (assets/pk_governor.py).
+
+A "player" probe stands in for playback: it wakes on a fixed frame clock,
+does a slice of CPU work per frame and records how late each frame finished.
+Alongside it, CPU burners and a disk writer stand in for yt-dlp/ffmpeg in the
+"downloads" scope. The same load runs once with no governor and once with the
+selected backend, and frame lateness (p50/p95/p99/max, late frames) is
+compared.
+
+Runs on any Linux box; the "nice" backend needs nothing special, "systemd"
+needs a user session and "cgroup" a delegated cgroup v2 subtree.
+
+    python3 bench/governor_stress.py [--backend auto|systemd|cgroup|nice] [--seconds 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "assets"))
+
+import pk_governor  # noqa: E402
+
+FRAME_MS = 16.7  # 60 fps
+WORK_MS = 4.0  # CPU per frame, roughly what a decode + composite costs
+LATE_MS = FRAME_MS  # a frame later than one frame period counts as dropped
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+# --- roles (run as subprocesses) ---
+def role_probe(seconds: float, out: Path):
+    frame, work = FRAME_MS / 1000.0, WORK_MS / 1000.0
+    lateness = []
+    start = time.monotonic()
+    deadline = start + frame
+    while deadline - start < seconds:
+        spin_until = time.monotonic() + work
+        while time.monotonic() < spin_until:
+            pass
+        done = time.monotonic()
+        lateness.append(max(0.0, (done - deadline) * 1000.0))
+        deadline += frame
+        if deadline < done:  # dropped frames: resync to the next slot
+            deadline = done + frame - ((done - deadline) % frame)
+        time.sleep(max(0.0, deadline - time.monotonic()))
+    out.write_text(json.dumps(lateness))
+
+
+def role_cpu(seconds: float):
+    end = time.monotonic() + seconds
+    x = 0
+    while time.monotonic() < end:
+        x = (x * 31 + 7) % 1000003
+
+
+def role_io(seconds: float, directory: Path):
+    end = time.monotonic() + seconds
+    block = os.urandom(1 << 20)
+    path = directory / "io-load.bin"
+    with open(path, "wb") as f:
+        while time.monotonic() < end:
+            for _ in range(8):
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+    path.unlink()
+
+
+# --- driver ---
+def _role_cmd(role: str, seconds: float, *extra) -> list:
+    return [sys.executable, str(Path(__file__).resolve()), "--role", role, "--seconds", str(seconds)] + list(extra)
+
+
+def run_trial(governor, seconds: float, burners: int, io: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pk-stress-") as tmp:
+        tmp = Path(tmp)
+        out = tmp / "probe.json"
+        load = []
+        for _ in range(burners):
+            cmd = _role_cmd("cpu", seconds + 1)
+            load.append(subprocess.Popen(governor.command("downloads", cmd), env=governor.env("downloads")))
+        if io:
+            cmd = _role_cmd("io", seconds + 1, "--dir", str(tmp))
+            load.append(subprocess.Popen(governor.command("downloads", cmd), env=governor.env("downloads")))
+        time.sleep(0.5)  # let the load ramp up
+        probe_cmd = _role_cmd("probe", seconds, "--out", str(out))
+        subprocess.run(governor.command("player", probe_cmd), env=governor.env("player"), check=True)
+        for p in load:
+            p.wait()
+        lateness = json.loads(out.read_text())
+    return {
+        "backend": governor.backend.name,
+        "frames": len(lateness),
+        "late_frames": sum(1 for v in lateness if v > LATE_MS),
+        "p50_ms": round(_percentile(lateness, 50), 2),
+        "p95_ms": round(_percentile(lateness, 95), 2),
+        "p99_ms": round(_percentile(lateness, 99), 2),
+        "max_ms": round(max(lateness) if lateness else float("nan"), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure playback jitter under download load")
+    parser.add_argument("--backend", default="auto", choices=["auto", "systemd", "cgroup", "nice"])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--burners", type=int, default=2 * (os.cpu_count() or 1))
+    parser.add_argument("--no-io", action="store_true", help="CPU load only")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--role", choices=["probe", "cpu", "io"], help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.role == "probe":
+        return role_probe(args.seconds, args.out)
+    if args.role == "cpu":
+        return role_cpu(args.seconds)
+    if args.role == "io":
+        return role_io(args.seconds, args.dir)
+
+    policy = pk_governor.load_policy()
+    trials = [
+        run_trial(pk_governor.Governor(policy, pk_governor.NoneBackend()), args.seconds, args.burners, not args.no_io),
+        run_trial(
+            pk_governor.Governor(policy, pk_governor.select_backend(args.backend)),
+            args.seconds, args.burners, not args.no_io,
+        ),
+    ]
+    if args.json:
+        print(json.dumps(trials, indent=2))
+        return
+    print(f"Player probe: {WORK_MS} ms work per {FRAME_MS} ms frame, {args.burners} CPU burners"
+          f"{'' if args.no_io else ' + disk writer'} in the downloads scope, {args.seconds:.0f}s each")
+    print(f"  {'backend':<8} {'frames':>6} {'late':>5} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+    for t in trials:
+        print(
+            f"  {t['backend']:<8} {t['frames']:>6} {t['late_frames']:>5} {t['p50_ms']:>6.1f}ms"
+            f" {t['p95_ms']:>6.1f}ms {t['p99_ms']:>6.1f}ms {t['max_ms']:>6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
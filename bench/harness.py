@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Off-device benchmark for the installer and the launcher.
+
+Each scenario runs the real install.py / autostart_pikaraoke.py in a throwaway
+HOME against stand-ins from bench/fakes/:
+
+- bin/apt-get, bin/curl, bin/sudo, bin/ping, bin/ffmpeg — shell fakes with
+  configurable latency (FAKE_APT_LATENCY, FAKE_CURL_LATENCY)
+- pymods/pip — `python -m pip` stand-in (FAKE_PIP_LATENCY per requirement)
+  that installs a fake pikaraoke answering HTTP on :5555 after
+  FAKE_PIKARAOKE_STARTUP seconds
+- run_launcher.py — runs the launcher with a network that comes up
+  FAKE_NET_UP_AFTER seconds after start
+
+Scenarios:
+
+- install_cold — fresh HOME, every step runs
+- install_warm — same HOME again (step cache)
+- launch — launcher from start to PiKaraoke reachable, per boot-timeline
+  phase (default mode: PiKaraoke starts before the uplink is up)
+- launch_wait — the same with --wait-for-uplink (launch only once online)
+
+Per-phase timings are printed as JSON (median of --repeat runs). With --check
+each metric is compared against bench/baseline.json and the run fails when one
+regresses past the tolerance; --update-baseline stores the current numbers.
+
+    python3 bench/harness.py [--repeat 3] [--check | --update-baseline] [--scenario NAME ...]
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+FAKES = BENCH_DIR / "fakes"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+LATENCIES = {
+    "FAKE_APT_LATENCY": "1.0",
+    "FAKE_CURL_LATENCY": "0.5",
+    "FAKE_PIP_LATENCY": "0.2",
+    "FAKE_PIKARAOKE_STARTUP": "1.0",
+}
+NET_UP_AFTER = 3.0
+LAUNCH_TIMEOUT = 90
+TOLERANCE = 0.25  # relative
+SLACK = 0.5  # seconds; keeps sub-second phases from flapping
+
+
+def bench_env(home: Path, **extra) -> dict:
+    env = {
+        "HOME": str(home),
+        "PATH": f"{FAKES / 'bin'}:/usr/local/bin:/usr/bin:/bin",
+        "PYTHONPATH": str(FAKES / "pymods"),
+        "LANG": os.environ.get("LANG", "C.UTF-8"),
+        "PYTHONUNBUFFERED": "1",
+    }
+    env.update(LATENCIES)
+    env.update({k: v for k, v in os.environ.items() if k in LATENCIES})
+    env.update(extra)
+    return env
+
+
+def run_installer(home: Path, log) -> dict:
+    timings = home / "install_timings.json"
+    start = time.monotonic()
+    subprocess.run(
+        [sys.executable, str(ROOT / "install.py"), "--timings-json", str(timings)],
+        env=bench_env(home),
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        check=True,
+    )
+    data = json.loads(timings.read_text())
+    metrics = {"wall": round(time.monotonic() - start, 3)}
+    for name, step in data["steps"].items():
+        metrics[f"step.{name}"] = step["seconds"]
+    return metrics
+
+
+def run_launcher(home: Path, log, *args) -> dict:
+    # Reproducible scheduling policy, no dependency on a user systemd here
+    (home / ".deskpi-karaoke").mkdir(parents=True, exist_ok=True)
+    (home / ".deskpi-karaoke" / "governor.json").write_text('{"backend": "nice"}\n')
+    timeline_file = home / ".deskpi-karaoke" / "boot_timelines.json"
+    timeline_file.unlink(missing_ok=True)
+    env = bench_env(home, FAKE_NET_UP_AT=str(time.time() + NET_UP_AFTER))
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [str(home / ".venv-pikaraoke" / "bin" / "python"), str(FAKES / "run_launcher.py")] + list(args),
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    try:
+        record = None
+        while time.monotonic() - start < LAUNCH_TIMEOUT:
+            try:
+                records = json.loads(timeline_file.read_text())
+                events = records[-1]["events"] if records else []
+                if any(e["name"] == "pikaraoke_reachable" for e in events):
+                    record = records[-1]
+                    break
+            except (OSError, ValueError, KeyError, IndexError):
+                pass
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        if record is None:
+            raise RuntimeError("launcher never reported PiKaraoke reachable (see bench log)")
+    finally:
+        if proc.poll() is None:
+            os.killpg(proc.pid, signal.SIGTERM)
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+
+    metrics = {}
+    for ev in record["events"]:
+        if "dur" in ev:
+            key = f"span.{ev['name']}"
+            metrics[key] = round(metrics.get(key, 0.0) + ev["dur"], 3)
+        elif ev["name"] in ("popen", "pikaraoke_reachable"):
+            metrics[f"at.{ev['name']}"] = ev["t"]
+    if "--wait-for-uplink" in args:
+        # Time after the network came up, i.e. what the launcher itself adds
+        metrics["reachable_after_uplink"] = round(metrics["at.pikaraoke_reachable"] - NET_UP_AFTER, 3)
+    return metrics
+
+
+def run_scenarios(names, repeat: int, log) -> dict:
+    samples = {name: [] for name in names}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="pk-bench-") as tmp:
+            home = Path(tmp)
+            cold = run_installer(home, log)  # every other scenario needs an installed HOME
+            if "install_cold" in samples:
+                samples["install_cold"].append(cold)
+            if "install_warm" in samples:
+                samples["install_warm"].append(run_installer(home, log))
+            if "launch" in samples:
+                samples["launch"].append(run_launcher(home, log))
+            if "launch_wait" in samples:
+                samples["launch_wait"].append(run_launcher(home, log, "--wait-for-uplink"))
+    results = {}
+    for name, runs in samples.items():
+        keys = sorted({k for r in runs for k in r})
+        results[name] = {k: round(statistics.median(r[k] for r in runs if k in r), 3) for k in keys}
+    return results
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Return [(scenario, metric, baseline, current)] for regressions."""
+    regressions = []
+    for scenario, metrics in baseline.get("results", {}).items():
+        for key, base in metrics.items():
+            current = results.get(scenario, {}).get(key)
+            if current is not None and current > base * (1 + TOLERANCE) + SLACK:
+                regressions.append((scenario, key, base, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark install.py and the launcher against fakes")
+    parser.add_argument("--scenario", action="append", choices=["install_cold", "install_warm", "launch", "launch_wait"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--log", type=Path, default=Path(tempfile.gettempdir()) / "pk-bench.log",
+                        help="Installer/launcher output (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = args.scenario or ["install_cold", "install_warm", "launch", "launch_wait"]
+    with open(args.log, "w") as log:
+        results = run_scenarios(names, max(1, args.repeat), log)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "latencies": {k: float(v) for k, v in {**LATENCIES, **{k: os.environ[k] for k in LATENCIES if k in os.environ}}.items()},
+        "net_up_after": NET_UP_AFTER,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"📌 Baseline written to {BASELINE_FILE}", file=sys.stderr)
+    if args.check:
+        try:
+            baseline = json.loads(BASELINE_FILE.read_text())
+        except (OSError, ValueError):
+            raise SystemExit(f"❌ No baseline at {BASELINE_FILE}; run with --update-baseline first")
+        regressions = compare(results, baseline)
+        for scenario, key, base, current in regressions:
+            print(f"❌ {scenario} {key}: {current:.2f}s (baseline {base:.2f}s)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
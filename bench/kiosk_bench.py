@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the Chromium kiosk (assets/pk_display.py).
+
+Runs the real KioskDisplay against bench/fakes/fake_chromium.py (a cold
+start of --chromium-startup seconds, then steady profile and cache writes)
+and a stand-in PiKaraoke that answers on :5555 after --server-startup
+seconds. Three launches from a cold boot:
+
+- disk         — profile and cache on the card, Chromium started once the
+                 server answers (the old pk_display.py)
+- ram          — RAM profile seeded from the snapshot, still started after
+                 the server
+- ram+prewarm  — RAM profile, Chromium started at once on the wait page
+
+For each it reports the seconds from launch to the splash page, the seeding
+cost, and the bytes written to the card's profile directory during --play
+seconds of playback. On the card that is every profile and cache write. With
+the RAM profile it is only the periodic and final syncs.
+
+    python3 bench/kiosk_bench.py [--server-startup 4] [--chromium-startup 3] [--play 30] [--json]
+"""
+
+import argparse
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT / "assets"))
+
+from pk_display import DEFAULT_CONFIG, KioskDisplay, KioskProfile  # noqa: E402
+
+FAKE_CHROMIUM = BENCH_DIR / "fakes" / "fake_chromium.py"
+MODES = {
+    "disk": {"tmpfs_profile": False, "prewarm": False},
+    "ram": {"tmpfs_profile": True, "prewarm": False},
+    "ram+prewarm": {"tmpfs_profile": True, "prewarm": True},
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"splash"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_after(delay: float, started: list):
+    time.sleep(delay)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 5555), Handler)
+    started.append(server)
+    server.serve_forever(poll_interval=0.1)
+
+
+def seed_snapshot(snapshot: Path, megabytes: int):
+    """A used profile: preferences plus a few databases."""
+    (snapshot / "Default").mkdir(parents=True)
+    (snapshot / "Default" / "Preferences").write_text(json.dumps({"profile": {"exit_type": "Crashed"}}))
+    for name in ("History", "Cookies", "Web Data", "Favicons"):
+        (snapshot / "Default" / name).write_bytes(os.urandom(megabytes * 1024 * 1024 // 4))
+
+
+def launch(mode: str, args, tmp: Path) -> dict:
+    snapshot = tmp / "chromium-profile"
+    seed_snapshot(snapshot, args.profile_mb)
+    log_file = tmp / "chromium.log"
+    os.environ.update(FAKE_CHROMIUM_LOG=str(log_file), FAKE_CHROMIUM_STARTUP=str(args.chromium_startup))
+    config = dict(DEFAULT_CONFIG, sync_interval=args.play / 2, **MODES[mode])
+    profile = KioskProfile(snapshot, runtime_root=tmp / "ram", enabled=config["tmpfs_profile"],
+                           cache_mb=config["cache_mb"], log=lambda m: None)
+    real_prepare = profile.prepare
+    seed = {}
+
+    def timed_prepare():
+        t0 = time.monotonic()
+        dirs = real_prepare()
+        seed.setdefault("s", time.monotonic() - t0)
+        return dirs
+
+    profile.prepare = timed_prepare
+    display = KioskDisplay(config=config, profile=profile, chromium=str(FAKE_CHROMIUM), log=lambda m: None)
+
+    servers = []
+    start = time.time()
+    threading.Thread(target=serve_after, args=(args.server_startup, servers), daemon=True).start()
+    thread = display.start()
+    splash_at = None
+    while splash_at is None and time.time() - start < 60:
+        try:
+            for line in log_file.read_text().splitlines():
+                splash_at = json.loads(line).get("splash_at", splash_at)
+        except OSError:
+            pass
+        time.sleep(0.05)
+    time.sleep(args.play)
+    display.stop()
+    thread.join(timeout=30)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    written = {}
+    for line in log_file.read_text().splitlines():
+        written.update(json.loads(line))
+    card_bytes = written["profile_bytes"] + written["cache_bytes"] if not profile.in_ram else profile.bytes_synced
+    return {
+        "splash_s": round(splash_at - start, 2) if splash_at else None,
+        "seed_s": round(seed.get("s", 0.0), 3),
+        "card_mb_written": round(card_bytes / 2**20, 1),
+        "profile": "ram" if profile.in_ram else "disk",
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chromium kiosk start and profile I/O against a fake Chromium")
+    parser.add_argument("--server-startup", type=float, default=4.0, help="PiKaraoke answers after (s)")
+    parser.add_argument("--chromium-startup", type=float, default=3.0, help="Chromium cold start (s)")
+    parser.add_argument("--play", type=float, default=30.0, help="Playback after the splash (s)")
+    parser.add_argument("--profile-mb", type=int, default=8, help="Size of the persisted profile")
+    parser.add_argument("--profile-kb", type=int, default=16, help="Profile rewrites per second during playback")
+    parser.add_argument("--cache-kb", type=int, default=512, help="Media cache writes per second during playback")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    os.environ.update(FAKE_CHROMIUM_PROFILE_KB=str(args.profile_kb), FAKE_CHROMIUM_CACHE_KB=str(args.cache_kb))
+
+    report = {}
+    for mode in MODES:
+        shm = Path("/dev/shm")
+        with tempfile.TemporaryDirectory(prefix="pk-kiosk-bench-") as tmp, \
+                tempfile.TemporaryDirectory(prefix="pk-kiosk-ram-", dir=shm if shm.is_dir() else None) as ram:
+            tmp = Path(tmp)
+            (tmp / "ram").symlink_to(ram, target_is_directory=True)
+            report[mode] = launch(mode, args, tmp)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"server ready after {args.server_startup:.1f}s, Chromium cold start {args.chromium_startup:.1f}s, "
+          f"{args.profile_mb} MB profile, {args.play:.0f}s playback")
+    for mode, r in report.items():
+        print(f"{mode:>12}: splash after {r['splash_s']}s, seed {r['seed_s']}s, "
+              f"{r['card_mb_written']} MB written to the card")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the Wi-Fi setup captive portal (assets/raspi_portal/).
+
+Runs the real state machine and HTTP layer on localhost against the stand-ins
+in bench/fakes/fake_portal_net.py (simulated scan, association and uplink
+latencies), then:
+
+1. checks every captive-portal probe URL gets a reply that opens the sign-in
+   page, and measures request latency with --clients concurrent phones
+2. submits a wrong password: the portal must come back in AP mode with an
+   error and without scanning again
+3. submits the right one and reports the measured switch time per phase
+   (AP down, association, uplink)
+
+    python3 bench/portal_bench.py [--clients 20] [--associate 3.0] [--uplink 1.0] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT / "assets"))
+sys.path.insert(0, str(BENCH_DIR / "fakes"))
+
+from fake_portal_net import FakeDaemon, FakeIp, FakeNetwork, FakeNmcli  # noqa: E402
+from raspi_portal import Portal, PortalHTTP  # noqa: E402
+from raspi_portal.web import PAGE_PROBES, REDIRECT_PROBES  # noqa: E402
+
+
+async def request(port: int, method: str, path: str, host: str = "10.42.0.1", body: bytes = b""):
+    """(status code, headers, body) — no redirect following, unlike urllib."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+    if body:
+        head += "Content-Type: application/x-www-form-urlencoded\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+    return int(lines[0].split()[1]), headers, payload
+
+
+async def wait_state(portal: Portal, *states: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while portal.state not in states:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"portal stuck in {portal.state}")
+        await asyncio.sleep(0.02)
+
+
+async def bench(args) -> dict:
+    net = FakeNetwork(scan_delay=args.scan, associate_delay=args.associate, uplink_delay=args.uplink)
+    portal = Portal(nmcli=FakeNmcli(net), ip=FakeIp(net), hostapd=FakeDaemon(net, "hostapd"),
+                    dnsmasq=FakeDaemon(net, "dnsmasq"), uplink=net.uplink, switch_grace=0.2,
+                    log=lambda m: None)
+    http = PortalHTTP(portal, host="127.0.0.1", port=0)
+    await http.start()
+    run = asyncio.create_task(portal.run(timeout=120))
+    await wait_state(portal, "ap")
+    report = {"scan_s": portal.scan_seconds, "ap_up_s": portal.ap_seconds}
+
+    probes = {}
+    for path in sorted(REDIRECT_PROBES | PAGE_PROBES):
+        status, headers, body = await request(http.port, "GET", path, host="connectivitycheck.example")
+        probes[path] = status
+        assert status == 302 or b"Wi-Fi setup" in body, (path, status)
+    _, headers, _ = await request(http.port, "GET", "/", host="example.com")
+    probes["other host"] = headers.get("Location")
+    report["probes"] = probes
+
+    latencies = []
+
+    async def phone():
+        t0 = time.perf_counter()
+        status, _, body = await request(http.port, "GET", "/")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        assert status == 200 and b"VenueWiFi" in body
+
+    for _ in range(args.rounds):
+        await asyncio.gather(*(phone() for _ in range(args.clients)))
+    latencies.sort()
+    report["page_ms"] = {"p50": round(statistics.median(latencies), 2),
+                         "p95": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+                         "max": round(latencies[-1], 2), "requests": len(latencies)}
+
+    form = urlencode({"ssid": "VenueWiFi", "psk": "wrong"}).encode()
+    await request(http.port, "POST", "/connect", body=form)
+    await wait_state(portal, "switching")
+    await wait_state(portal, "ap")
+    _, _, page = await request(http.port, "GET", "/")
+    report["wrong_password"] = {"back_in_ap_s": portal.switch.get("total"),
+                                "error_shown": b"could not join" in page}
+
+    form = urlencode({"ssid": "VenueWiFi", "psk": "letmein"}).encode()
+    status, _, _ = await request(http.port, "POST", "/connect", body=form)
+    joined = await run
+    await http.stop()
+    report["switch"] = dict(portal.switch, joined=joined)
+    report["scans"] = net.calls.count("scan")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Captive portal against fake hostapd/dnsmasq/nmcli")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent page requests per round")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--scan", type=float, default=1.5, help="Simulated scan time (s)")
+    parser.add_argument("--associate", type=float, default=3.0, help="Simulated association + DHCP (s)")
+    parser.add_argument("--uplink", type=float, default=1.0, help="Uplink up after association (s)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(bench(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"AP up after {report['ap_up_s']:.2f}s (scan {report['scan_s']:.2f}s, {report['scans']} scan total)")
+    print("probes: " + ", ".join(f"{p} → {s}" for p, s in report["probes"].items()))
+    page = report["page_ms"]
+    print(f"setup page: p50 {page['p50']} ms, p95 {page['p95']} ms, max {page['max']} ms "
+          f"({page['requests']} requests, {args.clients} concurrent)")
+    wrong = report["wrong_password"]
+    print(f"wrong password: back in AP mode after {wrong['back_in_ap_s']:.2f}s, "
+          f"error shown: {wrong['error_shown']}")
+    sw = report["switch"]
+    print(f"switch: {sw['total']:.2f}s total (AP down {sw['ap_down']:.2f}s, associate {sw['associate']:.2f}s, "
+          f"uplink {sw['uplink']:.2f}s), online: {sw['online']}")
+
+
+if __name__ == "__main__":
+    main()
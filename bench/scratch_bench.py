@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the RAM scratch area used by yt-dlp (assets/ytdlp_scratch.py).
+
+Replays the file I/O of one merged download the way yt-dlp does it:
+
+1. video and audio fragments are written as separate files
+2. the fragments are appended into one .part file per stream
+3. ffmpeg reads both streams and writes the merged file
+4. the merged file is moved into the library
+
+once with the temp files next to the library (yt-dlp's default) and once with
+them on a tmpfs. For each it reports throughput and the bytes written to the
+library's block device, from /proc/self/io (this process only) and from the
+device's own counters in /sys (whole device, so keep the system quiet).
+
+A real download takes minutes, long enough for the kernel to write dirty
+temp files back before they are deleted; the replay takes seconds, so it
+syncs after each stage to get the same effect (--no-sync-stages to skip).
+
+    python3 bench/scratch_bench.py [--library DIR] [--tmpfs DIR] [--size-mb 120] [--repeat 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "assets"))
+
+import ytdlp_scratch  # noqa: E402
+
+BLOCK = 1 << 20
+FRAGMENT_MB = 4  # ~ a YouTube DASH fragment at 720p
+AUDIO_SHARE = 0.12  # m4a is ~12% of a 720p H.264 + AAC download
+
+
+def process_write_bytes() -> Optional[int]:
+    try:
+        for line in Path("/proc/self/io").read_text().splitlines():
+            if line.startswith("write_bytes:"):
+                return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def device_stat_file(path: Path) -> Optional[Path]:
+    """/sys/dev/block/M:m/stat of the device holding `path` (whole disk if needed)."""
+    dev = os.stat(path).st_dev
+    stat = Path(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}/stat")
+    return stat if stat.exists() else None
+
+
+def device_write_bytes(stat: Optional[Path]) -> Optional[int]:
+    if stat is None:
+        return None
+    try:
+        return int(stat.read_text().split()[6]) * 512  # sectors written
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _write(path: Path, nbytes: int, block: bytes):
+    with open(path, "wb") as f:
+        while nbytes > 0:
+            n = min(nbytes, len(block))
+            f.write(block[:n])
+            nbytes -= n
+
+
+def _append(dst, src: Path):
+    with open(src, "rb") as f:
+        shutil.copyfileobj(f, dst, BLOCK)
+    src.unlink()
+
+
+def simulate_download(temp: Path, library: Path, size: int, block: bytes, sync_stages: bool = True) -> Path:
+    settle = os.sync if sync_stages else (lambda: None)
+    streams = {"video": int(size * (1 - AUDIO_SHARE)), "audio": int(size * AUDIO_SHARE)}
+    parts = {}
+    for name, nbytes in streams.items():
+        frags = []
+        for i, offset in enumerate(range(0, nbytes, FRAGMENT_MB * BLOCK)):
+            frag = temp / f"song.f{name}.mp4.part-Frag{i}"
+            _write(frag, min(FRAGMENT_MB * BLOCK, nbytes - offset), block)
+            frags.append(frag)
+        settle()
+        part = temp / f"song.f{name}.mp4.part"
+        with open(part, "wb") as dst:
+            for frag in frags:
+                _append(dst, frag)
+        parts[name] = part
+    settle()
+    merged = temp / "song.temp.mp4"
+    with open(merged, "wb") as dst:  # ffmpeg -c copy: read both, write once
+        for part in parts.values():
+            _append(dst, part)
+    settle()
+    final = library / "Artist - Song---bench000000.mp4"
+    shutil.move(str(merged), str(final))
+    with open(final, "rb+") as f:
+        os.fsync(f.fileno())
+    return final
+
+
+def run_trial(temp_root: Path, library: Path, size: int, block: bytes, sync_stages: bool = True) -> dict:
+    stat = device_stat_file(library)
+    with tempfile.TemporaryDirectory(dir=temp_root, prefix="pk-scratch-bench-") as temp:
+        os.sync()
+        proc0, dev0 = process_write_bytes(), device_write_bytes(stat)
+        start = time.monotonic()
+        final = simulate_download(Path(temp), library, size, block, sync_stages)
+        os.sync()
+        seconds = time.monotonic() - start
+        proc1, dev1 = process_write_bytes(), device_write_bytes(stat)
+        final.unlink()
+    return {
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(size / BLOCK / seconds, 1),
+        "process_write_mb": None if proc0 is None else round((proc1 - proc0) / BLOCK, 1),
+        "device_write_mb": None if dev0 is None else round((dev1 - dev0) / BLOCK, 1),
+    }
+
+
+def default_tmpfs() -> Path:
+    if os.path.ismount(ytdlp_scratch.SCRATCH_DIR):
+        return ytdlp_scratch.SCRATCH_DIR
+    return Path("/dev/shm")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare yt-dlp temp files on disk vs tmpfs")
+    parser.add_argument("--library", type=Path, default=Path.home() / "pikaraoke-songs",
+                        help="Directory on the library device (default: %(default)s)")
+    parser.add_argument("--tmpfs", type=Path, default=None,
+                        help="tmpfs directory (default: the installed scratch mount, else /dev/shm)")
+    parser.add_argument("--size-mb", type=int, default=120, help="Download size (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-sync-stages", action="store_true", help="Do not force writeback between stages")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    args.library.mkdir(parents=True, exist_ok=True)
+    tmpfs = args.tmpfs or default_tmpfs()
+    spill = args.library / ytdlp_scratch.SPILL_DIR_NAME
+    spill.mkdir(exist_ok=True)
+    size = args.size_mb * BLOCK
+    block = os.urandom(BLOCK)
+    modes = {"disk": spill, "tmpfs": tmpfs}
+    samples = {name: [] for name in modes}
+    try:
+        for _ in range(max(1, args.repeat)):
+            for name, temp_root in modes.items():
+                samples[name].append(run_trial(temp_root, args.library, size, block, not args.no_sync_stages))
+    finally:
+        shutil.rmtree(spill, ignore_errors=True)
+
+    results = {}
+    for name, runs in samples.items():
+        results[name] = {
+            k: (None if any(r[k] is None for r in runs) else round(statistics.median(r[k] for r in runs), 3))
+            for k in runs[0]
+        }
+    report = {"size_mb": args.size_mb, "library": str(args.library), "tmpfs": str(tmpfs), "results": results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.size_mb} MB merged download, library {args.library}, tmpfs {tmpfs} "
+          f"(median of {max(1, args.repeat)})")
+    print(f"  {'temp on':<7} {'seconds':>8} {'MB/s':>7} {'written (proc)':>15} {'written (device)':>17}")
+    for name, r in results.items():
+        proc = "—" if r["process_write_mb"] is None else f"{r['process_write_mb']:.0f} MB"
+        dev = "—" if r["device_write_mb"] is None else f"{r['device_write_mb']:.0f} MB"
+        print(f"  {name:<7} {r['seconds']:>8.2f} {r['mb_per_s']:>7.1f} {proc:>15} {dev:>17}")
+
+
+if __name__ == "__main__":
+    main()
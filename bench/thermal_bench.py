@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the DeskPi fan controller (assets/pk_thermal.py).
+
+Runs the real controller against a fake sysfs tree and a plain file standing
+in for /dev/ttyUSB0, on a simulated clock. A lumped thermal model of a Pi 4 in
+the DeskPi Lite case (SoC on a heatsink, fan-dependent conductance to the
+case air) turns a karaoke session into temperatures: steady playback plus
+transcodes and yt-dlp merges that announce themselves when they start. The
+model's firmware caps the clock above --throttle-at °C, like the real one.
+
+The same session runs twice: "reactive" (fan curve at the current
+temperature, no trend, no hints) and "predictive" (the shipped defaults).
+Reports peak temperature, seconds throttled, seconds above the soft limit,
+mean fan duty (noise) and number of fan commands.
+
+    python3 bench/thermal_bench.py [--minutes 45] [--throttle-at 80] [--soft-limit 65] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT / "assets"))
+
+from pk_thermal import (  # noqa: E402
+    CPUFREQ,
+    DEFAULT_CONFIG,
+    GET_THROTTLED,
+    THERMAL_ZONE,
+    FanPort,
+    Sysfs,
+    ThermalController,
+)
+
+DT = 0.5  # physics step (s)
+AMBIENT = 28.0  # case intake air (°C)
+HEATSINK_J_PER_K = 45.0
+G_PASSIVE = 0.06  # W/K with the fan stopped
+G_FAN = 0.40  # extra W/K at 100 % duty
+R_DIE = 1.8  # K/W SoC above heatsink
+IDLE_W, PLAYBACK_W = 2.8, 1.6
+JOB_W = {"transcode": 4.5, "merge": 3.0}
+MAX_MHZ, CAPPED_MHZ = 1500, 1000
+
+
+def session(minutes: float) -> list:
+    """(start s, seconds, kind) of the heavy jobs in a session: a burst of
+    requests early on, then a song every few minutes."""
+    jobs = [(60, 240, "transcode"), (90, 45, "merge"), (150, 45, "merge"), (320, 300, "transcode")]
+    t = 700
+    while t < minutes * 60 - 120:
+        jobs.append((t, 45, "merge"))
+        if (t // 300) % 2 == 0:
+            jobs.append((t + 50, 180, "transcode"))
+        t += 300
+    return jobs
+
+
+class FakeCase:
+    def __init__(self, root: Path, throttle_at: float):
+        self.root = root
+        self.throttle_at = throttle_at
+        self.t_sink = AMBIENT + 12.0
+        self.t_die = self.t_sink
+        self.throttled = False
+        self.since_boot = 0
+        for rel in (THERMAL_ZONE, f"{CPUFREQ}/scaling_cur_freq", f"{CPUFREQ}/cpuinfo_max_freq", GET_THROTTLED):
+            (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / CPUFREQ / "cpuinfo_max_freq").write_text(f"{MAX_MHZ * 1000}\n")
+        self.fan_file = root / "ttyUSB0"
+        self.fan_file.write_bytes(b"")
+        self.publish()
+
+    def pwm(self) -> int:
+        with open(self.fan_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 7))
+            tail = f.read().decode()
+        return int(tail[4:]) if tail.startswith("pwm_") else 0
+
+    def advance(self, load_w: float):
+        if self.throttled:
+            load_w *= CAPPED_MHZ / MAX_MHZ
+        power = IDLE_W + PLAYBACK_W + load_w
+        g = G_PASSIVE + G_FAN * self.pwm() / 100.0
+        self.t_sink += DT * (power - (self.t_sink - AMBIENT) * g) / HEATSINK_J_PER_K
+        self.t_die = self.t_sink + R_DIE * power
+        # firmware: cap at the limit, release 2 °C below it
+        if self.t_die >= self.throttle_at:
+            self.throttled = True
+        elif self.t_die < self.throttle_at - 2:
+            self.throttled = False
+        self.publish()
+
+    def publish(self):
+        flags = 0x6 if self.throttled else 0
+        self.since_boot |= flags << 16
+        (self.root / THERMAL_ZONE).write_text(f"{int(self.t_die * 1000)}\n")
+        mhz = CAPPED_MHZ if self.throttled else MAX_MHZ
+        (self.root / CPUFREQ / "scaling_cur_freq").write_text(f"{mhz * 1000}\n")
+        (self.root / GET_THROTTLED).write_text(f"0x{flags | self.since_boot:x}\n")
+
+
+def simulate(config: dict, minutes: float, throttle_at: float, soft_limit: float, hints: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pk-thermal-bench-") as tmp:
+        root = Path(tmp)
+        case = FakeCase(root, throttle_at)
+        hint_dir = root / "heavy"
+        hint_dir.mkdir()
+        clock = {"t": 0.0}
+        wall0 = time.time()
+        events = []
+        controller = ThermalController(
+            sysfs=Sysfs(root), fan=FanPort(case.fan_file), config=config, hint_dir=hint_dir,
+            status_file=None, on_event=lambda name, **d: events.append((round(clock["t"]), name)),
+            clock=lambda: clock["t"], wall_clock=lambda: wall0 + clock["t"], log=lambda m: None,
+        )
+        jobs = session(minutes)
+        announced = set()
+        next_step = 0.0
+        peak = throttled_s = over_soft_s = duty_sum = 0.0
+        samples = 0
+        while clock["t"] < minutes * 60:
+            t = clock["t"]
+            load = 0.0
+            for i, (start, seconds, kind) in enumerate(jobs):
+                if start <= t < start + seconds:
+                    load += JOB_W[kind]
+                    if hints and i not in announced:
+                        # what announce() does, on the simulated wall clock
+                        hint = hint_dir / f"{kind}-{i}"
+                        hint.touch()
+                        until = wall0 + t + seconds
+                        os.utime(hint, (until, until))
+                        announced.add(i)
+            if t >= next_step:
+                controller.step()
+                next_step += config["interval"]
+            case.advance(load)
+            peak = max(peak, case.t_die)
+            throttled_s += DT if case.throttled else 0.0
+            over_soft_s += DT if case.t_die >= soft_limit else 0.0
+            duty_sum += case.pwm()
+            samples += 1
+            clock["t"] += DT
+        commands = case.fan_file.read_bytes().count(b"pwm_")
+        controller.stop()
+    return {
+        "peak_c": round(peak, 1),
+        "throttled_s": round(throttled_s),
+        "over_soft_limit_s": round(over_soft_s),
+        "mean_duty": round(duty_sum / samples, 1),
+        "fan_commands": commands,
+        "throttle_events": sum(1 for _, name in events if name == "throttle"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predictive vs reactive DeskPi fan control on a simulated case")
+    parser.add_argument("--minutes", type=float, default=45.0, help="Simulated session length")
+    parser.add_argument("--throttle-at", type=float, default=80.0, help="Firmware throttle temperature (°C)")
+    parser.add_argument("--soft-limit", type=float, default=65.0, help="Report time at or above this (°C)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    reactive = dict(DEFAULT_CONFIG, lookahead=0.0, hint_boost=0.0)
+    report = {
+        "reactive": simulate(reactive, args.minutes, args.throttle_at, args.soft_limit, hints=False),
+        "predictive": simulate(dict(DEFAULT_CONFIG), args.minutes, args.throttle_at, args.soft_limit, hints=True),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.minutes:.0f} min session, {len(session(args.minutes))} heavy jobs, "
+          f"throttle at {args.throttle_at:.0f}°C")
+    for name, r in report.items():
+        print(f"{name:>10}: peak {r['peak_c']}°C, throttled {r['throttled_s']}s "
+              f"({r['throttle_events']} events), ≥{args.soft_limit:.0f}°C {r['over_soft_limit_s']}s, "
+              f"mean fan {r['mean_duty']}%, {r['fan_commands']} fan commands")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,42 @@ PiKaraoke Installer (dev branch)
 - Copies autostart + UI helpers
 - Installs pk_aliases and sources in shell rc files
 - Records installer state under ~/.deskpi-karaoke
+- Installs from a local wheelhouse (~/.deskpi-karaoke/wheelhouse) when present
+- Skips steps whose inputs are unchanged since the last run (--force to override)
 """
 
+import argparse
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
 import os
 import platform
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+import ytdlp_profiles
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "assets"))
+from pk_packages import (  # noqa: E402  (shared with venv_slots.py)
+    PKG_CORE,
+    WHEELHOUSE_DIR,
+    WHEELHOUSE_LOCK,
+    WHEELHOUSE_REQS,
+    pyvenv_version,
+    wheelhouse_install_args,
+    wheelhouse_usable,
+)
+from ytdlp_cache import hook_installed, install_hook  # noqa: E402
 
 HOME = Path.home()
 VENV_DIR = HOME / ".venv-pikaraoke"
@@ -26,17 +53,46 @@ REPO_ROOT = Path(__file__).resolve().parent
 ASSETS_DIR = REPO_ROOT / "assets"
 AUTOSTART_DIR = HOME / ".config" / "autostart"
 DESKTOP_FILE_PATH = AUTOSTART_DIR / "pikaraoke.desktop"
+DISPLAY_TRIGGER_PATH = AUTOSTART_DIR / "pikaraoke-display.desktop"
+SYSTEMD_USER_DIR = HOME / ".config" / "systemd" / "user"
+SERVER_UNIT = "pikaraoke.service"
+DISPLAY_UNIT = "pikaraoke-display.service"
+AUTOSTART_MODES = ("desktop", "systemd")
+VENV_SLOTS_DIR = STATE_DIR / "venvs"
+STEP_DIGESTS_FILE = STATE_DIR / "step_digests.json"
+YTDLP_CONFIG_FILE = HOME / ".config" / "yt-dlp" / "config"
+SCRATCH_DIR = ytdlp_profiles.SCRATCH_DIR  # tmpfs for yt-dlp temp files
+FSTAB = Path("/etc/fstab")
+FSTAB_BACKUP = Path("/etc/fstab.deskpi-karaoke.bak")
+SYSTEM_UNIT_DIR = Path("/etc/systemd/system")
+
+# Runtime modules copied to $HOME next to the autostart script
+ASSET_MODULES = [
+    "autostart_pikaraoke.py",
+    "pikaraoke_ui.py",
+    "net_watch.py",
+    "venv_probe.py",
+    "pk_logs.py",
+    "boot_timeline.py",
+    "pk_supervisor.py",
+    "song_manifest.py",
+    "song_cache.py",
+    "song_normalizer.py",
+    "ytdlp_cache.py",
+    "ytdlp_scratch.py",
+    "download_scheduler.py",
+    "import_report.py",
+    "venv_slots.py",
+    "pk_packages.py",
+    "pk_governor.py",
+    "pk_display.py",
+    "pk_thermal.py",
+]
 
 PY_MIN = (3, 10)
 
-PKG_CORE = [
-    "pip>=24.0",
-    "setuptools>=68",
-    "wheel",
-    "packaging>=24.0",
-    "yt-dlp",
-    "pikaraoke==1.18.0",  # pinned: 1.19.0 has breaking splash screen bug
-]
+YTDLP_PROFILE_FILE = STATE_DIR / "ytdlp_profile"
+AUTOSTART_MODE_FILE = STATE_DIR / "autostart_mode"
 
 APT_PKGS = [
     "python3-venv",
@@ -50,11 +106,33 @@ APT_PKGS = [
 ]
 
 
+# Per-thread output buffer used while steps run concurrently (see run_steps)
+_STEP_OUTPUT = threading.local()
+
+
 def print_h(msg: str):
     print(f"\n=== {msg} ===")
 
 
 def run(cmd, check=True, cwd=None, env=None, capture_output=False, text=True):
+    buf = getattr(_STEP_OUTPUT, "buf", None)
+    if buf is not None and not capture_output:
+        # Inside a scheduled step: collect child output so it prints grouped
+        result = subprocess.run(
+            cmd,
+            check=False,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=text,
+            shell=isinstance(cmd, str),
+        )
+        if result.stdout:
+            buf.write(result.stdout if text else result.stdout.decode(errors="replace"))
+        if check:
+            result.check_returncode()
+        return result
     if isinstance(cmd, str):
         return subprocess.run(
             cmd,
@@ -71,6 +149,203 @@ def run(cmd, check=True, cwd=None, env=None, capture_output=False, text=True):
         )
 
 
+# --- Step scheduler ---
+@dataclass
+class Step:
+    """One installer step.
+
+    `inputs` returns everything the step's result depends on; when its
+    fingerprint matches the last successful run (and `present` confirms the
+    outputs still exist) the step is skipped as cached.
+    """
+
+    name: str
+    func: Callable[[], object]
+    deps: Tuple[str, ...] = ()
+    inputs: Optional[Callable[[], list]] = None
+    present: Optional[Callable[[], bool]] = None
+    sudo: bool = False  # runs under SUDO_LOCK: one privileged step at a time
+
+
+# Steps that call sudo never overlap, so password prompts and system-wide
+# changes (apt, systemd units) happen one after another.
+SUDO_LOCK = threading.Lock()
+
+@dataclass
+class StepResult:
+    name: str
+    status: str = "pending"  # ok | cached | failed | skipped
+    seconds: float = 0.0
+    error: Optional[BaseException] = None
+    output: str = field(default="", repr=False)
+
+
+class _StepStdout(io.TextIOBase):
+    """sys.stdout proxy: writes go to the current step's buffer, if any."""
+
+    def __init__(self, real):
+        self.real = real
+
+    def write(self, s):
+        buf = getattr(_STEP_OUTPUT, "buf", None)
+        return (buf or self.real).write(s)
+
+    def flush(self):
+        self.real.flush()
+
+
+# --- Input fingerprints ---
+_DIGESTS_LOCK = threading.Lock()
+
+
+def fingerprint(parts) -> str:
+    """sha256 over a list of values; Paths contribute their file contents."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            files = [part] if part.is_file() else sorted(part.rglob("*"))
+            for f in files:
+                if not f.is_file() or "__pycache__" in f.parts:
+                    continue
+                h.update(str(f.relative_to(part.parent)).encode())
+                h.update(f.read_bytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def load_digests() -> Dict[str, str]:
+    try:
+        return json.loads(STEP_DIGESTS_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_digest(name: str, digest: Optional[str]):
+    with _DIGESTS_LOCK:
+        digests = load_digests()
+        if digest is None:
+            digests.pop(name, None)
+        else:
+            digests[name] = digest
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        # Atomic: steps check the cache without the lock while others save
+        tmp = STEP_DIGESTS_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(digests, indent=2, sort_keys=True) + "\n")
+        tmp.replace(STEP_DIGESTS_FILE)
+
+
+def step_digest(step: Step) -> Optional[str]:
+    if step.inputs is None:
+        return None
+    # The step's own source is an input too, so changing a step re-runs it
+    return fingerprint([inspect.getsource(step.func)] + list(step.inputs()))
+
+
+def _run_one(step: Step, force: bool = False) -> StepResult:
+    result = StepResult(step.name)
+    _STEP_OUTPUT.buf = io.StringIO()
+    start = time.monotonic()
+    try:
+        digest = step_digest(step)
+        if (
+            digest is not None
+            and not force
+            and load_digests().get(step.name) == digest
+            and (step.present is None or step.present())
+        ):
+            print(f"⏩ {step.name}: inputs unchanged, skipping")
+            result.status = "cached"
+            return result
+        # Forget the old digest first so an interrupted run is never "cached"
+        save_digest(step.name, None)
+        with SUDO_LOCK if step.sudo else nullcontext():
+            start = time.monotonic()  # time queued behind another sudo step is not this step's
+            step.func()
+        if digest is not None:
+            # Re-read inputs: a step may create one (e.g. the venv interpreter)
+            save_digest(step.name, step_digest(step))
+        result.status = "ok"
+    except BaseException as e:  # noqa: BLE001 — reported in the summary
+        result.status = "failed"
+        result.error = e
+    finally:
+        result.seconds = time.monotonic() - start
+        result.output = _STEP_OUTPUT.buf.getvalue()
+        _STEP_OUTPUT.buf = None
+    return result
+
+
+def run_steps(
+    steps: List[Step], max_workers: int = 4, force=()
+) -> Dict[str, StepResult]:
+    """Run steps concurrently, respecting deps. Output is printed per step as it
+    finishes; a failed step marks everything that depends on it as skipped.
+    `force` is a collection of step names (or "*") that ignore the cache."""
+    by_name = {s.name: s for s in steps}
+    for s in steps:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Step {s.name} depends on unknown step(s): {missing}")
+    results = {s.name: StepResult(s.name) for s in steps}
+    real_stdout = sys.stdout
+    sys.stdout = _StepStdout(real_stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            while True:
+                progressed = False
+                for s in steps:
+                    res = results[s.name]
+                    if res.status != "pending" or s.name in running.values():
+                        continue
+                    dep_status = [results[d].status for d in s.deps]
+                    if any(st in ("failed", "skipped") for st in dep_status):
+                        res.status = "skipped"
+                        progressed = True
+                        real_stdout.write(f"⏭️  Skipping {s.name} (dependency failed)\n")
+                    elif all(st in ("ok", "cached") for st in dep_status):
+                        forced = "*" in force or s.name in force
+                        running[pool.submit(_run_one, s, forced)] = s.name
+                        progressed = True
+                if not running:
+                    if progressed:
+                        continue  # a skip may cascade further; re-scan
+                    stuck = [n for n, r in results.items() if r.status == "pending"]
+                    if stuck:
+                        raise ValueError(f"Dependency cycle between steps: {stuck}")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    res = fut.result()
+                    results[name] = res
+                    real_stdout.write(res.output)
+                    if res.status == "failed":
+                        real_stdout.write(f"❌ Step {name} failed: {res.error}\n")
+                    real_stdout.flush()
+    finally:
+        sys.stdout = real_stdout
+    return results
+
+
+def print_step_summary(results: Dict[str, StepResult], total: float):
+    print_h("Step timings")
+    icons = {"ok": "✅", "cached": "⏩", "failed": "❌", "skipped": "⏭️ ", "pending": "…"}
+    for res in results.values():
+        secs = f"{res.seconds:6.1f}s" if res.status != "skipped" else "     —"
+        print(f"  {icons[res.status]} {res.name:<22} {secs}")
+    print(f"  Wall clock: {total:.1f}s")
+
+
+def step_timings(results: Dict[str, StepResult], total: float) -> dict:
+    return {
+        "wall": round(total, 3),
+        "steps": {r.name: {"status": r.status, "seconds": round(r.seconds, 3)} for r in results.values()},
+    }
+
+
 def ensure_python_version():
     if sys.version_info < PY_MIN:
         raise SystemExit(
@@ -160,48 +435,123 @@ def install_deno():
 def ensure_venv():
     print_h("Ensuring Python venv")
     if not VENV_DIR.exists():
-        run([sys.executable, "-m", "venv", str(VENV_DIR)])
+        create_venv_slot()
     py = VENV_DIR / "bin" / "python"
     pip = [str(py), "-m", "pip"]
-    run(pip + ["install", "--upgrade"] + PKG_CORE, check=False)
+    if wheelhouse_usable(venv_python_version()):
+        print(f"📦 Installing from local wheelhouse {WHEELHOUSE_DIR} (no index)")
+        run(pip + wheelhouse_install_args(), check=False)
+    else:
+        run(pip + ["install", "--upgrade"] + PKG_CORE, check=False)
+    precompile_venv(py)
     return py
 
 
+def create_venv_slot():
+    """Create the first venv as a slot and point VENV_DIR at it, so later
+    background updates (venv_slots.py) can swap slots with one rename."""
+    slot = VENV_SLOTS_DIR / "initial"
+    if slot.exists():
+        shutil.rmtree(slot)
+    VENV_SLOTS_DIR.mkdir(parents=True, exist_ok=True)
+    run([sys.executable, "-m", "venv", str(slot)])
+    if VENV_DIR.is_symlink():
+        VENV_DIR.unlink()
+    VENV_DIR.symlink_to(slot)
+    state_file = VENV_SLOTS_DIR / "slots.json"
+    state_file.write_text(json.dumps({"active": slot.name}, indent=2) + "\n")
+
+
+def precompile_venv(py: Path):
+    """Byte-compile the venv's site-packages on all cores now, so PiKaraoke's
+    first start does not compile hundreds of modules on the SD card."""
+    site = run(
+        [str(py), "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+        check=False,
+        capture_output=True,
+    ).stdout.strip()
+    if not site:
+        print("⚠️  Could not locate venv site-packages; skipping precompile")
+        return
+    start = time.monotonic()
+    run([str(py), "-m", "compileall", "-q", "-j", "0", site], check=False)
+    print(f"⚡ Precompiled {site} in {time.monotonic() - start:.1f}s")
+
+
+# --- Offline wheelhouse ---
+def _canonical_name(name: str) -> str:
+    return name.lower().replace("_", "-").replace(".", "-")
+
+
+def parse_wheel_filename(filename: str) -> Tuple[str, str]:
+    """Return (canonical name, version) from a wheel filename."""
+    parts = filename[: -len(".whl")].split("-")
+    if not filename.endswith(".whl") or len(parts) < 5:
+        raise ValueError(f"Not a wheel filename: {filename}")
+    return _canonical_name(parts[0]), parts[1]
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_wheelhouse_lock(wheel_dir: Path, python_version: str):
+    """Write lock.json + a --require-hashes requirements file for wheel_dir."""
+    packages = []
+    for whl in sorted(wheel_dir.glob("*.whl")):
+        name, version = parse_wheel_filename(whl.name)
+        packages.append(
+            {"name": name, "version": version, "file": whl.name, "sha256": _sha256_file(whl)}
+        )
+    lock = {
+        "requirements": PKG_CORE,
+        "python": python_version,
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "packages": packages,
+    }
+    (wheel_dir / WHEELHOUSE_LOCK.name).write_text(json.dumps(lock, indent=2) + "\n")
+    lines = [f"{p['name']}=={p['version']} --hash=sha256:{p['sha256']}" for p in packages]
+    (wheel_dir / WHEELHOUSE_REQS.name).write_text("\n".join(lines) + "\n")
+    return lock
+
+
+def refresh_wheelhouse():
+    """Download/build wheels for PKG_CORE (online) and swap in a new wheelhouse.
+    Builds with the active slot's interpreter, so the lock matches what
+    ensure_venv and venv_slots.py will check it against."""
+    print_h("Refreshing offline wheelhouse")
+    if not (VENV_DIR / "bin" / "python").exists():
+        create_venv_slot()
+    py = str(VENV_DIR / "bin" / "python")
+    staging = WHEELHOUSE_DIR.with_name(WHEELHOUSE_DIR.name + ".new")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    # pip wheel resolves the full dependency set and builds any sdists, so the
+    # wheelhouse is installable later with --no-index
+    run([py, "-m", "pip", "wheel", "--wheel-dir", str(staging)] + PKG_CORE)
+    lock = write_wheelhouse_lock(staging, venv_python_version())
+    if WHEELHOUSE_DIR.exists():
+        shutil.rmtree(WHEELHOUSE_DIR)
+    staging.rename(WHEELHOUSE_DIR)
+    print(f"✅ Wheelhouse has {len(lock['packages'])} wheels: {WHEELHOUSE_DIR}")
+
+
 def copy_assets():
     print_h("Copying assets to $HOME")
     AUTOSTART_DIR.mkdir(parents=True, exist_ok=True)
-    # autostart script & UI
-    shutil.copy2(ASSETS_DIR / "autostart_pikaraoke.py", HOME / "autostart_pikaraoke.py")
-    shutil.copy2(ASSETS_DIR / "pikaraoke_ui.py", HOME / "pikaraoke_ui.py")
-    # desktop entry (we regenerate Exec line to venv python)
-    desktop_src = ASSETS_DIR / "autostart_pikaraoke.desktop"
-    if desktop_src.exists():
-        # Load existing, replace Exec= line
-        content = desktop_src.read_text()
-        exec_line = f"Exec={VENV_DIR}/bin/python {HOME}/autostart_pikaraoke.py"
-        new = []
-        replaced = False
-        for line in content.splitlines():
-            if line.startswith("Exec="):
-                new.append(exec_line)
-                replaced = True
-            else:
-                new.append(line)
-        if not replaced:
-            new.append(exec_line)
-        DESKTOP_FILE_PATH.write_text("\n".join(new) + "\n")
-    else:
-        DESKTOP_FILE_PATH.write_text(
-            f"""[Desktop Entry]
-Name=Start PiKaraoke
-Comment=Launch PiKaraoke on boot
-Exec={VENV_DIR}/bin/python {HOME}/autostart_pikaraoke.py
-Icon=utilities-terminal
-Terminal=false
-Type=Application
-X-GNOME-Autostart-enabled=true
-"""
-        )
+    # autostart script, UI and runtime helpers
+    for name in ASSET_MODULES:
+        shutil.copy2(ASSETS_DIR / name, HOME / name)
+    # the launcher runs under the venv python; give it bytecode for that interpreter
+    venv_py = VENV_DIR / "bin" / "python"
+    if venv_py.exists():
+        run([str(venv_py), "-m", "compileall", "-q"] + [str(HOME / n) for n in ASSET_MODULES], check=False)
     # pk_aliases
     aliases_src = ASSETS_DIR / "pk_aliases"
     if aliases_src.exists():
@@ -215,6 +565,296 @@ X-GNOME-Autostart-enabled=true
         if portal_dst.exists():
             shutil.rmtree(portal_dst)
         shutil.copytree(portal_src, portal_dst)
+    # PiKaraoke runs `python -m yt_dlp`; route it through ~/ytdlp_cache.py
+    print(f"🪝 python -m yt_dlp hook: {install_hook(VENV_DIR, HOME / 'ytdlp_cache.py')}")
+
+
+# --- Autostart: LXDE .desktop entry or systemd user units ---
+def desktop_entry_text() -> str:
+    """LXDE autostart entry, with its Exec line pointed at the venv python."""
+    exec_line = f"Exec={VENV_DIR}/bin/python {HOME}/autostart_pikaraoke.py"
+    desktop_src = ASSETS_DIR / "autostart_pikaraoke.desktop"
+    if not desktop_src.exists():
+        return f"""[Desktop Entry]
+Name=Start PiKaraoke
+Comment=Launch PiKaraoke on boot
+{exec_line}
+Icon=utilities-terminal
+Terminal=false
+Type=Application
+X-GNOME-Autostart-enabled=true
+"""
+    lines = [exec_line if line.startswith("Exec=") else line for line in desktop_src.read_text().splitlines()]
+    if exec_line not in lines:
+        lines.append(exec_line)
+    return "\n".join(lines) + "\n"
+
+
+def server_unit_text() -> str:
+    return f"""[Unit]
+Description=PiKaraoke server (deskpi-karaoke launcher, headless)
+Documentation=https://github.com/junclemente/deskpi-karaoke
+# User managers cannot order against the system network-online.target;
+# the launcher waits for the uplink itself (rtnetlink events).
+StartLimitIntervalSec=300
+StartLimitBurst=10
+
+[Service]
+Type=simple
+ExecStart={VENV_DIR}/bin/python {HOME}/autostart_pikaraoke.py --service
+WorkingDirectory={HOME}
+Environment=PYTHONUNBUFFERED=1
+Restart=on-failure
+RestartSec=10
+TimeoutStopSec=30
+KillMode=mixed
+StandardOutput=journal
+StandardError=journal
+SyslogIdentifier=pikaraoke
+
+[Install]
+WantedBy=default.target
+"""
+
+
+def display_unit_text() -> str:
+    return f"""[Unit]
+Description=PiKaraoke display (Chromium kiosk)
+PartOf=graphical-session.target
+After=graphical-session.target {SERVER_UNIT}
+Wants={SERVER_UNIT}
+
+[Service]
+Type=simple
+ExecStart={VENV_DIR}/bin/python {HOME}/pk_display.py
+Restart=on-failure
+RestartSec=5
+StandardOutput=journal
+StandardError=journal
+SyslogIdentifier=pikaraoke-display
+
+[Install]
+WantedBy=graphical-session.target
+"""
+
+
+def display_trigger_text() -> str:
+    """LXDE does not activate graphical-session.target, so a small autostart
+    entry hands the display variables to the user manager and starts the
+    display unit once the desktop is up."""
+    return f"""[Desktop Entry]
+Name=PiKaraoke display
+Comment=Start the PiKaraoke Chromium display (systemd user unit)
+Exec=sh -c "systemctl --user import-environment DISPLAY XAUTHORITY WAYLAND_DISPLAY; systemctl --user start {DISPLAY_UNIT}"
+Terminal=false
+Type=Application
+X-GNOME-Autostart-enabled=true
+"""
+
+
+def selected_autostart_mode() -> str:
+    try:
+        mode = AUTOSTART_MODE_FILE.read_text().strip()
+    except OSError:
+        mode = ""
+    return mode if mode in AUTOSTART_MODES else "desktop"
+
+
+def systemd_user_available() -> bool:
+    if not shutil.which("systemctl"):
+        return False
+    result = run(["systemctl", "--user", "is-system-running"], check=False, capture_output=True)
+    return result.stdout.strip() in ("running", "degraded", "starting")
+
+
+def _systemctl_user(*args):
+    return run(["systemctl", "--user"] + list(args), check=False)
+
+
+def install_autostart():
+    mode = selected_autostart_mode()
+    print_h(f"Configuring autostart ({mode})")
+    AUTOSTART_DIR.mkdir(parents=True, exist_ok=True)
+    if mode == "systemd" and not systemd_user_available():
+        print("⚠️  No systemd user manager; falling back to the LXDE .desktop entry")
+        mode = "desktop"
+    if mode == "systemd":
+        SYSTEMD_USER_DIR.mkdir(parents=True, exist_ok=True)
+        (SYSTEMD_USER_DIR / SERVER_UNIT).write_text(server_unit_text())
+        (SYSTEMD_USER_DIR / DISPLAY_UNIT).write_text(display_unit_text())
+        DISPLAY_TRIGGER_PATH.write_text(display_trigger_text())
+        if DESKTOP_FILE_PATH.exists():
+            DESKTOP_FILE_PATH.unlink()
+        _systemctl_user("daemon-reload")
+        _systemctl_user("enable", SERVER_UNIT, DISPLAY_UNIT)
+        # Lingering starts the user manager at boot, so the server does not
+        # wait for the desktop login
+        user = os.environ.get("USER") or HOME.name
+        run(["sudo", "loginctl", "enable-linger", user], check=False)
+        print(f"✅ Enabled {SERVER_UNIT} and {DISPLAY_UNIT} (journalctl --user -u pikaraoke)")
+        return
+    if (SYSTEMD_USER_DIR / SERVER_UNIT).exists():
+        if shutil.which("systemctl"):
+            _systemctl_user("disable", "--now", SERVER_UNIT, DISPLAY_UNIT)
+        for name in (SERVER_UNIT, DISPLAY_UNIT):
+            (SYSTEMD_USER_DIR / name).unlink(missing_ok=True)
+        if shutil.which("systemctl"):
+            _systemctl_user("daemon-reload")
+    DISPLAY_TRIGGER_PATH.unlink(missing_ok=True)
+    DESKTOP_FILE_PATH.write_text(desktop_entry_text())
+    print(f"✅ Autostart entry: {DESKTOP_FILE_PATH}")
+
+
+def _autostart_present() -> bool:
+    if selected_autostart_mode() == "systemd":
+        return (SYSTEMD_USER_DIR / SERVER_UNIT).exists() or DESKTOP_FILE_PATH.exists()
+    return DESKTOP_FILE_PATH.exists()
+
+
+# --- RAM scratch for yt-dlp ---
+def scratch_size_mb() -> int:
+    """A quarter of RAM, 128 MB – 1 GB; downloads that do not fit spill to disk."""
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemTotal:"):
+                return max(128, min(1024, int(line.split()[1]) // 1024 // 4))
+    except (OSError, ValueError, IndexError):
+        pass
+    return 256
+
+
+def scratch_mount_options() -> str:
+    return f"rw,nosuid,nodev,noexec,noatime,size={scratch_size_mb()}m,mode=0700,uid={os.getuid()},gid={os.getgid()}"
+
+
+def systemd_mount_unit_name(path: Path) -> str:
+    """`systemd-escape --path --suffix=mount`, without the subprocess."""
+    out = []
+    for i, ch in enumerate(str(path).strip("/")):
+        if ch == "/":
+            out.append("-")
+        elif ch.isascii() and (ch.isalnum() or ch in ":_" or (ch == "." and i > 0)):
+            out.append(ch)
+        else:
+            out.extend(f"\\x{b:02x}" for b in ch.encode())
+    return "".join(out) + ".mount"
+
+
+SCRATCH_UNIT = systemd_mount_unit_name(SCRATCH_DIR)
+
+
+def scratch_unit_text() -> str:
+    return f"""[Unit]
+Description=deskpi-karaoke RAM scratch for yt-dlp downloads
+
+[Mount]
+What=tmpfs
+Where={SCRATCH_DIR}
+Type=tmpfs
+Options={scratch_mount_options()}
+
+[Install]
+WantedBy=local-fs.target
+"""
+
+
+def _without_scratch(fstab_text: str) -> List[str]:
+    return [line for line in fstab_text.splitlines() if line.split()[1:2] != [str(SCRATCH_DIR)]]
+
+
+def drop_legacy_scratch_fstab() -> bool:
+    """Earlier installers mounted the scratch from /etc/fstab. Remove that
+    entry (after backing fstab up) so the mount unit is the only definition."""
+    try:
+        current = FSTAB.read_text()
+    except OSError:
+        return True
+    kept = _without_scratch(current)
+    if len(kept) == len(current.splitlines()):
+        return True
+    if run(["sudo", "cp", "-p", str(FSTAB), str(FSTAB_BACKUP)], check=False).returncode != 0:
+        print(f"⚠️  Could not back up {FSTAB}; leaving its scratch entry in place")
+        return False
+    result = subprocess.run(["sudo", "tee", str(FSTAB)], input="\n".join(kept) + "\n", text=True,
+                            stdout=subprocess.DEVNULL, check=False)
+    if result.returncode != 0:
+        print(f"⚠️  Could not update {FSTAB} (backup at {FSTAB_BACKUP})")
+        return False
+    print(f"Moved the scratch mount from {FSTAB} to {SCRATCH_UNIT} (backup at {FSTAB_BACKUP})")
+    return True
+
+
+def setup_scratch():
+    """Bounded tmpfs for yt-dlp fragments and merges (see ytdlp_scratch.py),
+    mounted by a systemd mount unit; /etc/fstab is not edited."""
+    print_h("Setting up RAM scratch for downloads")
+    SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+    if not shutil.which("systemctl"):
+        print(f"⚠️  systemctl not found; downloads use {SCRATCH_DIR} on disk")
+        return
+    if not drop_legacy_scratch_fstab():
+        return
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    staged = STATE_DIR / SCRATCH_UNIT
+    staged.write_text(scratch_unit_text())
+    unit = SYSTEM_UNIT_DIR / SCRATCH_UNIT
+    if run(["sudo", "install", "-m", "0644", str(staged), str(unit)], check=False).returncode != 0:
+        print(f"⚠️  Could not install {unit}; downloads use {SCRATCH_DIR} on disk")
+        return
+    run(["sudo", "systemctl", "daemon-reload"], check=False)
+    run(["sudo", "systemctl", "enable", SCRATCH_UNIT], check=False)
+    # reload remounts with the new size without emptying the tmpfs
+    action = "reload" if os.path.ismount(SCRATCH_DIR) else "start"
+    run(["sudo", "systemctl", action, SCRATCH_UNIT], check=False)
+    print(f"✅ {scratch_size_mb()} MB tmpfs at {SCRATCH_DIR} ({SCRATCH_UNIT})")
+
+
+# --- Wi-Fi setup portal ---
+PORTAL_SERVICES = ["dnsmasq.service", "hostapd.service"]
+
+
+def disable_portal_services():
+    """raspi_portal runs hostapd and dnsmasq itself, only while in AP mode; the
+    packages' own services would hold wlan0 and port 53, so keep them off."""
+    print_h("Disabling system hostapd/dnsmasq services (used only by the Wi-Fi setup portal)")
+    if not shutil.which("systemctl"):
+        print("⚠️  systemctl not found; skipping")
+        return
+    run(["sudo", "systemctl", "disable", "--now"] + PORTAL_SERVICES, check=False)
+
+
+# --- Chromium kiosk profile ---
+KIOSK_PROFILE_DIR = STATE_DIR / "chromium-profile"  # snapshot pk_display.py seeds its RAM profile from
+KIOSK_PREFERENCES = {
+    "browser": {"check_default_browser": False, "has_seen_welcome_page": True},
+    "profile": {"exit_type": "Normal", "exited_cleanly": True,
+                "default_content_setting_values": {"notifications": 2, "geolocation": 2}},
+    "session": {"restore_on_startup": 5},  # new tab page, never "restore pages?"
+    "translate": {"enabled": False},
+    "credentials_enable_service": False,
+    "download": {"prompt_for_download": False},
+}
+
+
+def provision_kiosk_profile():
+    """Seed the kiosk's Chromium profile snapshot. An existing profile is
+    only completed, never reset, so a synced snapshot survives re-installs."""
+    print_h("Provisioning Chromium kiosk profile")
+    default = KIOSK_PROFILE_DIR / "Default"
+    default.mkdir(parents=True, exist_ok=True)
+    (KIOSK_PROFILE_DIR / "First Run").touch()
+    prefs_file = default / "Preferences"
+    try:
+        prefs = json.loads(prefs_file.read_text())
+    except (OSError, ValueError):
+        prefs = {}
+    for section, values in KIOSK_PREFERENCES.items():
+        if isinstance(values, dict) and isinstance(prefs.get(section), dict):
+            prefs[section].update(values)
+        else:
+            prefs[section] = values
+    prefs_file.write_text(json.dumps(prefs))
+    print(f"✅ Kiosk profile at {KIOSK_PROFILE_DIR} (runs from RAM, see pk_display.py)")
 
 
 def ensure_rc_sourced(rc_path: Path):
@@ -258,33 +898,190 @@ def record_state():
             (STATE_DIR / "VERSION").write_text("0.0.0\n")
             print("No tag found; wrote VERSION 0.0.0")
 
+def selected_ytdlp_profile() -> str:
+    """Profile chosen with --ytdlp-profile on a previous run, else the default."""
+    try:
+        name = YTDLP_PROFILE_FILE.read_text().strip()
+    except OSError:
+        name = ""
+    return name if name in ytdlp_profiles.PROFILES else ytdlp_profiles.DEFAULT_PROFILE
+
+
+def ytdlp_config_text() -> str:
+    return ytdlp_profiles.PROFILES[selected_ytdlp_profile()].render()
+
+
+def ytdl_args_text() -> str:
+    return ytdlp_profiles.PROFILES[selected_ytdlp_profile()].ytdl_args() + "\n"
+
+
 def install_ytdlp_config():
     print_h("Configuring yt-dlp defaults")
-    cfg_dir = HOME / ".config" / "yt-dlp"
-    cfg_dir.mkdir(parents=True, exist_ok=True)
-    cfg_file = cfg_dir / "config"
-    cfg_file.write_text(
-        "--js-runtimes deno\n"
-        "-t mp4\n"
-        "--merge-output-format mp4\n",
-        encoding="utf-8",
+    cfg_file = YTDLP_CONFIG_FILE
+    cfg_file.parent.mkdir(parents=True, exist_ok=True)
+    cfg_file.write_text(ytdlp_config_text(), encoding="utf-8")
+    # PiKaraoke's own -f on the command line overrides the config's, so the
+    # launcher passes the profile's selector through --ytdl-args
+    ytdlp_profiles.YTDL_ARGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    ytdlp_profiles.YTDL_ARGS_FILE.write_text(ytdl_args_text(), encoding="utf-8")
+    print(f"✅ Wrote {cfg_file} and {ytdlp_profiles.YTDL_ARGS_FILE} (profile: {selected_ytdlp_profile()})")
+
+def venv_python_version() -> str:
+    return pyvenv_version(VENV_DIR)
+
+
+def _wheelhouse_lock_text() -> str:
+    try:
+        return WHEELHOUSE_REQS.read_text()
+    except OSError:
+        return ""
+
+
+def _deno_present() -> bool:
+    return bool(shutil.which("deno")) or (HOME / ".deno" / "bin" / "deno").exists()
+
+
+def _assets_present() -> bool:
+    return (
+        hook_installed(VENV_DIR, HOME / "ytdlp_cache.py")
+        and all((HOME / n).exists() for n in ASSET_MODULES)
+    )
+
+
+def build_steps() -> List[Step]:
+    """Installer steps as a DAG. Deno and the venv only wait on apt when the
+    tools they need (curl, ensurepip) are not already on the system."""
+    deno_deps = () if shutil.which("curl") else ("apt",)
+    venv_deps = () if importlib.util.find_spec("ensurepip") else ("apt",)
+    steps = [
+        Step(
+            "apt",
+            apt_install,
+            inputs=lambda: APT_PKGS,
+            present=lambda: all(shutil.which(b) for b in ("ffmpeg", "curl")),
+            sudo=True,
+        ),
+        Step("deno", install_deno, deno_deps, inputs=lambda: [], present=_deno_present),
+        Step(
+            "venv",
+            ensure_venv,
+            venv_deps,
+            inputs=lambda: [PKG_CORE, sys.version, venv_python_version(), _wheelhouse_lock_text()],
+            present=lambda: (VENV_DIR / "bin" / "python").exists(),
+        ),
+        Step(
+            "scratch",
+            setup_scratch,
+            inputs=lambda: [scratch_unit_text()],
+            present=lambda: SCRATCH_DIR.is_dir() and (SYSTEM_UNIT_DIR / SCRATCH_UNIT).exists(),
+            sudo=True,
+        ),
+        Step("portal", disable_portal_services, ("apt",), inputs=lambda: PORTAL_SERVICES, sudo=True),
+        Step(
+            "kiosk",
+            provision_kiosk_profile,
+            inputs=lambda: [KIOSK_PREFERENCES],
+            present=lambda: (KIOSK_PROFILE_DIR / "Default" / "Preferences").exists(),
+        ),
+        Step(
+            "ytdlp_config",
+            install_ytdlp_config,
+            inputs=lambda: [ytdlp_config_text(), ytdl_args_text()],
+            present=lambda: YTDLP_CONFIG_FILE.exists() and ytdlp_profiles.YTDL_ARGS_FILE.exists(),
+        ),
+        Step(
+            "assets",
+            copy_assets,
+            ("venv",),  # precompiles the launcher with the venv interpreter
+            inputs=lambda: [ASSETS_DIR, str(HOME), str(VENV_DIR)],
+            present=_assets_present,
+        ),
+        Step(
+            "autostart",
+            install_autostart,
+            ("assets",),
+            inputs=lambda: [selected_autostart_mode(), desktop_entry_text(), server_unit_text(),
+                            display_unit_text(), display_trigger_text()],
+            present=_autostart_present,
+            sudo=True,  # loginctl enable-linger
+        ),
+    ]
+    steps.append(Step("state", record_state, tuple(s.name for s in steps)))
+    return steps
+
+
+def parse_args(step_names: List[str]):
+    parser = argparse.ArgumentParser(description="Install or update PiKaraoke")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run every step even if its inputs are unchanged",
+    )
+    parser.add_argument(
+        "--force-step",
+        action="append",
+        default=[],
+        choices=step_names,
+        metavar="STEP",
+        help=f"Re-run one step regardless of cache (repeatable): {', '.join(step_names)}",
+    )
+    parser.add_argument(
+        "--ytdlp-profile",
+        choices=sorted(ytdlp_profiles.PROFILES),
+        help=f"yt-dlp download profile to write (remembered; default {ytdlp_profiles.DEFAULT_PROFILE})",
+    )
+    parser.add_argument(
+        "--autostart",
+        choices=AUTOSTART_MODES,
+        help="Start via the LXDE .desktop entry (default) or systemd user units (remembered)",
+    )
+    parser.add_argument(
+        "--timings-json",
+        type=Path,
+        metavar="PATH",
+        help="Also write per-step status and seconds as JSON (used by bench/harness.py)",
     )
-    print(f"✅ Wrote {cfg_file}")
+    parser.add_argument(
+        "--refresh-wheelhouse",
+        action="store_true",
+        help="Rebuild the offline wheelhouse from PyPI (needs internet) and exit",
+    )
+    return parser.parse_args()
+
 
 def main():
+    steps = build_steps()
+    args = parse_args([s.name for s in steps])
     print_h("PiKaraoke Installer (dev)")
     ensure_python_version()
+    if args.refresh_wheelhouse:
+        refresh_wheelhouse()
+        return
     check_platform()
-    apt_install()
-    install_deno()
-    py = ensure_venv()
-    install_ytdlp_config()
-    copy_assets()
-    record_state()
+    if args.ytdlp_profile:
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        YTDLP_PROFILE_FILE.write_text(args.ytdlp_profile + "\n")
+    if args.autostart:
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        AUTOSTART_MODE_FILE.write_text(args.autostart + "\n")
+
+    force = {"*"} if args.force else set(args.force_step)
+    start = time.monotonic()
+    results = run_steps(steps, force=force)
+    total = time.monotonic() - start
+    print_step_summary(results, total)
+    if args.timings_json:
+        args.timings_json.write_text(json.dumps(step_timings(results, total), indent=2) + "\n")
+    failed = [r.name for r in results.values() if r.status == "failed"]
+    if failed:
+        raise RuntimeError(f"step(s) failed: {', '.join(failed)}")
 
     print_h("All done")
     print("• Venv       :", VENV_DIR)
-    print("• Autostart  :", DESKTOP_FILE_PATH)
+    if DESKTOP_FILE_PATH.exists():
+        print("• Autostart  :", DESKTOP_FILE_PATH)
+    else:
+        print("• Autostart  :", SYSTEMD_USER_DIR / SERVER_UNIT, "+", DISPLAY_UNIT)
     print("• State dir  :", STATE_DIR)
     print(
         "\nYou may need to log out and back in (or reboot) for autostart changes to take effect."
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The runtime modules are copied flat into $HOME and import each other by
+# name; mirror that for the tests.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "assets"))
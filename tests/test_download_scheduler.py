@@ -0,0 +1,204 @@
+import signal
+import threading
+import time
+
+import pytest
+
+import download_scheduler
+from download_scheduler import DownloadScheduler, Waiter, auto_workers
+
+
+def url(vid):
+    return f"https://www.youtube.com/watch?v={vid}"
+
+
+class FakeDownloads:
+    """run_download stand-in: each download blocks until finish(vid, rc)."""
+
+    def __init__(self):
+        self.release = {}
+        self.started = []
+        self.lock = threading.Lock()
+
+    def __call__(self, argv, cwd, out, err, on_start):
+        vid = argv[-1].rsplit("=", 1)[-1]
+        gate = {"event": threading.Event(), "rc": 0}
+        with self.lock:
+            self.release[vid] = gate
+            self.started.append(vid)
+        on_start(FakeProc(vid))
+        gate["event"].wait(10)
+        return gate["rc"]
+
+    def wait_started(self, vid, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if vid in self.release:
+                    return
+            time.sleep(0.01)
+        raise AssertionError(f"{vid} never started")
+
+    def finish(self, vid, rc=0):
+        with self.lock:
+            gate = self.release.pop(vid)
+        gate["rc"] = rc
+        gate["event"].set()
+
+
+class FakeProc:
+    def __init__(self, vid):
+        self.pid = vid
+
+
+@pytest.fixture
+def signals(monkeypatch):
+    sent = []
+    monkeypatch.setattr(download_scheduler, "_signal_group", lambda proc, sig: sent.append((proc.pid, sig)))
+    return sent
+
+
+def make_scheduler(tmp_path, downloads, offline=False, **config):
+    cfg = dict(download_scheduler.DEFAULT_CONFIG, workers=1, backoff_initial=30.0)
+    cfg.update(config)
+    return DownloadScheduler(
+        ytdlp=tmp_path / "yt-dlp", run_download=downloads, config=cfg,
+        socket_path=tmp_path / "downloads.sock", status_file=tmp_path / "status.json",
+        stats_file=tmp_path / "stats.json", is_offline=lambda: offline, cpu_count=4, log=lambda m: None,
+    )
+
+
+def submit(scheduler, vid, cwd="/songs"):
+    waiter = Waiter()
+    job = scheduler.submit([url(vid)], cwd, waiter)
+    return job, waiter
+
+
+def dispatch(scheduler):
+    with scheduler.cond:
+        scheduler.dispatch()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def rc_of(waiter):
+    return [m["rc"] for m in waiter.messages if "rc" in m]
+
+
+def test_auto_workers_bounded_by_cores_and_link():
+    assert auto_workers(4, None, None) == 2  # nothing measured yet
+    assert auto_workers(1, None, None) == 1
+    assert auto_workers(8, 10e6, 5e6, max_workers=3) == 3  # two full-speed downloads + 1, capped
+    assert auto_workers(8, 5e6, 5e6, max_workers=3) == 2
+    assert auto_workers(2, 50e6, 1e6, max_workers=3) == 1  # half of two cores
+
+
+def test_identical_requests_share_one_download(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads)
+    first, w1 = submit(scheduler, "AAAAAAAAAAA")
+    second, w2 = submit(scheduler, "AAAAAAAAAAA")
+    assert first is second
+    assert len(scheduler.jobs) == 1 and len(first.waiters) == 2
+    assert any("joined the download" in m.get("err", "") for m in w2.messages)
+
+    dispatch(scheduler)
+    downloads.wait_started("AAAAAAAAAAA")
+    downloads.finish("AAAAAAAAAAA", rc=0)
+    wait_for(lambda: rc_of(w1) and rc_of(w2))
+    assert rc_of(w1) == rc_of(w2) == [0]
+    assert downloads.started == ["AAAAAAAAAAA"]
+
+
+def test_same_video_elsewhere_is_a_separate_job(tmp_path):
+    scheduler = make_scheduler(tmp_path, FakeDownloads())
+    a, _ = submit(scheduler, "AAAAAAAAAAA", cwd="/songs")
+    b, _ = submit(scheduler, "AAAAAAAAAAA", cwd="/other")
+    assert a is not b
+
+
+def test_bumped_job_preempts_the_lowest_ranked_download(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads)
+    a, _ = submit(scheduler, "AAAAAAAAAAA")
+    dispatch(scheduler)
+    downloads.wait_started("AAAAAAAAAAA")
+    wait_for(lambda: a.proc is not None)
+
+    b, wb = submit(scheduler, "BBBBBBBBBBB")
+    dispatch(scheduler)
+    assert b.state == "queued"  # queued behind a, no preemption
+    assert signals == []
+
+    assert scheduler.bump("BBBBBBBBBBB")
+    dispatch(scheduler)
+    assert (a.state, b.state) == ("paused", "running")
+    assert signals == [("AAAAAAAAAAA", signal.SIGSTOP)]
+
+    downloads.wait_started("BBBBBBBBBBB")
+    downloads.finish("BBBBBBBBBBB")
+    wait_for(lambda: rc_of(wb))
+    dispatch(scheduler)
+    assert a.state == "running"
+    assert signals[-1] == ("AAAAAAAAAAA", signal.SIGCONT)
+    downloads.finish("AAAAAAAAAAA")
+
+
+def test_no_preemption_when_disabled(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads, preempt=False)
+    a, _ = submit(scheduler, "AAAAAAAAAAA")
+    dispatch(scheduler)
+    wait_for(lambda: a.proc is not None)
+    b, _ = submit(scheduler, "BBBBBBBBBBB")
+    scheduler.bump("BBBBBBBBBBB")
+    dispatch(scheduler)
+    assert (a.state, b.state) == ("running", "queued")
+    assert signals == []
+    downloads.finish("AAAAAAAAAAA")
+
+
+def test_failed_download_retries_with_backoff(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads)
+    job, waiter = submit(scheduler, "AAAAAAAAAAA")
+    dispatch(scheduler)
+    downloads.wait_started("AAAAAAAAAAA")
+    downloads.finish("AAAAAAAAAAA", rc=1)
+    wait_for(lambda: job.state == "retrying")
+    assert job.not_before - time.time() == pytest.approx(30.0, abs=1.0)
+    assert rc_of(waiter) == []
+    dispatch(scheduler)  # still backing off
+    assert job.state == "retrying"
+
+
+def test_offline_failure_is_not_retried(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads, offline=True)
+    job, waiter = submit(scheduler, "AAAAAAAAAAA")
+    dispatch(scheduler)
+    downloads.wait_started("AAAAAAAAAAA")
+    downloads.finish("AAAAAAAAAAA", rc=1)
+    wait_for(lambda: rc_of(waiter))
+    assert rc_of(waiter) == [1]
+    assert job.state == "failed" and not scheduler.jobs
+
+
+def test_last_waiter_leaving_cancels_the_job(tmp_path, signals):
+    downloads = FakeDownloads()
+    scheduler = make_scheduler(tmp_path, downloads)
+    job, w1 = submit(scheduler, "AAAAAAAAAAA")
+    _, w2 = submit(scheduler, "AAAAAAAAAAA")
+    dispatch(scheduler)
+    wait_for(lambda: job.proc is not None)
+    scheduler.detach(job, w1)
+    assert job.state == "running"
+    scheduler.detach(job, w2)
+    assert job.state == "cancelled" and not scheduler.jobs
+    assert ("AAAAAAAAAAA", signal.SIGTERM) in signals
+    downloads.finish("AAAAAAAAAAA")
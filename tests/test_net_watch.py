@@ -0,0 +1,111 @@
+import threading
+import time
+
+from net_watch import ConnectivityWatcher, PollingSource, UplinkMonitor, read_uplink_state
+
+
+class FakeSource:
+    """Event source stand-in: each wait() runs the next scripted network change."""
+
+    name = "fake"
+
+    def __init__(self, changes=()):
+        self.changes = list(changes)
+        self.waits = []
+        self.closed = False
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        if self.changes:
+            self.changes.pop(0)()
+            return True
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeLink:
+    def __init__(self, route=False, reachable=False):
+        self.route = route
+        self.reachable = reachable
+        self.probes = 0
+
+    def probe(self):
+        self.probes += 1
+        return self.reachable
+
+    def up(self):
+        self.route = self.reachable = True
+
+    def down(self):
+        self.route = self.reachable = False
+
+
+def watcher_for(link, source, **kwargs):
+    return ConnectivityWatcher(probe=link.probe, source=source, route_check=lambda: link.route, **kwargs)
+
+
+def test_link_up_is_seen_on_the_next_event():
+    link = FakeLink()
+    source = FakeSource([lambda: None, link.up])
+    watcher = watcher_for(link, source, recheck_interval=5)
+    assert watcher.wait_for_uplink(timeout=60)
+    assert source.waits == [5, 5]
+    assert link.probes == 1  # no probe while there was no default route
+
+
+def test_no_uplink_until_the_timeout():
+    link = FakeLink(route=True)  # a route, but the probe keeps failing
+    watcher = watcher_for(link, PollingSource(interval=0.01), recheck_interval=0.01)
+    start = time.monotonic()
+    assert not watcher.wait_for_uplink(timeout=0.1)
+    assert 0.1 <= time.monotonic() - start < 1
+    assert link.probes > 1
+
+
+def test_monitor_reports_link_down_and_up_once_per_transition(tmp_path):
+    link = FakeLink(route=True, reachable=True)
+    changes = [lambda: None, link.down, lambda: None, lambda: None, link.up]
+    source = FakeSource(changes)
+    seen = []
+    monitor = UplinkMonitor(watcher_for(link, source), state_file=tmp_path / "uplink.json",
+                            on_change=seen.append)
+    for _ in range(len(changes) + 1):
+        monitor.check()
+        source.wait(0)
+    assert seen == [True, False, True]  # repeated checks in one state are not reported
+    assert monitor.online.is_set()
+    assert read_uplink_state(tmp_path / "uplink.json") is True
+
+
+def test_monitor_publishes_offline(tmp_path):
+    link = FakeLink()
+    monitor = UplinkMonitor(watcher_for(link, FakeSource()), state_file=tmp_path / "uplink.json")
+    assert not monitor.check()
+    assert read_uplink_state(tmp_path / "uplink.json") is False
+    assert read_uplink_state(tmp_path / "uplink.json", stale_after=-1) is None
+
+
+def test_polling_source_wake_interrupts_the_wait():
+    source = PollingSource(interval=30)
+    threading.Timer(0.05, source.wake).start()
+    start = time.monotonic()
+    assert source.wait(30) is False
+    assert time.monotonic() - start < 5
+
+
+def test_monitor_stop_wakes_a_long_recheck_and_closes_the_source(tmp_path):
+    link = FakeLink(route=True, reachable=True)
+    source = PollingSource(interval=30)
+    closed = threading.Event()
+    source.close = closed.set
+    monitor = UplinkMonitor(watcher_for(link, source), state_file=tmp_path / "uplink.json",
+                            online_interval=30)
+    monitor.start()
+    assert monitor.online.wait(5)
+    start = time.monotonic()
+    monitor.stop()
+    assert time.monotonic() - start < 5
+    assert not monitor.thread.is_alive()
+    assert closed.is_set()
@@ -0,0 +1,11 @@
+from pk_governor import Governor, SystemdBackend, load_policy
+
+
+def test_server_memory_limits_can_be_dropped_when_the_player_shares_it(tmp_path):
+    governor = Governor(policy=load_policy(tmp_path / "missing.json"), backend=SystemdBackend())
+    assert "MemoryMax=1400M" in governor.command("server", ["pikaraoke"])
+    governor.drop_memory_limits("server")
+    argv = governor.command("server", ["pikaraoke"])
+    assert not any(arg.startswith("Memory") for arg in argv)
+    assert "CPUWeight=400" in argv
+    assert "MemoryMax=700M" in governor.command("downloads", ["yt-dlp"])
@@ -0,0 +1,28 @@
+import pk_logs
+
+
+class VanishingSegment:
+    """A segment the compressor removes between exists() and stat()."""
+
+    name = "pikaraoke.20251231-000000-000.log"
+
+    def exists(self):
+        return True
+
+    def stat(self):
+        raise FileNotFoundError(self.name)
+
+    def unlink(self):
+        raise FileNotFoundError(self.name)
+
+
+def test_prune_skips_segments_that_vanish_meanwhile(tmp_path, monkeypatch):
+    for stamp in ("20260101-000000", "20260102-000000"):
+        (tmp_path / f"pikaraoke.{stamp}.log").write_bytes(b"x" * 100)
+    (tmp_path / "pikaraoke.log").write_bytes(b"x" * 100)
+    listed = [VanishingSegment()] + pk_logs.segments(tmp_path, "pikaraoke")
+    monkeypatch.setattr(pk_logs, "segments", lambda directory, name: listed)
+
+    pk_logs.prune_segments(tmp_path, "pikaraoke", max_total_bytes=150)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["pikaraoke.log"]
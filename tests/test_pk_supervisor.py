@@ -0,0 +1,194 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pk_supervisor import Supervisor, http_ready
+
+
+class FakeChild:
+    """Popen stand-in that exits with `code` after `polls` calls to poll()."""
+
+    def __init__(self, pid, code=None, polls=0):
+        self.pid = pid
+        self.code = code
+        self.polls = polls
+        self.terminated = False
+
+    def poll(self):
+        if self.terminated:
+            return -15
+        if self.code is not None:
+            if self.polls <= 0:
+                return self.code
+            self.polls -= 1
+        return None
+
+    def terminate(self):
+        self.terminated = True
+
+    def kill(self):
+        self.terminated = True
+
+    def wait(self, timeout=None):
+        return self.poll()
+
+
+def make_supervisor(tmp_path, children, ready_check=lambda: True, max_spawns=None, **kwargs):
+    """Supervisor over a list of FakeChild; stops itself after `max_spawns`."""
+    events = []
+    spawned = []
+
+    def spawn():
+        child = children[len(spawned)]
+        spawned.append(child)
+        return child
+
+    def on_event(name, **data):
+        events.append((name, data))
+        if name == "restart" and max_spawns is not None and len(spawned) >= max_spawns:
+            sup.stop()
+
+    params = dict(poll_interval=0.01, backoff_initial=0.01, backoff_max=0.04, proc_root=tmp_path / "proc")
+    params.update(kwargs)
+    sup = Supervisor(spawn=spawn, ready_check=ready_check, status_file=tmp_path / "supervisor.json",
+                     on_event=on_event, **params)
+    return sup, events, spawned
+
+
+def run_with_timeout(sup, seconds=10):
+    thread = threading.Thread(target=sup.run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "supervisor did not stop"
+
+
+def test_backoff_doubles_and_caps():
+    sup = Supervisor(spawn=lambda: None, backoff_initial=1.0, backoff_max=10.0)
+    assert [sup.backoff_delay(n) for n in range(7)] == [0.0, 1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+
+def test_crash_loop_backs_off_exponentially(tmp_path):
+    children = [FakeChild(100 + i, code=1) for i in range(4)]
+    sup, events, spawned = make_supervisor(tmp_path, children, max_spawns=4)
+    run_with_timeout(sup)
+    delays = [d["delay"] for name, d in events if name == "restart"]
+    assert delays == [0.01, 0.02, 0.04, 0.04]
+    assert sup.status["starts"] == 4
+    assert sup.status["state"] == "stopped"
+
+
+def test_stable_child_resets_backoff(tmp_path):
+    children = [FakeChild(100 + i, code=1) for i in range(3)]
+    sup, events, _ = make_supervisor(tmp_path, children, max_spawns=3, stable_after=0.0)
+    run_with_timeout(sup)
+    assert [d["delay"] for name, d in events if name == "restart"] == [0.01, 0.01, 0.01]
+
+
+def test_clean_exit_stops_supervising(tmp_path):
+    sup, events, spawned = make_supervisor(tmp_path, [FakeChild(100, code=0, polls=2)])
+    run_with_timeout(sup)
+    assert len(spawned) == 1
+    assert ("child_exit", {"code": 0}) in events
+    assert not any(name == "restart" for name, _ in events)
+
+
+def test_ready_reported_once_the_check_passes(tmp_path):
+    answers = iter([False, False, True])
+    child = FakeChild(100, code=0, polls=20)
+    sup, events, _ = make_supervisor(tmp_path, [child], ready_check=lambda: next(answers, True))
+    run_with_timeout(sup)
+    names = [name for name, _ in events]
+    assert names.index("spawn") < names.index("ready") < names.index("child_exit")
+    assert names.count("ready") == 1
+
+
+def test_never_ready_is_restarted(tmp_path):
+    children = [FakeChild(100), FakeChild(101)]
+    sup, events, spawned = make_supervisor(tmp_path, children, ready_check=lambda: False,
+                                           ready_timeout=0.05, max_spawns=2)
+    run_with_timeout(sup)
+    reasons = [d["reason"] for name, d in events if name == "restart"]
+    assert reasons == ["not ready", "not ready"]
+    assert all(c.terminated for c in spawned)
+
+
+def test_rss_ceiling_restarts_the_child(tmp_path):
+    (tmp_path / "proc" / "100").mkdir(parents=True)
+    (tmp_path / "proc" / "100" / "status").write_text("Name:\tpikaraoke\nVmRSS:\t  2097152 kB\n")
+    children = [FakeChild(100), FakeChild(101, code=0)]
+    sup, events, spawned = make_supervisor(tmp_path, children, rss_limit_mb=1024)
+    run_with_timeout(sup)
+    assert ("rss_limit", {"rss_mb": 2048.0}) in events
+    assert [d["reason"] for name, d in events if name == "restart"] == ["rss 2048 MB > 1024 MB"]
+    assert spawned[0].terminated
+
+
+def test_spawn_failure_is_retried(tmp_path):
+    calls = []
+
+    def spawn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("no such file")
+        return FakeChild(100, code=0)
+
+    events = []
+    sup = Supervisor(spawn=spawn, ready_check=lambda: True, status_file=tmp_path / "s.json",
+                     poll_interval=0.01, backoff_initial=0.01, proc_root=tmp_path,
+                     on_event=lambda name, **d: events.append(name))
+    run_with_timeout(sup)
+    assert events[:2] == ["spawn_failed", "restart"]
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("restart_on_clean_exit, spawns", [(False, 1), (True, 2)])
+def test_restart_on_clean_exit(tmp_path, restart_on_clean_exit, spawns):
+    children = [FakeChild(100, code=0), FakeChild(101, code=0)]
+    sup, _, spawned = make_supervisor(tmp_path, children, max_spawns=2,
+                                      restart_on_clean_exit=restart_on_clean_exit)
+    run_with_timeout(sup)
+    assert len(spawned) == spawns
+
+
+@pytest.fixture
+def http_server():
+    """Throwaway server on an ephemeral port answering with the status in the path."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(int(self.path.strip("/") or 200))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_ready_when_the_server_answers(http_server):
+    assert http_ready(http_server + "/200")
+    assert http_ready(http_server + "/500")  # an error page still means it is up
+
+
+def test_http_not_ready_when_the_connection_is_refused():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # closed again: nothing listens there
+    assert not http_ready(f"http://127.0.0.1:{port}/")
+
+
+def test_http_not_ready_when_the_server_never_answers():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen(1)  # connects, but nobody accepts or replies
+        start = time.monotonic()
+        assert not http_ready(f"http://127.0.0.1:{s.getsockname()[1]}/", timeout=0.3)
+        assert time.monotonic() - start < 2
@@ -0,0 +1,163 @@
+import os
+import time
+
+import pytest
+
+from pk_thermal import (
+    CPUFREQ,
+    DEFAULT_CONFIG,
+    GET_THROTTLED,
+    THERMAL_ZONE,
+    FanPort,
+    Sysfs,
+    ThermalController,
+    active_hints,
+    announce,
+    fan_curve,
+)
+
+
+class FakeBoard:
+    """A sysfs tree in tmp_path plus a plain file standing in for /dev/ttyUSB0."""
+
+    def __init__(self, root):
+        self.root = root
+        for rel in (THERMAL_ZONE, f"{CPUFREQ}/scaling_cur_freq", GET_THROTTLED):
+            (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / CPUFREQ / "cpuinfo_max_freq").write_text("1500000\n")
+        self.fan_file = root / "ttyUSB0"
+        self.fan_file.write_bytes(b"")
+        self.set(temp=40.0)
+
+    def set(self, temp, mhz=1500, flags=0):
+        (self.root / THERMAL_ZONE).write_text(f"{int(temp * 1000)}\n")
+        (self.root / CPUFREQ / "scaling_cur_freq").write_text(f"{mhz * 1000}\n")
+        (self.root / GET_THROTTLED).write_text(f"0x{flags:x}\n")
+
+    def commands(self):
+        data = self.fan_file.read_bytes().decode()
+        return [int(data[i + 4:i + 7]) for i in range(0, len(data), 7)]
+
+
+@pytest.fixture
+def board(tmp_path):
+    return FakeBoard(tmp_path / "sys-root")
+
+
+def make_controller(board, tmp_path, events=None, **config):
+    clock = {"t": 0.0}
+    controller = ThermalController(
+        sysfs=Sysfs(board.root), fan=FanPort(board.fan_file), config=dict(DEFAULT_CONFIG, **config),
+        hint_dir=tmp_path / "heavy", status_file=tmp_path / "thermal.json",
+        on_event=(lambda name, **d: events.append((name, d))) if events is not None else None,
+        clock=lambda: clock["t"], log=lambda m: None,
+    )
+    return controller, clock
+
+
+def test_fan_curve_interpolates_and_clamps():
+    curve = DEFAULT_CONFIG["curve"]
+    assert fan_curve(30, curve) == 0
+    assert fan_curve(45, curve) == 0
+    assert fan_curve(47.5, curve) == 15
+    assert fan_curve(55, curve) == 45
+    assert fan_curve(68, curve) == 100
+    assert fan_curve(90, curve) == 100
+
+
+def test_sysfs_readings(board):
+    board.set(temp=61.234, mhz=1000, flags=0x50005)
+    sysfs = Sysfs(board.root)
+    assert sysfs.temperature() == pytest.approx(61.234)
+    assert sysfs.cpu_mhz() == (1000, 1500)
+    assert sysfs.throttled() == 0x50005
+    assert Sysfs(board.root / "missing").temperature() is None
+
+
+def test_target_without_trend_reads_the_curve(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path)
+    assert controller.target(60.0, []) == (60, 60.0)
+
+
+def test_target_projects_a_rising_trend(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path, lookahead=20.0)
+    controller.history.extend([(0.0, 50.0), (2.0, 50.2), (4.0, 50.4)])  # 0.1 °C/s
+    pwm, projected = controller.target(50.4, [])
+    assert projected == pytest.approx(52.4)
+    assert pwm == fan_curve(52.4, DEFAULT_CONFIG["curve"])
+
+
+def test_target_ignores_a_falling_trend(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path)
+    controller.history.extend([(0.0, 60.0), (2.0, 59.0), (4.0, 58.0)])
+    assert controller.target(58.0, [])[1] == 58.0
+
+
+def test_heavy_work_hint_boosts_the_projection(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path, hint_boost=8.0)
+    assert controller.target(50.0, ["transcode"]) == (fan_curve(58.0, DEFAULT_CONFIG["curve"]), 58.0)
+
+
+def test_hysteresis_holds_the_fan_until_clearly_cooler(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path, hysteresis=2.0)
+    controller.pwm = 60  # set at 60 °C
+    assert controller.target(59.0, [])[0] == 60  # within 2 °C: hold
+    assert controller.target(58.0, [])[0] == 60  # curve at 60 °C is still 60
+    assert controller.target(56.0, [])[0] == 54  # clearly cooler: curve at 58 °C
+    controller.pwm = 30
+    assert controller.target(60.0, [])[0] == 60  # speeding up is never held back
+
+
+def test_min_on_keeps_the_fan_from_stalling(board, tmp_path):
+    controller, _ = make_controller(board, tmp_path, min_on=25)
+    assert controller.target(46.0, [])[0] == 25
+    assert controller.target(44.0, [])[0] == 0
+
+
+def test_step_sends_only_real_changes_to_the_fan(board, tmp_path):
+    controller, clock = make_controller(board, tmp_path)
+    for t, temp in ((0, 60.0), (2, 60.2), (4, 60.1)):
+        clock["t"] = t
+        board.set(temp=temp)
+        controller.step()
+    assert board.commands() == [60]  # later readings move the curve by less than PWM_STEP
+    clock["t"] = 6
+    board.set(temp=65.0)
+    controller.step()
+    assert board.commands()[-1] > 60
+    clock["t"] = 8
+    board.set(temp=40.0)
+    status = controller.step()
+    assert board.commands()[-1] == 0  # stopping the fan is always sent
+    assert status["pwm"] == 0 and status["fan"] == "controlled"
+    assert (tmp_path / "thermal.json").exists()
+
+
+def test_throttle_flags_raise_and_clear_events(board, tmp_path):
+    events = []
+    controller, clock = make_controller(board, tmp_path, events=events)
+    board.set(temp=81.0, mhz=1000, flags=0x6 | 0x60000)
+    controller.step()
+    clock["t"] = 2.0
+    controller.step()  # unchanged flags: no new event
+    clock["t"] = 4.0
+    board.set(temp=76.0, mhz=1500, flags=0x60000)
+    status = controller.step()
+
+    assert [name for name, _ in events] == ["throttle", "throttle_clear"]
+    raised, cleared = events[0][1], events[1][1]
+    assert raised["flags"] == ["freq_capped", "throttled"]
+    assert (raised["temp"], raised["mhz"]) == (81.0, 1000)
+    assert cleared["flags"] == ["freq_capped", "throttled"]
+    assert status["throttle_flags"] == [] and status["throttled_since_boot"] is True
+
+
+def test_announced_work_expires(tmp_path):
+    hint_dir = tmp_path / "heavy"
+    announce("transcode", 60, hint_dir)
+    announce("merge", 1, hint_dir)
+    now = time.time()
+    assert active_hints(hint_dir, now) == ["merge", "transcode"]
+    assert active_hints(hint_dir, now + 30) == ["transcode"]
+    assert [p.name for p in hint_dir.iterdir()] == [f"transcode-{os.getpid()}"]  # expired hint removed
+    assert active_hints(tmp_path / "missing") == []
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bench" / "fakes"))
+
+from fake_portal_net import FakeDaemon, FakeIp, FakeNetwork, FakeNmcli  # noqa: E402
+from raspi_portal import Portal, PortalHTTP  # noqa: E402
+from raspi_portal.netctl import AP_ADDRESS  # noqa: E402
+
+
+def make_portal(networks=None, **kwargs):
+    net = FakeNetwork(networks, scan_delay=0, associate_delay=0, uplink_delay=0, daemon_delay=0, ip_delay=0)
+    portal = Portal(nmcli=FakeNmcli(net), ip=FakeIp(net), hostapd=FakeDaemon(net, "hostapd"),
+                    dnsmasq=FakeDaemon(net, "dnsmasq"), uplink=net.uplink, switch_grace=0,
+                    log=lambda m: None, **kwargs)
+    return portal, net
+
+
+def route(portal, method, path, host=AP_ADDRESS, body=b""):
+    return PortalHTTP(portal).route(method, path, {"host": host}, body)
+
+
+async def in_ap_mode(networks=None):
+    portal, net = make_portal(networks)
+    await portal.start_ap()
+    return portal, net
+
+
+@pytest.mark.parametrize("path", ["/generate_204", "/connecttest.txt", "/ncsi.txt", "/success.txt"])
+def test_probes_redirect_to_the_setup_page(path):
+    portal, _ = make_portal()
+    status, headers, _ = route(portal, "GET", path, host="connectivitycheck.gstatic.com")
+    assert status == "302 Found"
+    assert headers["Location"] == f"http://{AP_ADDRESS}/"
+
+
+def test_apple_probe_gets_the_page_not_success():
+    portal, _ = make_portal()
+    status, _, body = route(portal, "GET", "/hotspot-detect.html", host="captive.apple.com")
+    assert status == "200 OK"
+    assert b"Wi-Fi setup" in body and b"Success" not in body
+
+
+def test_other_hosts_are_redirected():
+    portal, _ = make_portal()
+    assert route(portal, "GET", "/", host="example.com")[0] == "302 Found"
+
+
+def test_setup_page_lists_scanned_networks_escaped():
+    portal, _ = asyncio.run(in_ap_mode({"<b>Cafe</b>": "pw", "Guest": ""}))
+    status, _, body = route(portal, "GET", "/")
+    page = body.decode()
+    assert status == "200 OK"
+    assert "&lt;b&gt;Cafe&lt;/b&gt;" in page and "<b>Cafe</b>" not in page
+    assert "Guest (70%, open)" in page
+
+
+def test_status_and_networks_json():
+    portal, _ = asyncio.run(in_ap_mode())
+    assert json.loads(route(portal, "GET", "/status.json")[2])["state"] == "ap"
+    assert [n["ssid"] for n in json.loads(route(portal, "GET", "/networks.json")[2])] == ["VenueWiFi", "Guest"]
+
+
+def test_unknown_path_is_404():
+    portal, _ = make_portal()
+    assert route(portal, "GET", "/favicon.ico")[0] == "404 Not Found"
+
+
+def test_connect_outside_ap_mode_goes_back_to_the_page():
+    portal, _ = make_portal()
+    status, headers, _ = route(portal, "POST", "/connect", body=b"ssid=VenueWiFi&psk=letmein")
+    assert (status, headers["Location"]) == ("303 See Other", "/")
+    assert portal.state == "idle"
+
+
+def test_connect_switches_and_verifies_the_uplink():
+    async def scenario():
+        portal, net = await in_ap_mode()
+        status, _, body = route(portal, "POST", "/connect", body=b"ssid=VenueWiFi&psk=letmein")
+        assert status == "200 OK" and b"Connecting to VenueWiFi" in body
+        assert portal.state == "switching"
+        # a second submit while switching is refused
+        assert route(portal, "POST", "/connect", body=b"ssid=Guest")[0] == "303 See Other"
+        await asyncio.wait_for(portal.done.wait(), 5)
+        return portal, net
+
+    portal, net = asyncio.run(scenario())
+    assert portal.state == "connected"
+    assert portal.switch["online"] is True
+    assert net.connected == "VenueWiFi"
+
+
+def test_hidden_network_name_wins_over_the_list():
+    async def scenario():
+        portal, _ = await in_ap_mode({"VenueWiFi": "letmein", "Backstage": "secret"})
+        route(portal, "POST", "/connect", body=b"ssid=VenueWiFi&hidden=Backstage&psk=secret")
+        await asyncio.wait_for(portal.done.wait(), 5)
+        return portal
+
+    assert asyncio.run(scenario()).target == "Backstage"
+
+
+def test_wrong_password_reopens_the_ap_with_an_error():
+    async def scenario():
+        portal, net = await in_ap_mode()
+        route(portal, "POST", "/connect", body=b"ssid=VenueWiFi&psk=wrong")
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if portal.state == "ap":
+                break
+        return portal, net
+
+    portal, net = asyncio.run(scenario())
+    assert portal.state == "ap" and not portal.done.is_set()
+    assert "could not join VenueWiFi" in portal.last_error
+    assert "forget VenueWiFi" in net.calls
+    assert net.calls.count("scan") == 1  # the cached list is served again
+    assert "could not join VenueWiFi" in route(portal, "GET", "/")[2].decode()
+
+
+def test_http_over_a_socket():
+    async def scenario():
+        portal, _ = await in_ap_mode()
+        server = PortalHTTP(portal, host="127.0.0.1", port=0)
+        await server.start()
+        try:
+            replies = []
+            for request in (b"GET /status.json HTTP/1.1\r\nHost: 10.42.0.1\r\n\r\n",
+                            b"POST /connect HTTP/1.1\r\nHost: 10.42.0.1\r\nContent-Length: 99999\r\n\r\nssid=",
+                            b"\r\n"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(request)
+                if b"99999" in request:
+                    writer.write_eof()
+                replies.append(await asyncio.wait_for(reader.read(), 5))
+                writer.close()
+            return replies, server.requests
+        finally:
+            await server.stop()
+
+    loop_errors = []
+
+    def run(coro):
+        loop = asyncio.new_event_loop()
+        loop.set_exception_handler(lambda _loop, context: loop_errors.append(context))
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    (status, truncated, garbage), handled = run(scenario())
+    head, _, body = status.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert b"Connection: close" in head and b"Cache-Control: no-store" in head
+    assert json.loads(body)["state"] == "ap"
+    assert truncated == b""  # declared body never arrived: connection closed, no reply
+    assert garbage == b""
+    assert handled == 1
+    assert loop_errors == []  # the truncated body was handled, not raised
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from song_cache import SongCache, pikaraoke_now_playing, pikaraoke_queue
+from song_manifest import SongManifest
+
+PLAYING = "Rick Astley - Never Gonna Give You Up---dQw4w9WgXcQ.mp4"
+OTHER = "Some Band - Other Song---abcdefghijk.mp4"
+
+# What PiKaraoke 1.18.0's /now_playing returns (Karaoke.get_now_playing)
+NOW_PLAYING = {
+    "now_playing": "Rick Astley - Never Gonna Give You Up",
+    "now_playing_user": "Pikaraoke",
+    "now_playing_duration": 213,
+    "now_playing_transpose": 0,
+    "now_playing_url": "/stream/abc.mp4",
+    "now_playing_subtitle_url": None,
+    "now_playing_position": 12.5,
+    "up_next": None,
+    "next_user": None,
+    "is_paused": False,
+    "volume": 0.85,
+}
+
+
+@pytest.fixture
+def pikaraoke():
+    """Stand-in PiKaraoke serving only the routes it really has."""
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            routes = {"/now_playing": NOW_PLAYING, "/get_queue": []}
+            if self.path not in routes:
+                self.send_error(404)
+                return
+            body = json.dumps(routes[self.path]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requested
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, pikaraoke):
+    url, _ = pikaraoke
+    songs = tmp_path / "songs"
+    songs.mkdir()
+    manifest = SongManifest(songs, tmp_path / "manifest.json", duration_probe=lambda p: None)
+    for rel in (PLAYING, OTHER):
+        (songs / rel).write_bytes(b"x" * 1000)
+        manifest.entries[rel] = {"size": 1000, "mtime": time.time() - 30 * 86400}
+    archive = tmp_path / "archive.txt"
+    archive.write_text("youtube dQw4w9WgXcQ\nyoutube abcdefghijk\n")
+    return SongCache(manifest, config={"quota": None, "min_free": 0, "free_target": 0, "low_water": None,
+                                       "half_life_days": 30},
+                     stats_file=tmp_path / "stats.json", archive=archive,
+                     now_playing=lambda: pikaraoke_now_playing(url), queued=lambda: pikaraoke_queue(url),
+                     log=lambda m: None)
+
+
+def test_now_playing_reads_the_now_playing_route(pikaraoke):
+    url, requested = pikaraoke
+    assert pikaraoke_now_playing(url) == "Rick Astley - Never Gonna Give You Up"
+    assert requested == ["/now_playing"]
+
+
+def test_now_playing_is_none_when_pikaraoke_is_down():
+    assert pikaraoke_now_playing("http://127.0.0.1:9") is None
+
+
+def test_a_play_is_recorded_once_per_title_change(cache):
+    assert cache.poll_now_playing() == PLAYING
+    assert cache.poll_now_playing() is None  # same song still on screen
+    assert cache.stats[PLAYING]["plays"] == 1
+    assert cache.stats[PLAYING]["last_played"] is not None
+
+
+def test_the_playing_song_is_never_an_eviction_candidate(cache):
+    cache.poll_now_playing()
+    for stat in cache.stats.values():
+        stat["added"] = time.time() - 30 * 86400
+    assert [rel for _, rel, _ in cache.candidates()] == [OTHER]
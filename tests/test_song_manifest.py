@@ -0,0 +1,57 @@
+import threading
+import time
+
+from pk_governor import Governor, NoneBackend
+from song_manifest import SongManifest
+
+SONG = "Rick Astley - Never Gonna Give You Up---dQw4w9WgXcQ.mp4"
+
+
+def test_durations_are_probed_on_first_use_not_during_the_walk(tmp_path):
+    (tmp_path / "songs").mkdir()
+    (tmp_path / "songs" / SONG).write_bytes(b"x" * 100)
+    probed = []
+    manifest = SongManifest(tmp_path / "songs", tmp_path / "manifest.json",
+                            duration_probe=lambda p: probed.append(p.name) or 213.0)
+    assert manifest.reconcile()["added"] == 1
+    assert probed == []
+    assert manifest.duration(SONG) == manifest.duration(SONG) == 213.0
+    assert probed == [SONG]
+    assert manifest.duration("missing.mp4") is None
+
+
+def test_a_scoped_walk_is_adopted_and_listeners_hear_about_it(tmp_path):
+    songs = tmp_path / "songs"
+    songs.mkdir()
+    (songs / SONG).write_bytes(b"x" * 100)
+    manifest = SongManifest(songs, tmp_path / "manifest.json",
+                            governor=Governor(policy={"scopes": {"transcode": {}}}, backend=NoneBackend()))
+    heard = []
+    manifest.listeners.append(lambda kind, rel, entry: heard.append((kind, rel)))
+    assert manifest.refresh() == {"added": 1, "changed": 0, "removed": 0}
+    assert heard == [("added", SONG)]
+    (songs / SONG).unlink()
+    assert manifest.refresh()["removed"] == 1
+    assert heard[-1] == ("removed", SONG)
+    assert manifest.songs() == {}
+
+
+def test_the_first_walk_waits_until_pikaraoke_is_ready(tmp_path):
+    songs = tmp_path / "songs"
+    songs.mkdir()
+    (songs / SONG).write_bytes(b"x" * 100)
+    manifest = SongManifest(songs, tmp_path / "manifest.json")
+    ready = threading.Event()
+    thread = manifest.start(ready=ready)
+    try:
+        time.sleep(0.3)
+        assert manifest.songs() == {}
+        ready.set()
+        for _ in range(50):
+            if manifest.songs():
+                break
+            time.sleep(0.1)
+        assert list(manifest.songs()) == [SONG]
+    finally:
+        manifest.stop()
+        thread.join(timeout=5)
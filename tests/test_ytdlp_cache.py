@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import ytdlp_cache
+
+WRAPPER = Path(ytdlp_cache.__file__).resolve()
+SEARCH = ["-j", "--no-playlist", "--flat-playlist", 'ytsearch10:"never gonna give you up"']
+VIDEO = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+FAKE_INIT = '''
+import json, os, sys
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    with open(os.environ["FAKE_YTDLP_CALLS"], "a") as f:
+        f.write(json.dumps(argv) + "\\n")
+    if "--version" in argv:
+        print("2099.01.01")
+    elif "-j" in argv:
+        print(json.dumps({"id": "dQw4w9WgXcQ", "title": "Never Gonna", "url": "https://youtu.be/dQw4w9WgXcQ"}))
+    sys.exit(0)
+'''
+
+
+@pytest.fixture
+def venv(tmp_path):
+    """A throwaway venv with a fake yt_dlp package, its console script and the hook."""
+    venv_dir = tmp_path / "venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(venv_dir)], check=True)
+    site = ytdlp_cache.site_packages(venv_dir)
+    (site / "yt_dlp").mkdir()
+    (site / "yt_dlp" / "__init__.py").write_text(FAKE_INIT)
+    (site / "yt_dlp" / "__main__.py").write_text('raise SystemExit("yt_dlp.__main__ ran: not hooked")\n')
+    script = venv_dir / "bin" / "yt-dlp"
+    script.write_text(f"#!{venv_dir}/bin/python\nimport sys\nfrom yt_dlp import main\nsys.exit(main())\n")
+    script.chmod(0o755)
+    ytdlp_cache.install_hook(venv_dir, WRAPPER)
+    return venv_dir
+
+
+@pytest.fixture
+def env(tmp_path):
+    home = tmp_path / "home"
+    home.mkdir()
+    return dict(
+        os.environ,
+        HOME=str(home),
+        XDG_CACHE_HOME=str(tmp_path / "cache"),
+        XDG_RUNTIME_DIR=str(tmp_path / "run"),
+        PK_GOVERNOR_BACKEND="none",
+        FAKE_YTDLP_CALLS=str(tmp_path / "calls.jsonl"),
+    )
+
+
+def python_m_yt_dlp(venv, env, *args):
+    """What PiKaraoke runs: [sys.executable, "-m", "yt_dlp", ...]."""
+    return subprocess.run([str(venv / "bin" / "python"), "-m", "yt_dlp", *args], env=env,
+                          capture_output=True, text=True, timeout=60)
+
+
+def calls(env):
+    path = Path(env["FAKE_YTDLP_CALLS"])
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_hook_is_installed_in_the_venv(venv):
+    assert ytdlp_cache.hook_installed(venv, WRAPPER)
+    assert not ytdlp_cache.hook_installed(venv, WRAPPER.with_name("elsewhere.py"))
+
+
+def test_pikaraoke_search_is_served_from_the_cache_the_second_time(venv, env):
+    first = python_m_yt_dlp(venv, env, *SEARCH)
+    second = python_m_yt_dlp(venv, env, *SEARCH)
+    assert first.returncode == second.returncode == 0, first.stderr + second.stderr
+    assert json.loads(first.stdout)["id"] == json.loads(second.stdout)["id"] == "dQw4w9WgXcQ"
+    assert calls(env) == [SEARCH]  # the real yt-dlp ran once
+
+
+def test_version_passes_through_to_the_console_script(venv, env):
+    result = python_m_yt_dlp(venv, env, "--version")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "2099.01.01"
+
+
+def test_pikaraoke_download_gets_the_ram_scratch(venv, env, tmp_path):
+    scratch = Path(env["HOME"]) / ".cache" / "deskpi-karaoke" / "scratch"
+    scratch.mkdir(parents=True)
+    library = tmp_path / "pikaraoke-songs"
+    result = python_m_yt_dlp(
+        venv, env, "-f", "mp4", "-o", f"{library}/%(title)s---%(id)s.%(ext)s", "-S", "vcodec:h264",
+        "--compat-options", "filename-sanitization", VIDEO,
+    )
+    assert result.returncode == 0, result.stderr
+    [argv] = calls(env)
+    paths = [argv[i + 1] for i, a in enumerate(argv) if a == "-P"]
+    assert paths[0].startswith(f"temp:{scratch}/")
+    assert f"home:{library}" in paths
+    assert argv[argv.index("-o") + 1] == "%(title)s---%(id)s.%(ext)s"
+    assert argv[-1] == VIDEO
+
+
+def test_pikaraoke_download_is_handed_to_a_running_scheduler(venv, env, tmp_path, monkeypatch):
+    from download_scheduler import DEFAULT_CONFIG, DownloadScheduler
+
+    monkeypatch.setenv("FAKE_YTDLP_CALLS", env["FAKE_YTDLP_CALLS"])  # the scheduler runs yt-dlp
+    socket_path = Path(env["XDG_RUNTIME_DIR"]) / "deskpi-karaoke" / "downloads.sock"
+    scheduler = DownloadScheduler(ytdlp=venv / "bin" / "yt-dlp", config=dict(DEFAULT_CONFIG),
+                                  socket_path=socket_path, status_file=tmp_path / "downloads.json",
+                                  stats_file=tmp_path / "stats.json", is_offline=lambda: False,
+                                  log=lambda m: None)
+    scheduler.start()
+    try:
+        for _ in range(100):
+            if socket_path.exists():
+                break
+            time.sleep(0.02)
+        result = python_m_yt_dlp(venv, env, "-f", "mp4", "-o", f"{tmp_path}/songs/%(title)s.%(ext)s", VIDEO)
+    finally:
+        scheduler.stop()
+    assert result.returncode == 0, result.stderr
+    [argv] = calls(env)
+    assert "--newline" in argv  # added by the scheduler
+    assert [job["state"] for job in scheduler.recent] == ["done"]
+
+
+def test_youtube_calls_follow_the_uplink_monitor(venv, env):
+    from net_watch import write_uplink_state
+
+    uplink = Path(env["XDG_RUNTIME_DIR"]) / "deskpi-karaoke" / "uplink.json"
+    write_uplink_state(False, uplink)
+    offline = python_m_yt_dlp(venv, env, *SEARCH)
+    assert offline.returncode == ytdlp_cache.OFFLINE_EXIT
+    assert "no internet uplink" in offline.stderr
+    assert python_m_yt_dlp(venv, env, "--version").returncode == 0  # answered locally
+    assert calls(env) == [["--version"]]
+
+    write_uplink_state(True, uplink)  # the monitor sees an uplink: no restart needed
+    online = python_m_yt_dlp(venv, env, *SEARCH)
+    assert online.returncode == 0, online.stderr
+    assert calls(env)[-1] == SEARCH
+
+    write_uplink_state(False, uplink)
+    assert python_m_yt_dlp(venv, env, *SEARCH).stdout == online.stdout  # cached results still work
+    download = python_m_yt_dlp(venv, env, "-f", "mp4", "-o", "/tmp/%(title)s.%(ext)s", VIDEO)
+    assert download.returncode == ytdlp_cache.OFFLINE_EXIT
+    assert len(calls(env)) == 2
@@ -0,0 +1,35 @@
+import shlex
+
+import ytdlp_profiles
+from ytdlp_profiles import PROFILES
+
+
+def pikaraoke_download_argv(ytdl_args):
+    """PiKaraoke 1.18.0's build_ytdl_download_command, without the URL."""
+    argv = ["-f", "mp4", "-o", "/songs/%(title)s---%(id)s.%(ext)s", "-S", "vcodec:h264",
+            "--compat-options", "filename-sanitization"]
+    return argv + shlex.split(ytdl_args) if ytdl_args else argv
+
+
+def last_format(argv):
+    return [argv[i + 1] for i, a in enumerate(argv) if a == "-f"][-1]
+
+
+def test_the_profile_selector_overrides_pikaraokes_own():
+    for profile in (PROFILES["pi4"], PROFILES["lowbw"]):
+        assert last_format(pikaraoke_download_argv(profile.ytdl_args())) == profile.format_selector()
+
+
+def test_the_config_carries_no_selector_pikaraoke_would_override():
+    for profile in PROFILES.values():
+        assert not any(line.startswith("-f ") for line in profile.render().splitlines())
+
+
+def test_compat_keeps_pikaraokes_choice_and_is_benchmarked_as_such():
+    assert PROFILES["compat"].ytdl_args() == ""
+    recording = {"id": "x", "duration": 10, "formats": [
+        {"format_id": "18", "ext": "mp4", "vcodec": "avc1.42001E", "acodec": "mp4a", "height": 360, "tbr": 500},
+        {"format_id": "137", "ext": "mp4", "vcodec": "avc1.640028", "acodec": "none", "height": 1080, "tbr": 4000},
+        {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a", "tbr": 128},
+    ]}
+    assert ytdlp_profiles.evaluate(PROFILES["compat"], recording)["formats"] == "18"
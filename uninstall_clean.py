@@ -23,6 +23,10 @@ def parse_args():
 # --- Utility Functions ---
 def safe_remove(path: Path):
     """Removes a file or directory if it exists — skips if 'pikaraoke-songs' is in path"""
+    if path.is_symlink():
+        path.unlink()
+        print(f"🗑️ Removed link: {path}")
+        return
     if not path.exists():
         return
 
@@ -52,6 +56,7 @@ def remove_virtualenvs():
     print("🔍 Removing virtual environments...")
     safe_remove(Path.home() / ".venv")
     safe_remove(Path.home() / ".venv-pikaraoke")
+    safe_remove(Path.home() / ".deskpi-karaoke" / "venvs")
 
 
 def remove_shortcuts_and_scripts():
@@ -68,11 +73,52 @@ def remove_logs():
     home = Path.home()
     safe_remove(home / "pikaraoke_output.log")
     safe_remove(home / "pikaraoke_install.log")
+    safe_remove(home / ".deskpi-karaoke" / "logs")
 
 
 def remove_autostart_config():
     print("🔍 Removing autostart config...")
     safe_remove(Path("/etc/xdg/autostart/pikaraoke.desktop"))
+    home = Path.home()
+    safe_remove(home / ".config" / "autostart" / "pikaraoke.desktop")
+    safe_remove(home / ".config" / "autostart" / "pikaraoke-display.desktop")
+    units = ["pikaraoke.service", "pikaraoke-display.service"]
+    if any((home / ".config" / "systemd" / "user" / u).exists() for u in units):
+        subprocess.run(["systemctl", "--user", "disable", "--now"] + units, check=False)
+        for u in units:
+            safe_remove(home / ".config" / "systemd" / "user" / u)
+        subprocess.run(["systemctl", "--user", "daemon-reload"], check=False)
+
+
+def remove_scratch():
+    print("🔍 Removing download RAM scratch...")
+    scratch = Path.home() / ".cache" / "deskpi-karaoke" / "scratch"
+    unit = subprocess.run(["systemd-escape", "--path", "--suffix=mount", str(scratch)],
+                          capture_output=True, text=True, check=False).stdout.strip()
+    if unit and Path("/etc/systemd/system", unit).exists():
+        subprocess.run(["sudo", "systemctl", "disable", "--now", unit], check=False)
+        subprocess.run(["sudo", "rm", "-f", f"/etc/systemd/system/{unit}"], check=False)
+        subprocess.run(["sudo", "systemctl", "daemon-reload"], check=False)
+        print(f"🗑️ Removed {unit}")
+    if os.path.ismount(scratch):
+        subprocess.run(["sudo", "umount", str(scratch)], check=False)
+    # fstab entry written by older installers
+    try:
+        lines = Path("/etc/fstab").read_text().splitlines()
+    except OSError:
+        lines = []
+    kept = [line for line in lines if line.split()[1:2] != [str(scratch)]]
+    if len(kept) != len(lines):
+        subprocess.run(["sudo", "cp", "-p", "/etc/fstab", "/etc/fstab.deskpi-karaoke.bak"], check=False)
+        subprocess.run(["sudo", "tee", "/etc/fstab"], input="\n".join(kept) + "\n", text=True,
+                       stdout=subprocess.DEVNULL, check=False)
+        print("🗑️ Removed scratch entry from /etc/fstab")
+    safe_remove(scratch)
+
+
+def remove_kiosk_profile():
+    print("🔍 Removing Chromium kiosk profile...")
+    safe_remove(Path.home() / ".deskpi-karaoke" / "chromium-profile")
 
 
 def remove_deskpi_drivers():
@@ -106,6 +152,8 @@ def main():
     remove_shortcuts_and_scripts()
     remove_logs()
     remove_autostart_config()
+    remove_scratch()
+    remove_kiosk_profile()
     remove_legacy_install_folder()
 
     if args.deskpi:
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Named yt-dlp download profiles for the installer, plus an offline benchmark.
+
+Each profile describes its format choice as an ordered list of alternatives,
+so the same description renders the `-f` selector handed to PiKaraoke and
+drives the benchmark's replay of recorded format lists
+(bench/ytdlp_formats/*.json, the `formats` array of `yt-dlp -J`).
+
+PiKaraoke runs `python -m yt_dlp -f mp4 ... -S vcodec:h264 ...` for every
+download, and a command-line `-f` beats the one in ~/.config/yt-dlp/config.
+The selector therefore goes to PiKaraoke's `--ytdl-args`, which it appends
+after its own arguments (the last `-f` wins); the config only carries the
+options PiKaraoke does not pass: temp path, fragments, archive, merge format.
+
+    python3 ytdlp_profiles.py show [PROFILE]
+    python3 ytdlp_profiles.py bench [--formats-dir DIR] [--json]
+"""
+
+import argparse
+import json
+import shlex
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+HOME = Path.home()
+STATE_DIR = HOME / ".deskpi-karaoke"
+ARCHIVE_FILE = STATE_DIR / "ytdlp-archive.txt"
+YTDL_ARGS_FILE = STATE_DIR / "pikaraoke_ytdl_args"  # read by the launcher
+SCRATCH_DIR = HOME / ".cache" / "deskpi-karaoke" / "scratch"  # tmpfs mounted by install.py
+FORMATS_DIR = Path(__file__).resolve().parent / "bench" / "ytdlp_formats"
+DEFAULT_PROFILE = "pi4"
+
+# Pi 4 hardware-decodes H.264 (and HEVC, which YouTube does not serve);
+# VP9/AV1 fall back to software decode in Chromium.
+HW_DECODE_PREFIXES = ("avc1", "h264")
+HW_DECODE_MAX_HEIGHT = 1080
+
+
+@dataclass
+class Alt:
+    """One alternative of a format selector.
+
+    kind "single" picks one pre-muxed format; "merge" picks best video + best
+    audio and needs an ffmpeg merge.
+    """
+
+    kind: str
+    vcodec: Optional[str] = None  # required codec prefix, e.g. "avc1"
+    max_height: Optional[int] = None
+    min_height: Optional[int] = None
+    ext: Optional[str] = None
+    audio_ext: Optional[str] = None
+
+    def selector(self) -> str:
+        filters = ""
+        if self.ext and self.kind == "single":
+            filters += f"[ext={self.ext}]"
+        if self.vcodec:
+            filters += f"[vcodec^={self.vcodec}]"
+        if self.min_height:
+            filters += f"[height>={self.min_height}]"
+        if self.max_height:
+            filters += f"[height<={self.max_height}]"
+        if self.kind == "single":
+            return f"b{filters}"
+        audio = f"[ext={self.audio_ext}]" if self.audio_ext else ""
+        return f"bv*{filters}+ba{audio}"
+
+
+@dataclass
+class Profile:
+    name: str
+    description: str
+    alts: List[Alt] = field(default_factory=list)
+    raw_format_args: List[str] = field(default_factory=list)  # config-only, no selector
+    concurrent_fragments: int = 1
+    download_archive: bool = False
+    extra_args: List[str] = field(default_factory=list)
+
+    def format_selector(self) -> str:
+        return "/".join(a.selector() for a in self.alts)
+
+    def ytdl_args(self) -> str:
+        """PiKaraoke's --ytdl-args value; empty keeps PiKaraoke's own `-f mp4`."""
+        return shlex.join(["-f", self.format_selector()]) if self.alts else ""
+
+    def render(self, archive_file: Path = ARCHIVE_FILE, scratch_dir: Optional[Path] = SCRATCH_DIR) -> str:
+        lines = ["# Generated by deskpi-karaoke install.py — profile: " + self.name]
+        lines.append("--js-runtimes deno")
+        if scratch_dir:
+            # fragments, .part files and the merge stay in RAM; only the final
+            # file is moved to the download directory
+            lines.append(f'--paths "temp:{scratch_dir}"')
+        lines.extend(self.raw_format_args)
+        lines.append("--merge-output-format mp4")
+        if self.concurrent_fragments > 1:
+            lines.append(f"--concurrent-fragments {self.concurrent_fragments}")
+        if self.download_archive:
+            lines.append(f'--download-archive "{archive_file}"')
+        lines.extend(self.extra_args)
+        return "\n".join(lines) + "\n"
+
+
+PROFILES = {
+    "compat": Profile(
+        "compat",
+        "PiKaraoke's own choice: -f mp4 -S vcodec:h264 (previous config's -t mp4 only remuxes)",
+        # -t mp4 adds --merge-output-format/--remux-video mp4 and a -S that
+        # PiKaraoke's -S replaces; its -f mp4 picks the best pre-muxed mp4
+        raw_format_args=["-t mp4"],
+        alts=[],
+    ),
+    "pi4": Profile(
+        "pi4",
+        "Pre-muxed H.264 480–720p when offered, else H.264 ≤720p + m4a; 4 fragments in parallel",
+        alts=[
+            # A pre-muxed 360p file saves the merge but makes lyrics hard to read
+            Alt("single", vcodec="avc1", min_height=480, max_height=720, ext="mp4"),
+            Alt("merge", vcodec="avc1", max_height=720, audio_ext="m4a"),
+            Alt("single", max_height=720),
+            Alt("single"),
+        ],
+        concurrent_fragments=4,
+        download_archive=True,
+    ),
+    "lowbw": Profile(
+        "lowbw",
+        "Venue Wi-Fi: H.264 ≤480p, pre-muxed first; 4 fragments in parallel",
+        alts=[
+            Alt("single", vcodec="avc1", max_height=480, ext="mp4"),
+            Alt("merge", vcodec="avc1", max_height=480, audio_ext="m4a"),
+            Alt("single", max_height=480),
+            Alt("single"),
+        ],
+        concurrent_fragments=4,
+        download_archive=True,
+    ),
+}
+
+# How the benchmark models profiles without a selector of their own
+_SIM_ALTS = {
+    "compat": [Alt("single", vcodec="avc1", ext="mp4"), Alt("single", ext="mp4")],
+}
+
+
+# --- benchmark ---
+def _has_video(f):
+    return f.get("vcodec") not in (None, "none")
+
+
+def _has_audio(f):
+    return f.get("acodec") not in (None, "none")
+
+
+def _size(f, duration) -> int:
+    size = f.get("filesize") or f.get("filesize_approx")
+    if size:
+        return int(size)
+    return int((f.get("tbr") or 0) * 1000 / 8 * (duration or 0))
+
+
+def _quality(f):
+    return (f.get("height") or 0, f.get("tbr") or 0)
+
+
+def _matches(f, alt: Alt, video=True) -> bool:
+    if video and alt.vcodec and not str(f.get("vcodec", "")).startswith(alt.vcodec):
+        return False
+    if video and alt.max_height and (f.get("height") or 0) > alt.max_height:
+        return False
+    if video and alt.min_height and (f.get("height") or 0) < alt.min_height:
+        return False
+    if alt.kind == "single" and alt.ext and f.get("ext") != alt.ext:
+        return False
+    return True
+
+
+def select_formats(formats: list, alts: List[Alt]) -> list:
+    """Replay a selector against a recorded format list (best = height, tbr)."""
+    for alt in alts:
+        if alt.kind == "single":
+            cands = [f for f in formats if _has_video(f) and _has_audio(f) and _matches(f, alt)]
+            if cands:
+                return [max(cands, key=_quality)]
+        else:
+            videos = [f for f in formats if _has_video(f) and _matches(f, alt)]
+            audios = [
+                f
+                for f in formats
+                if _has_audio(f)
+                and not _has_video(f)
+                and (not alt.audio_ext or f.get("ext") == alt.audio_ext)
+            ]
+            if videos and audios:
+                return [max(videos, key=_quality), max(audios, key=lambda f: f.get("tbr") or 0)]
+    return []
+
+
+def evaluate(profile: Profile, recording: dict) -> dict:
+    alts = profile.alts or _SIM_ALTS.get(profile.name, [Alt("single")])
+    chosen = select_formats(recording.get("formats", []), alts)
+    duration = recording.get("duration")
+    total = sum(_size(f, duration) for f in chosen)
+    video = next((f for f in chosen if _has_video(f)), None)
+    merge = len(chosen) > 1
+    hw = bool(
+        video
+        and str(video.get("vcodec", "")).startswith(HW_DECODE_PREFIXES)
+        and (video.get("height") or 0) <= HW_DECODE_MAX_HEIGHT
+    )
+    return {
+        "recording": recording.get("id"),
+        "formats": "+".join(f["format_id"] for f in chosen) or "none",
+        "height": video.get("height") if video else None,
+        "vcodec": video.get("vcodec") if video else None,
+        "bytes": total,
+        "merge": merge,
+        # A merge reads both streams back and writes the muxed file
+        "merge_io_bytes": 2 * total if merge else 0,
+        "hw_decode": hw,
+    }
+
+
+def load_recordings(formats_dir: Path = FORMATS_DIR) -> list:
+    return [json.loads(p.read_text()) for p in sorted(formats_dir.glob("*.json"))]
+
+
+def bench(formats_dir: Path = FORMATS_DIR) -> dict:
+    recordings = load_recordings(formats_dir)
+    results = {}
+    for name, profile in PROFILES.items():
+        rows = [evaluate(profile, r) for r in recordings]
+        results[name] = {
+            "rows": rows,
+            "total_bytes": sum(r["bytes"] for r in rows),
+            "merges": sum(r["merge"] for r in rows),
+            "merge_io_bytes": sum(r["merge_io_bytes"] for r in rows),
+            "hw_decode": sum(r["hw_decode"] for r in rows),
+            "count": len(rows),
+        }
+    return results
+
+
+def _mb(n):
+    return f"{n / 1e6:8.1f} MB"
+
+
+def print_bench(results: dict):
+    for name, res in results.items():
+        print(f"\n=== {name}: {PROFILES[name].description} ===")
+        for r in res["rows"]:
+            print(
+                f"  {r['recording']:<8} {r['formats']:<9} {str(r['height']) + 'p':>6}"
+                f" {str(r['vcodec']):<14} {_mb(r['bytes'])}  merge={'yes' if r['merge'] else 'no ':<3}"
+                f" hw={'yes' if r['hw_decode'] else 'no'}"
+            )
+        print(
+            f"  total {_mb(res['total_bytes'])}, merges {res['merges']}/{res['count']}"
+            f" ({_mb(res['merge_io_bytes']).strip()} merge I/O),"
+            f" hw-decodable {res['hw_decode']}/{res['count']}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="yt-dlp download profiles")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    show = sub.add_parser("show", help="Print a profile's config and PiKaraoke --ytdl-args")
+    show.add_argument("profile", nargs="?", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    b = sub.add_parser("bench", help="Replay recorded format lists against every profile")
+    b.add_argument("--formats-dir", type=Path, default=FORMATS_DIR)
+    b.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "show":
+        profile = PROFILES[args.profile]
+        print(profile.render(), end="")
+        print(f"# PiKaraoke --ytdl-args: {profile.ytdl_args() or '(none)'}")
+    else:
+        results = bench(args.formats_dir)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_bench(results)
+
+
+if __name__ == "__main__":
+    main()